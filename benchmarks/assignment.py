@@ -0,0 +1,73 @@
+"""Compares batch assignment policies by total pickup time and solve latency.
+
+Spreads a fleet across the grid, then books batches of random trips with each
+policy against identical copies of the fleet.
+
+Usage:
+    python -m benchmarks.assignment --taxis 2000 --trips 200 --candidates 8
+"""
+
+import argparse
+import copy
+import random
+import time
+from booking.assignment import GreedyAssignment, OptimalAssignment
+from booking.gridsimulation import GridSimulation
+from booking.point import Point
+from booking.trip import Trip
+
+
+def random_trip(rng, spread):
+    return Trip({'source': {'x': rng.randint(-spread, spread),
+                            'y': rng.randint(-spread, spread)},
+                 'destination': {'x': rng.randint(-spread, spread),
+                                 'y': rng.randint(-spread, spread)}})
+
+
+def spread_fleet(num_taxis, spread, rng):
+    simulation = GridSimulation(Point(0, 0), num_taxis)
+    simulation.book_batch([random_trip(rng, spread) for i in range(num_taxis)])
+    simulation.increment_time(8 * spread)
+    return simulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--taxis', type=int, default=2000)
+    parser.add_argument('--trips', type=int, default=200)
+    parser.add_argument('--batches', type=int, default=5)
+    parser.add_argument('--spread', type=int, default=10000)
+    parser.add_argument('--candidates', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    fleet = spread_fleet(args.taxis, args.spread, rng)
+    batches = [[random_trip(rng, args.spread) for i in range(args.trips)]
+               for batch in range(args.batches)]
+    policies = [('greedy', GreedyAssignment()),
+                ('optimal', OptimalAssignment()),
+                ('bounded(k={})'.format(args.candidates),
+                 OptimalAssignment(max_candidates=args.candidates))]
+
+    print('{:<16}{:>10}{:>18}{:>16}'.format('policy', 'booked',
+                                            'total pickup', 'ms per batch'))
+    for name, policy in policies:
+        booked, total_pickup, elapsed = 0, 0, 0.0
+        for trips in batches:
+            simulation = copy.deepcopy(fleet)
+            simulation._assignment = policy
+            start = time.perf_counter()
+            results = simulation.book_batch(trips)
+            elapsed += time.perf_counter() - start
+            for trip, result in zip(trips, results):
+                if result:
+                    booked += 1
+                    total_pickup += (result['total_time']
+                                     - trip.travel_duration())
+        print('{:<16}{:>10}{:>18}{:>16.2f}'.format(
+            name, booked, total_pickup, 1000 * elapsed / len(batches)))
+
+
+if __name__ == '__main__':
+    main()
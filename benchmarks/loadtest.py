@@ -0,0 +1,241 @@
+"""Load-tests the booking API over HTTP with mixed book and tick traffic.
+
+Starts the Django app on a local port in a separate process, unless --port
+is given to target a server that is already running. Client threads then send
+requests at a target rate over keep-alive connections, each thread on its
+own connection, and latency histograms are reported by endpoint and status.
+Latencies are measured from when each request was due to be sent, so a
+server falling behind shows up in them rather than slowing the clients down.
+
+When the app is started locally, the time spent in the simulation is also
+measured inside the server, and reported per endpoint against the latency
+seen by clients, which shows how much of it is framework overhead.
+
+Usage:
+    python -m benchmarks.loadtest --rate 500 --duration 10 --connections 8
+    python -m benchmarks.loadtest --port 8080 --rate 2000
+"""
+
+import argparse
+from bisect import bisect_left
+from collections import defaultdict
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+
+
+ENDPOINTS = {'book': '/api/book/', 'tick': '/api/tick/'}
+BUCKETS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _serve(num_taxis, port_connection, stop):
+    """Serves the Django app until stop is set, then sends simulation timings.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taxi.settings')
+    import django
+    django.setup()
+    from django.core.servers.basehttp import (ServerHandler,
+                                              ThreadedWSGIServer,
+                                              WSGIRequestHandler,
+                                              get_internal_wsgi_application)
+    from booking import models
+    from booking.gridsimulation import GridSimulation
+
+    class KeepAliveRequestHandler(WSGIRequestHandler):
+        """Serves every request sent on a connection, not only the first."""
+
+        disable_nagle_algorithm = True
+
+        def handle(self):
+            self.close_connection = True
+            self.handle_one_request()
+            while not self.close_connection:
+                self.handle_one_request()
+
+        def handle_one_request(self):
+            self.raw_requestline = self.rfile.readline(65537)
+            if not self.raw_requestline:
+                self.close_connection = True
+                return
+            if not self.parse_request():
+                return
+            # Read the whole body, so that a view not reading it does not
+            # leave it to be parsed as the next request on the connection.
+            body = io.BytesIO(self.rfile.read(
+                int(self.headers.get('Content-Length') or 0)))
+            handler = ServerHandler(body, self.wfile, self.get_stderr(),
+                                    self.get_environ())
+            handler.request_handler = self
+            handler.run(self.server.get_app())
+
+        def log_message(self, format, *args):
+            pass
+
+    models.simulation = _TimedSimulation(
+        GridSimulation(models._STARTING_POINT, num_taxis))
+    server = ThreadedWSGIServer(('127.0.0.1', 0), KeepAliveRequestHandler)
+    server.daemon_threads = True
+    server.set_app(get_internal_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port_connection.send(server.server_address[1])
+    stop.wait()
+    server.shutdown()
+    port_connection.send(models.simulation.timings)
+
+
+class _TimedSimulation:
+    """Wraps a simulation, recording how long each of its calls take."""
+
+    def __init__(self, simulation):
+        self._simulation = simulation
+        self.timings = defaultdict(list)
+
+    def __getattr__(self, name):
+        method = getattr(self._simulation, name)
+
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                return method(*args)
+            finally:
+                self.timings[name].append(time.perf_counter() - start)
+        return timed
+
+
+def _request(rng, spread, tick_ratio, invalid_ratio):
+    """Returns a random (endpoint, path, body, content type) request."""
+    if rng.random() < tick_ratio:
+        return 'tick', ENDPOINTS['tick'], b'', 'application/json'
+    booking = {'source': {'x': rng.randint(-spread, spread),
+                          'y': rng.randint(-spread, spread)},
+               'destination': {'x': rng.randint(-spread, spread),
+                               'y': rng.randint(-spread, spread)}}
+    body = json.dumps(booking).encode()
+    if rng.random() < invalid_ratio:
+        if rng.random() < 0.5:
+            return 'book', ENDPOINTS['book'], body[:-1], 'application/json'
+        return 'book', ENDPOINTS['book'], body, 'text/plain'
+    return 'book', ENDPOINTS['book'], body, 'application/json'
+
+
+def _drive(port, rate, duration, seed, args, results):
+    """Sends requests at the given rate on one keep-alive connection."""
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.connect()
+    connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    interval = 1 / rate
+    start = time.perf_counter()
+    due = start
+    while due < start + duration:
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        endpoint, path, body, content_type = _request(
+            rng, args.spread, args.tick_ratio, args.invalid_ratio)
+        connection.request('POST', path, body,
+                           {'Content-Type': content_type})
+        response = connection.getresponse()
+        response.read()
+        results[(endpoint, response.status)].append(time.perf_counter() - due)
+        due += interval
+    connection.close()
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1,
+                             int(fraction * len(sorted_values)))]
+
+
+def report(results, elapsed, timings=None):
+    total = sum(len(latencies) for latencies in results.values())
+    print('{} requests in {:.1f} s, {:.0f} per sec'.format(
+        total, elapsed, total / elapsed))
+    print('{:<6}{:>7}{:>9}{:>10}{:>10}{:>10}{:>10}'.format(
+        'path', 'status', 'count', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms'))
+    for (endpoint, status), latencies in sorted(results.items()):
+        latencies.sort()
+        print('{:<6}{:>7}{:>9}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}'.format(
+            endpoint, status, len(latencies),
+            1000 * _percentile(latencies, 0.5),
+            1000 * _percentile(latencies, 0.9),
+            1000 * _percentile(latencies, 0.99), 1000 * latencies[-1]))
+
+    print('\nlatency histogram, requests up to each bound in ms')
+    print('{:<12}'.format('') + ''.join('{:>7}'.format(bound)
+                                        for bound in BUCKETS_MS + ('inf',)))
+    for (endpoint, status), latencies in sorted(results.items()):
+        counts = [0] * (len(BUCKETS_MS) + 1)
+        for latency in latencies:
+            counts[bisect_left(BUCKETS_MS, 1000 * latency)] += 1
+        print('{:<12}'.format('{} {}'.format(endpoint, status))
+              + ''.join('{:>7}'.format(count) for count in counts))
+
+    if timings is None:
+        return
+    print('\nmean ms per request{:>14}{:>14}{:>10}'.format(
+        'client', 'simulation', 'share'))
+    for endpoint, method in (('book', 'book'), ('tick', 'increment_time')):
+        served = [latency for (name, status), values in results.items()
+                  if name == endpoint and status < 300 for latency in values]
+        if not served or not timings.get(method):
+            continue
+        client_ms = 1000 * sum(served) / len(served)
+        simulation_ms = 1000 * sum(timings[method]) / len(timings[method])
+        print('{:<19}{:>14.3f}{:>14.3f}{:>9.0%}'.format(
+            endpoint, client_ms, simulation_ms, simulation_ms / client_ms))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int,
+                        help='port of a running server, instead of starting one')
+    parser.add_argument('--rate', type=float, default=500,
+                        help='target requests per second, over all connections')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--connections', type=int, default=8)
+    parser.add_argument('--taxis', type=int, default=10000)
+    parser.add_argument('--spread', type=int, default=100)
+    parser.add_argument('--tick-ratio', type=float, default=0.05)
+    parser.add_argument('--invalid-ratio', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    port, server = args.port, None
+    if port is None:
+        port_connection, server_connection = multiprocessing.Pipe()
+        stop = multiprocessing.Event()
+        server = multiprocessing.Process(
+            target=_serve, args=(args.taxis, server_connection, stop))
+        server.start()
+        port = port_connection.recv()
+
+    results = defaultdict(list)
+    clients = [threading.Thread(
+        target=_drive,
+        args=(port, args.rate / args.connections, args.duration,
+              args.seed + client, args, results))
+        for client in range(args.connections)]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+
+    timings = None
+    if server is not None:
+        stop.set()
+        timings = port_connection.recv()
+        server.join()
+    report(results, elapsed, timings)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Replays a stream of booking operations against GridSimulation in-process.
+
+Operations are read one JSON object per line, named after the API endpoints:
+    {"op": "book", "booking": {"source": {...}, "destination": {...}}}
+    {"op": "book/batch", "bookings": [{...}, ...]}
+    {"op": "tick", "n": 1}
+    {"op": "reset"}
+
+Without a trace file, a synthetic workload is generated and replayed as it is
+streamed, or written out with --generate to be replayed later. Reports the
+throughput and latency percentiles of each operation, and peak RSS.
+
+Usage:
+    python -m benchmarks.replay --taxis 10000 --spread 100 --rate 20
+    python -m benchmarks.replay --generate > trace.jsonl
+    python -m benchmarks.replay --trace trace.jsonl --kernel step
+    python -m benchmarks.replay --metrics 0.01
+"""
+
+import argparse
+import json
+import random
+import resource
+import sys
+import time
+from booking.gridsimulation import GridSimulation
+from booking.metrics import SimulationMetrics
+from booking.point import Point
+from booking.tickkernels import ArrivalQueueKernel, VectorisedStepKernel
+from booking.trip import Trip
+
+
+KERNELS = {'queue': ArrivalQueueKernel, 'step': VectorisedStepKernel}
+
+
+def random_booking(rng, spread):
+    return {'source': {'x': rng.randint(-spread, spread),
+                       'y': rng.randint(-spread, spread)},
+            'destination': {'x': rng.randint(-spread, spread),
+                            'y': rng.randint(-spread, spread)}}
+
+
+def synthetic_operations(rng, num_ticks, spread, rate, batch_size=0):
+    """Yields the operations of a synthetic workload.
+
+    Args:
+        rng: A random.Random instance.
+        num_ticks: An integer number of time units to simulate.
+        spread: An integer largest coordinate of customer locations and
+            destinations, which are uniformly spread over the grid.
+        rate: A float mean number of bookings made per time unit.
+        batch_size: An integer number of bookings to make per book/batch
+            operation, or 0 to make each booking with a book operation.
+    """
+    for tick in range(num_ticks):
+        bookings = int(rate) + (rng.random() < rate - int(rate))
+        if batch_size:
+            for start in range(0, bookings, batch_size):
+                yield {'op': 'book/batch',
+                       'bookings': [random_booking(rng, spread) for booking
+                                    in range(min(batch_size, bookings - start))]}
+        else:
+            for booking in range(bookings):
+                yield {'op': 'book', 'booking': random_booking(rng, spread)}
+        yield {'op': 'tick', 'n': 1}
+
+
+def read_operations(lines):
+    """Yields the operations read from an iterable of JSON lines."""
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def replay(simulation, operations):
+    """Applies operations to simulation, timing every call made to it.
+
+    Trips are read before the clock is started, so only the simulation's own
+    work is timed.
+
+    Returns:
+        A tuple of a dictionary mapping operation names to lists of float
+        latencies in seconds, the integer number of successful bookings, and
+        the integer number of bookings made.
+    """
+    latencies = {'book': [], 'book/batch': [], 'tick': [], 'reset': []}
+    booked, bookings = 0, 0
+    for operation in operations:
+        name = operation['op']
+        if name == 'book':
+            trip = Trip(operation['booking'])
+            start = time.perf_counter()
+            result = simulation.book(trip)
+            bookings += 1
+            booked += result is not None
+        elif name == 'book/batch':
+            trips = [Trip(booking) for booking in operation['bookings']]
+            start = time.perf_counter()
+            results = simulation.book_batch(trips)
+            bookings += len(trips)
+            booked += sum(result is not None for result in results)
+        elif name == 'tick':
+            start = time.perf_counter()
+            simulation.increment_time(operation.get('n', 1))
+        elif name == 'reset':
+            start = time.perf_counter()
+            simulation.reset()
+        else:
+            raise ValueError('Unknown operation: {}'.format(name))
+        latencies[name].append(time.perf_counter() - start)
+    return latencies, booked, bookings
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1,
+                             int(fraction * len(sorted_values)))]
+
+
+def report(latencies, booked, bookings):
+    print('{:<12}{:>10}{:>14}{:>12}{:>12}'.format(
+        'operation', 'count', 'ops per sec', 'p50 us', 'p99 us'))
+    for name, values in latencies.items():
+        if not values:
+            continue
+        values.sort()
+        print('{:<12}{:>10}{:>14.0f}{:>12.1f}{:>12.1f}'.format(
+            name, len(values), len(values) / sum(values),
+            1e6 * percentile(values, 0.5), 1e6 * percentile(values, 0.99)))
+    booking_time = sum(latencies['book']) + sum(latencies['book/batch'])
+    if bookings:
+        print('bookings per sec: {:.0f} ({} of {} booked)'.format(
+            bookings / booking_time, booked, bookings))
+    # ru_maxrss is in kilobytes on Linux, and in bytes on macOS.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_rss //= 1024
+    print('peak RSS: {:.1f} MB'.format(peak_rss / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trace', help='JSON lines file of operations')
+    parser.add_argument('--generate', action='store_true',
+                        help='write the synthetic workload to stdout instead')
+    parser.add_argument('--taxis', type=int, default=10000)
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--spread', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=20.0,
+                        help='mean bookings per time unit')
+    parser.add_argument('--batch', type=int, default=0,
+                        help='bookings per book/batch operation, 0 for book')
+    parser.add_argument('--kernel', choices=sorted(KERNELS), default='queue')
+    parser.add_argument('--metrics', type=float, metavar='SAMPLE_RATE',
+                        help='collect metrics, sampling given fraction of calls')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    operations = synthetic_operations(random.Random(args.seed), args.ticks,
+                                      args.spread, args.rate, args.batch)
+    if args.generate:
+        for operation in operations:
+            sys.stdout.write(json.dumps(operation) + '\n')
+        return
+
+    metrics = SimulationMetrics(args.metrics) if args.metrics else None
+    simulation = GridSimulation(Point(0, 0), args.taxis,
+                                tick_kernel=KERNELS[args.kernel],
+                                metrics=metrics)
+    start = time.perf_counter()
+    if args.trace:
+        with open(args.trace) as trace:
+            results = replay(simulation, read_operations(trace))
+    else:
+        results = replay(simulation, operations)
+    print('replayed in {:.2f} s'.format(time.perf_counter() - start))
+    report(*results)
+
+
+if __name__ == '__main__':
+    main()
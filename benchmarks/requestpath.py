@@ -0,0 +1,95 @@
+"""Compares per-request latency of the Django and fast request paths.
+
+Calls the project's WSGI application in-process, without sockets, once as
+Django serves it and once wrapped in FastPathApplication, with the same mix
+of bookings and ticks, and reports latency percentiles per endpoint. Time
+spent in the simulation is the same for both, so the difference is the
+framework's overhead.
+
+Usage:
+    python -m benchmarks.requestpath --requests 20000
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import time
+
+
+def _environ(path, body=b'', query=''):
+    return {'REQUEST_METHOD': 'POST', 'PATH_INFO': path, 'SCRIPT_NAME': '',
+            'QUERY_STRING': query, 'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)), 'HTTP_HOST': 'localhost',
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body), 'wsgi.errors': io.StringIO()}
+
+
+def _requests(rng, num_requests, spread, tick_ratio):
+    for request in range(num_requests):
+        if rng.random() < tick_ratio:
+            yield 'tick', '/api/tick/', b''
+        else:
+            booking = {'source': {'x': rng.randint(-spread, spread),
+                                  'y': rng.randint(-spread, spread)},
+                       'destination': {'x': rng.randint(-spread, spread),
+                                       'y': rng.randint(-spread, spread)}}
+            yield 'book', '/api/book/', json.dumps(booking).encode()
+
+
+def measure(application, requests):
+    """Returns a dictionary of latencies in seconds of requests by endpoint."""
+    latencies = {'book': [], 'tick': []}
+
+    def start_response(status, headers):
+        pass
+
+    application(_environ('/api/reset/'), start_response)
+    for endpoint, path, body in requests:
+        environ = _environ(path, body)
+        start = time.perf_counter()
+        b''.join(application(environ, start_response))
+        latencies[endpoint].append(time.perf_counter() - start)
+    return latencies
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1,
+                             int(fraction * len(sorted_values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--spread', type=int, default=100)
+    parser.add_argument('--tick-ratio', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taxi.settings')
+    from django.core.wsgi import get_wsgi_application
+    from booking import codec
+    from booking.fastpath import FastPathApplication
+    django_application = get_wsgi_application()
+    paths = [('django', django_application),
+             ('fast path ({})'.format(codec.NAME),
+              FastPathApplication(django_application))]
+
+    print('{:<20}{:<6}{:>10}{:>10}{:>10}'.format(
+        'path', 'op', 'mean us', 'p50 us', 'p99 us'))
+    for name, application in paths:
+        requests = list(_requests(random.Random(args.seed), args.requests,
+                                  args.spread, args.tick_ratio))
+        for endpoint, latencies in sorted(
+                measure(application, requests).items()):
+            latencies.sort()
+            print('{:<20}{:<6}{:>10.1f}{:>10.1f}{:>10.1f}'.format(
+                name, endpoint, 1e6 * sum(latencies) / len(latencies),
+                1e6 * _percentile(latencies, 0.5),
+                1e6 * _percentile(latencies, 0.99)))
+
+
+if __name__ == '__main__':
+    main()
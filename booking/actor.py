@@ -0,0 +1,93 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SimulationActor:
+    """Serialises calls to a simulation through an asyncio queue.
+
+    Calls are queued by any number of coroutines and made one at a time, in
+    the order they were queued, by a single task. Each call is made on the
+    world the actor is given, e.g. the models module, whose operations hold
+    the simulation's lock and write the operation log, so calls made through
+    the actor are ordered, logged and snapshotted with those made by every
+    other thread. Calls run on a worker thread of their own, so the event loop
+    is never blocked waiting for the lock or for the log to be flushed.
+
+    Attributes:
+        _world: The object calls are made on, e.g. the models module.
+        _queue: An asyncio.Queue of (future, method name, args) tuples of
+            calls yet to be made, or None until started.
+        _task: The asyncio.Task draining _queue, or None until started.
+        _executor: A ThreadPoolExecutor with the one thread calls are made
+            on, or None until started.
+    """
+
+    def __init__(self, world):
+        """Initializes actor making calls on the given world.
+
+        Args:
+            world: The models module, a tenants.World, or any object with
+                the methods called, e.g. a GridSimulation used by nothing
+                else.
+        """
+        self._world = world
+        self._queue = None
+        self._task = None
+        self._executor = None
+
+    def start(self):
+        """Starts making queued calls on the current event loop, if not yet."""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            self._task = asyncio.ensure_future(self._drain())
+
+    async def stop(self):
+        """Stops making queued calls, waiting for the call being made, if any.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        # Waits for the call being made on the worker thread to finish.
+        self._executor.shutdown()
+        self._queue, self._task, self._executor = None, None, None
+
+    async def call(self, method, *args):
+        """Queues a call to the world and waits for it to be made.
+
+        Args:
+            method: A string name of the world's method to call.
+            *args: Arguments to call method with.
+
+        Returns:
+            The value returned by the method.
+
+        Raises:
+            Any exception raised by the method.
+        """
+        self.start()
+        future = asyncio.get_event_loop().create_future()
+        self._queue.put_nowait((future, method, args))
+        return await future
+
+    async def _drain(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            future, method, args = await self._queue.get()
+            if future.cancelled():
+                continue
+            try:
+                result = await loop.run_in_executor(
+                    self._executor, getattr(self._world, method), *args)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                if not future.cancelled():
+                    future.set_exception(error)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
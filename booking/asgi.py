@@ -0,0 +1,202 @@
+import json
+from urllib.parse import parse_qs
+from .actor import SimulationActor
+from .gridsimulation import MAX_TICKS, MAX_TIME
+from .trip import Trip
+
+
+_TEXT = b'text/html; charset=utf-8'
+_JSON = b'application/json'
+
+
+class BookingApplication:
+    """Serves the booking API as an ASGI application.
+
+    Serves only the book, book/batch, tick and reset endpoints of the Django
+    views in views.py, with the same responses, for JSON data; every other
+    path, e.g. /api/tickets/ or /api/sim/, answers 404, and wire format data
+    415, so must be served by the WSGI application. Requests are handled
+    without a thread per request: each by a coroutine on one event loop,
+    which queues its call to the simulation with a SimulationActor.
+
+    Requests are applied to the simulation one at a time, in the order they
+    were received in full, through the same world as the views. The actor
+    alone does not make the simulation's lock unnecessary, as the views,
+    snapshots and queries of the same process use the simulation too, so
+    its calls hold the same lock, and are logged, as the views' are.
+
+    Attributes:
+        _actor: The SimulationActor making calls on the world.
+        _routes: A dictionary mapping request paths to handler coroutines.
+    """
+
+    def __init__(self, world, prefix='/api/'):
+        """Initializes application serving the given world.
+
+        Args:
+            world: The models module, to serve the default simulation as the
+                views do, or any object with its book, book_batch,
+                increment_time and reset functions, e.g. a tenants.World.
+            prefix: A string path the endpoints are served under.
+        """
+        self._actor = SimulationActor(world)
+        self._routes = {
+            prefix + 'book/': self._book,
+            prefix + 'book/batch/': self._book_batch,
+            prefix + 'tick/': self._tick,
+            prefix + 'reset/': self._reset,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported scope type: {}'.format(scope['type']))
+
+        handler = self._routes.get(scope['path'])
+        if handler is None:
+            response = (404, _TEXT, b'Not Found')
+        elif scope['method'] != 'POST':
+            response = (405, _TEXT, b'')
+        else:
+            body = await _read_body(receive)
+            try:
+                response = await handler(scope, body)
+            except _BadRequest as error:
+                response = (error.status, _TEXT, error.content)
+        await _send_response(send, *response)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._actor.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self._actor.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _book(self, scope, body):
+        at_time = _read_at_time(scope)
+        trip = _read_trip(_decode_json(scope, body))
+        response = await self._book_ahead('book', trip, at_time)
+        if not response:
+            return (204, _TEXT, b'')
+        status = (202 if 'booking_id' in response or 'ticket_id' in response
+                  else 200)
+        return (status, _JSON, json.dumps(response).encode())
+
+    async def _book_batch(self, scope, body):
+        at_time = _read_at_time(scope)
+        bookings = _decode_json(scope, body)
+        if not isinstance(bookings, list):
+            raise _BadRequest(400, 'Expected a JSON array of bookings')
+        trips = [_read_trip(booking) for booking in bookings]
+        responses = await self._book_ahead('book_batch', trips, at_time)
+        scheduled = bool(responses) and 'booking_id' in (responses[0] or {})
+        return (202 if scheduled else 200, _JSON,
+                json.dumps(responses).encode())
+
+    async def _book_ahead(self, method, argument, at_time):
+        if at_time is None:
+            return await self._actor.call(method, argument)
+        try:
+            return await self._actor.call(method, argument, at_time)
+        except ValueError:
+            raise _BadRequest(400, 'Error reading booking data, or at is '
+                              'out of range')
+        except NotImplementedError:
+            raise _BadRequest(501, 'Bookings cannot be made ahead in this '
+                              'simulation')
+
+    async def _tick(self, scope, body):
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        try:
+            ticks = int(query.get('n', [1])[-1])
+        except ValueError:
+            ticks = 0
+        if ticks < 1:
+            raise _BadRequest(400, 'Expected n to be a positive integer')
+        if ticks > MAX_TICKS:
+            raise _BadRequest(400, 'Expected n to be at most {}'.format(
+                MAX_TICKS))
+        try:
+            await self._actor.call('increment_time', ticks)
+        except ValueError:
+            raise _BadRequest(400, 'Cannot advance time by {} '
+                              'ticks'.format(ticks))
+        return (204, _TEXT, b'')
+
+    async def _reset(self, scope, body):
+        await self._actor.call('reset')
+        return (204, _TEXT, b'')
+
+
+class _BadRequest(Exception):
+    """Raised by handlers to respond with an error status and text."""
+
+    def __init__(self, status, text):
+        super().__init__(text)
+        self.status = status
+        self.content = text.encode()
+
+
+def _decode_json(scope, body):
+    content_type = _content_type(scope)
+    if content_type != 'application/json':
+        raise _BadRequest(415, 'Expected Content-Type: application/json\n'
+                          + 'Received Content-Type: {}'.format(content_type))
+    try:
+        return json.loads(body.decode())
+    except ValueError:
+        raise _BadRequest(400, 'Error decoding JSON data')
+
+
+def _read_at_time(scope):
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    if 'at' not in query:
+        return None
+    try:
+        at_time = int(query['at'][-1])
+    except ValueError:
+        at_time = None
+    # Bounds at so that it cannot overflow the int64 times logged.
+    if at_time is None or abs(at_time) > MAX_TIME + MAX_TICKS:
+        raise _BadRequest(400, 'Expected at to be an integer time')
+    return at_time
+
+
+def _read_trip(booking):
+    try:
+        return Trip(booking)
+    except (KeyError, TypeError, ValueError):
+        raise _BadRequest(400, 'Error reading booking data')
+
+
+def _content_type(scope):
+    for name, value in scope['headers']:
+        if name.lower() == b'content-type':
+            return value.decode('latin-1').split(';')[0].strip()
+    return ''
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def _send_response(send, status, content_type, content):
+    headers = [(b'content-length', str(len(content)).encode())]
+    if status == 405:
+        headers.append((b'allow', b'POST'))
+    elif status != 204:
+        headers.append((b'content-type', content_type))
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': headers})
+    await send({'type': 'http.response.body', 'body': content})
@@ -0,0 +1,214 @@
+from itertools import islice
+import numpy as np
+
+
+_INFINITE_COST = np.iinfo(np.int64).max // 4
+
+
+def min_cost_assignment(cost):
+    """Solves the rectangular assignment problem for an integer cost matrix.
+
+    Uses the shortest augmenting path form of the Hungarian algorithm, with
+    each augmentation step vectorised over the columns of the matrix. Runs in
+    O(n^2 m) time for n rows and m columns.
+
+    Args:
+        cost: A 2D NumPy array of non-negative integer costs, with no more
+            rows than columns.
+
+    Returns:
+        A 1D NumPy array holding, for each row, the index of the column it is
+        assigned to. Every row is assigned a distinct column, minimising the
+        total cost. Among equally cheap columns, the smallest index is taken.
+    """
+    num_rows, num_cols = cost.shape
+    row_potential = np.zeros(num_rows + 1, dtype=np.int64)
+    col_potential = np.zeros(num_cols + 1, dtype=np.int64)
+    # Columns and rows are 1-based below; column 0 is the augmenting path's
+    # virtual starting column and row 0 stands for "unassigned".
+    col_owner = np.zeros(num_cols + 1, dtype=np.int64)
+    prev_col = np.zeros(num_cols + 1, dtype=np.int64)
+
+    for row in range(1, num_rows + 1):
+        col_owner[0] = row
+        col = 0
+        min_slack = np.full(num_cols + 1, _INFINITE_COST, dtype=np.int64)
+        visited = np.zeros(num_cols + 1, dtype=bool)
+        while True:
+            visited[col] = True
+            owner = col_owner[col]
+            slack = (cost[owner - 1] - row_potential[owner]
+                     - col_potential[1:])
+            unvisited = ~visited[1:]
+            improved = unvisited & (slack < min_slack[1:])
+            min_slack[1:][improved] = slack[improved]
+            prev_col[1:][improved] = col
+
+            candidates = np.where(unvisited, min_slack[1:], _INFINITE_COST)
+            next_col = int(np.argmin(candidates)) + 1
+            delta = candidates[next_col - 1]
+
+            row_potential[col_owner[visited]] += delta
+            col_potential[visited] -= delta
+            min_slack[~visited] -= delta
+
+            col = next_col
+            if col_owner[col] == 0:
+                break
+
+        while col:
+            col_owner[col] = col_owner[prev_col[col]]
+            col = prev_col[col]
+
+    assignment = np.empty(num_rows, dtype=np.int64)
+    assigned_cols = np.nonzero(col_owner[1:])[0]
+    assignment[col_owner[assigned_cols + 1] - 1] = assigned_cols
+    return assignment
+
+
+def pickup_cost_matrix(trips, taxi_xs, taxi_ys):
+    """Returns pickup times of every taxi to every trip's customer location.
+
+    Args:
+        trips: A list of Trip instances.
+        taxi_xs: A 1D NumPy int64 array of taxi x-coordinates.
+        taxi_ys: A 1D NumPy int64 array of taxi y-coordinates.
+
+    Returns:
+        A 2D NumPy int64 array with a row per trip and a column per taxi.
+    """
+    src_xs = np.array([trip.src.x for trip in trips], dtype=np.int64)
+    src_ys = np.array([trip.src.y for trip in trips], dtype=np.int64)
+    return (np.abs(src_xs[:, np.newaxis] - taxi_xs[np.newaxis, :])
+            + np.abs(src_ys[:, np.newaxis] - taxi_ys[np.newaxis, :]))
+
+
+class GreedyAssignment:
+    """Books each trip of a batch in turn with the closest available taxi.
+
+    This is the same as calling GridSimulation.book for every trip in order.
+    """
+
+    def assign(self, simulation, trips):
+        """Makes bookings for a batch of trips.
+
+        Args:
+            simulation: A GridSimulation instance to book taxis from.
+            trips: A list of Trip instances.
+
+        Returns:
+            A list with the result of GridSimulation.book for each trip.
+        """
+        return [simulation._book(trip) for trip in trips]
+
+
+class OptimalAssignment:
+    """Books a batch of trips minimising the batch's total pickup time.
+
+    A greedy booking takes the closest available taxi for each trip, which can
+    leave a later trip in the same batch with a much longer pickup. Instead,
+    the batch is matched against available taxis as a whole, so that as many
+    trips as possible are booked with the least total pickup time.
+
+    With max_candidates set, each trip only considers that many of its closest
+    available taxis, and the batch is matched against the union of those
+    candidates. The result is an approximation that stays fast with large
+    fleets, and is exact whenever no trip's best taxi lies outside the union.
+
+    Attributes:
+        max_candidates: An integer number of closest taxis to consider per trip,
+            or None to consider every available taxi.
+    """
+
+    def __init__(self, max_candidates=None):
+        """Initializes assignment with an optional per-trip candidate bound.
+
+        Args:
+            max_candidates: An integer number of closest taxis to consider per
+                trip, or None to consider every available taxi.
+        """
+        self.max_candidates = max_candidates
+
+    def assign(self, simulation, trips):
+        """Makes bookings for a batch of trips.
+
+        Invalid trips, i.e. trips that start and end at the same location, are
+        not booked. If there are more trips than available taxis, the trips
+        left without a taxi are not booked.
+
+        Args:
+            simulation: A GridSimulation instance to book taxis from.
+            trips: A list of Trip instances.
+
+        Returns:
+            A list with a dictionary for each booked trip, and None for each
+            trip not booked, in the format returned by GridSimulation.book.
+        """
+        results = [None] * len(trips)
+        bookable = [i for i, trip in enumerate(trips)
+                    if trip.travel_duration() != 0]
+        if not bookable or not len(simulation._free_taxi_index):
+            return results
+
+        bookable_trips = [trips[i] for i in bookable]
+        taxi_ids = self._candidate_taxis(simulation, bookable_trips)
+        rows = taxi_ids - 1
+        cost = pickup_cost_matrix(bookable_trips,
+                                  simulation._fleet.x[rows].astype(np.int64),
+                                  simulation._fleet.y[rows].astype(np.int64))
+
+        if len(bookable_trips) <= len(taxi_ids):
+            matches = enumerate(min_cost_assignment(cost))
+        else:
+            matches = ((trip, taxi)
+                       for taxi, trip in enumerate(min_cost_assignment(cost.T)))
+        for trip, taxi in sorted(matches):
+            results[bookable[trip]] = simulation._assign_taxi(
+                bookable_trips[trip], int(taxi_ids[taxi]),
+                int(cost[trip, taxi]))
+        return results
+
+    def _candidate_taxis(self, simulation, trips):
+        if self.max_candidates is None:
+            return simulation._fleet.free_taxi_ids()
+        candidates = set()
+        searches = []
+        for trip in trips:
+            nearest = (taxi_id for taxi_id, _
+                       in simulation._free_taxi_index.iter_nearest(trip.src))
+            candidates.update(islice(nearest, self.max_candidates))
+            searches.append(nearest)
+
+        # Trips sharing the same few candidates must not go unbooked while
+        # other taxis are available, so widen the searches until there are
+        # enough candidates to book every trip that greedy booking would.
+        wanted = min(len(trips), len(simulation._free_taxi_index))
+        while len(candidates) < wanted:
+            for nearest in searches:
+                for taxi_id in nearest:
+                    if taxi_id not in candidates:
+                        candidates.add(taxi_id)
+                        break
+                if len(candidates) == wanted:
+                    break
+        return np.array(sorted(candidates), dtype=np.int64)
+
+
+def make_assignment(name, max_candidates=None):
+    """Returns the assignment policy with the given name.
+
+    Args:
+        name: 'greedy' for a GreedyAssignment, or 'optimal' for an
+            OptimalAssignment.
+        max_candidates: An integer number of closest taxis an
+            OptimalAssignment considers per trip, or None for every available
+            taxi. Ignored by GreedyAssignment.
+
+    Raises:
+        ValueError: If there is no policy with the name.
+    """
+    if name == 'greedy':
+        return GreedyAssignment()
+    if name == 'optimal':
+        return OptimalAssignment(max_candidates)
+    raise ValueError('Unknown assignment policy {!r}'.format(name))
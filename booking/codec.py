@@ -0,0 +1,49 @@
+"""Encodes and decodes JSON with the fastest codec installed.
+
+Uses orjson if installed, otherwise ujson, otherwise the standard library's
+json module. All of them decode bytes and raise ValueError on invalid JSON.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+if orjson is not None:
+    NAME = 'orjson'
+
+    def loads(data):
+        """Returns the object decoded from JSON bytes."""
+        return orjson.loads(data)
+
+    def dumps(obj):
+        """Returns obj encoded as JSON bytes."""
+        return orjson.dumps(obj)
+elif ujson is not None:
+    NAME = 'ujson'
+
+    def loads(data):
+        """Returns the object decoded from JSON bytes."""
+        return ujson.loads(data)
+
+    def dumps(obj):
+        """Returns obj encoded as JSON bytes."""
+        return ujson.dumps(obj).encode()
+else:
+    NAME = 'json'
+
+    def loads(data):
+        """Returns the object decoded from JSON bytes."""
+        return json.loads(data)
+
+    def dumps(obj):
+        """Returns obj encoded as JSON bytes."""
+        return json.dumps(obj, separators=(',', ':')).encode()
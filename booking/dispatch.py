@@ -0,0 +1,129 @@
+"""Dispatch policies that also book taxis still on their way.
+
+By default, GridSimulation only books free taxis. A dispatch policy given to
+it may also chain a booking onto an occupied taxi, which then picks the
+customer up once it has dropped its current customer off.
+"""
+
+import heapq
+from .point import Point
+from .spatialindex import QuadTreeIndex
+
+
+class PredictiveDispatch:
+    """Books occupied taxis too, when they would reach a customer first.
+
+    An occupied taxi reaches a customer in the time it has left on its way,
+    plus the distance from its destination to the customer. When that is less
+    than the distance of the closest free taxi, or the same with a smaller
+    ID, the booking is chained onto the occupied taxi instead. A taxi takes
+    at most one chained booking.
+
+    Occupied taxis without a chained booking are kept in a spatial index by
+    destination. Every occupied taxi has at least 1 time unit left, so
+    destinations are searched in order of distance, and the search stops at
+    the first too far away for its taxi to reach the customer in time.
+
+    Attributes:
+        _fleet: The FleetStore of the simulation the policy dispatches.
+        _destinations: A spatial index, e.g. a QuadTreeIndex, of occupied
+            taxis without a chained booking and their destinations.
+        _handovers: A heap of (arrival_time, taxi_id) tuples of taxis with a
+            chained booking, started when they arrive.
+    """
+
+    def __init__(self, fleet, index_factory=QuadTreeIndex):
+        """Initializes policy for the given FleetStore.
+
+        Args:
+            fleet: The FleetStore of the simulation to dispatch.
+            index_factory: A callable returning an empty spatial index with
+                insert, insert_all, remove, clear and iter_nearest methods.
+        """
+        self._fleet = fleet
+        self._destinations = index_factory()
+        self._handovers = []
+
+    def reset(self):
+        """Forgets every occupied taxi."""
+        self._destinations.clear()
+        self._handovers.clear()
+
+    def rebuild(self):
+        """Starts tracking every taxi the FleetStore holds as occupied."""
+        fleet = self._fleet
+        taxi_ids = fleet.occupied_taxi_ids()
+        taxi_ids = taxi_ids[fleet.chained[taxi_ids - 1] == 0]
+        self._destinations.clear()
+        self._destinations.insert_all(taxi_ids, fleet.dst_x[taxi_ids - 1],
+                                      fleet.dst_y[taxi_ids - 1])
+        taxi_ids = fleet.chained_taxi_ids()
+        self._handovers = list(zip(
+            fleet.arrival_time[taxi_ids - 1].tolist(), taxi_ids.tolist()))
+        heapq.heapify(self._handovers)
+
+    def occupy(self, taxi_id):
+        """Starts tracking a taxi that has just been marked as occupied."""
+        self._destinations.insert(taxi_id, self._destination(taxi_id))
+
+    def find(self, location, time, closest=None):
+        """Finds the occupied taxi that would reach a customer first.
+
+        Args:
+            location: A Point instance of the customer's location.
+            time: The integer current time.
+            closest: A tuple of the ID of the closest free taxi and its
+                distance to location, or None if there is no free taxi.
+
+        Returns:
+            A tuple of the integer ID of the occupied taxi and the integer
+            time it would take to reach location, if it would beat closest,
+            or None otherwise.
+        """
+        best, found = closest, False
+        arrival_time = self._fleet.arrival_time
+        for taxi_id, dist in self._destinations.iter_nearest(location):
+            if best is not None and dist + 1 > best[1]:
+                break
+            wait = int(arrival_time[taxi_id - 1]) - time + dist
+            if best is None or (wait, taxi_id) < (best[1], best[0]):
+                best, found = (taxi_id, wait), True
+        return best if found else None
+
+    def chain(self, taxi_id):
+        """Stops offering a taxi that a booking was just chained onto."""
+        self._destinations.remove(taxi_id, self._destination(taxi_id))
+        heapq.heappush(self._handovers,
+                       (int(self._fleet.arrival_time[taxi_id - 1]), taxi_id))
+
+    def next_handover(self):
+        """Returns when the next taxi with a chained booking arrives, or None.
+        """
+        return self._handovers[0][0] if self._handovers else None
+
+    def arrive(self, time, taxi_ids):
+        """Stops tracking taxis reaching their destinations at a time.
+
+        Args:
+            time: The integer time advanced to, which must not be later than
+                next_handover() was before advancing.
+            taxi_ids: A list of the integer IDs of the arriving taxis.
+
+        Returns:
+            A list of the IDs of the arriving taxis with a chained booking to
+            start, in the order given.
+        """
+        while self._handovers and self._handovers[0][0] <= time:
+            heapq.heappop(self._handovers)
+        chained = self._fleet.chained
+        handed_over = []
+        for taxi_id in taxi_ids:
+            if chained[taxi_id - 1]:
+                handed_over.append(taxi_id)
+            else:
+                self._destinations.remove(taxi_id, self._destination(taxi_id))
+        return handed_over
+
+    def _destination(self, taxi_id):
+        row = taxi_id - 1
+        return Point(int(self._fleet.dst_x[row]), int(self._fleet.dst_y[row]))
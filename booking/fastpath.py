@@ -0,0 +1,226 @@
+import io
+from urllib.parse import parse_qs
+from django.conf import settings
+from django.core.exceptions import DisallowedHost
+from django.http import HttpRequest
+from . import codec, models, wire
+from .gridsimulation import MAX_TICKS
+from .trip import Trip
+
+
+_TEXT = 'text/html; charset=utf-8'
+_JSON = 'application/json'
+_MAX_CACHED_HOSTS = 1024
+_OK = '200 OK'
+_ACCEPTED = '202 Accepted'
+
+
+class FastPathApplication:
+    """Serves well-formed booking API requests without going through Django.
+
+    Wraps the project's WSGI application. A POST request to book/, book/batch/,
+    tick/ or reset/ from an allowed host, with a well-formed body, is served
+    directly: its JSON is decoded with the fastest codec installed, or its
+    trips with the wire format named by its Content-Type, the
+    simulation is called through models, and a response is sent with headers
+    encoded once, including those the security, common and clickjacking
+    middleware would add. No HttpRequest, middleware or URL resolution is
+    involved.
+
+    Every other request is passed on to the wrapped application, with its body
+    if already read, so that responses other than 200 and 204, e.g. 400, 405
+    and 415, are always made by the Django views and their status-code
+    contract is kept as it is. So are bookings with a query string, e.g.
+    those made ahead with at. The only exception is 202 for a booking left
+    waiting for a taxi, which is only known once the booking is made.
+
+    Attributes:
+        _application: The wrapped WSGI application.
+        _routes: A dictionary mapping request paths to handlers, which return
+            a (status, headers, content) tuple, or None to pass the request on.
+        _headers: A list of header tuples sent with every response.
+        _no_content: The (status, headers, content) tuple of a 204 response.
+        _allowed_hosts: A dictionary caching whether hosts are allowed.
+    """
+
+    def __init__(self, application, prefix='/api/'):
+        """Initializes fast path in front of the given WSGI application.
+
+        Args:
+            application: A WSGI application, e.g. Django's.
+            prefix: A string path the booking API is served under.
+        """
+        self._application = application
+        self._routes = {}
+        # Requests are left to Django if it would redirect or reject them.
+        if not (settings.SECURE_SSL_REDIRECT
+                or settings.DISALLOWED_USER_AGENTS):
+            self._routes = {
+                prefix + 'book/': self._book,
+                prefix + 'book/batch/': self._book_batch,
+                prefix + 'tick/': self._tick,
+                prefix + 'reset/': self._reset,
+            }
+        self._headers = _middleware_headers()
+        self._no_content = ('204 No Content', self._content_headers(_TEXT, 0),
+                            b'')
+        self._allowed_hosts = {}
+
+    def __call__(self, environ, start_response):
+        handler = self._routes.get(environ.get('PATH_INFO'))
+        if (handler is None or environ['REQUEST_METHOD'] != 'POST'
+                or not self._is_allowed_host(environ)):
+            return self._application(environ, start_response)
+
+        try:
+            body = environ['wsgi.input'].read(
+                int(environ.get('CONTENT_LENGTH') or 0))
+        except ValueError:
+            return self._application(environ, start_response)
+        response = handler(environ, body)
+        if response is None:
+            environ['wsgi.input'] = io.BytesIO(body)
+            return self._application(environ, start_response)
+        status, headers, content = response
+        start_response(status, headers)
+        return [content]
+
+    def _book(self, environ, body):
+        if environ.get('QUERY_STRING'):
+            return None
+        wire_format = wire.FORMATS.get(_content_type(environ))
+        if wire_format is not None:
+            trips = _decode_trips(wire_format, body, batch=False)
+            if trips is None:
+                return None
+            response = models.book(trips[0])
+            if not response:
+                return self._no_content
+            return self._wire_response(wire_format,
+                                       wire_format.encode_result(response),
+                                       _booking_status(response))
+
+        trip = _read_trip(_decode_json(environ, body))
+        if trip is None:
+            return None
+        response = models.book(trip)
+        if not response:
+            return self._no_content
+        return self._json_response(response, _booking_status(response))
+
+    def _book_batch(self, environ, body):
+        if environ.get('QUERY_STRING'):
+            return None
+        wire_format = wire.FORMATS.get(_content_type(environ))
+        if wire_format is not None:
+            trips = _decode_trips(wire_format, body, batch=True)
+            if trips is None:
+                return None
+            results = models.book_batch(trips)
+            return self._wire_response(wire_format,
+                                       wire_format.encode_results(results))
+
+        bookings = _decode_json(environ, body)
+        if not isinstance(bookings, list):
+            return None
+        trips = [_read_trip(booking) for booking in bookings]
+        if None in trips:
+            return None
+        return self._json_response(models.book_batch(trips))
+
+    def _tick(self, environ, body):
+        query = parse_qs(environ.get('QUERY_STRING', ''),
+                         keep_blank_values=True)
+        try:
+            ticks = int(query.get('n', [1])[-1])
+        except ValueError:
+            return None
+        if not 1 <= ticks <= MAX_TICKS:
+            return None
+        try:
+            models.increment_time(ticks)
+        except ValueError:
+            return None
+        return self._no_content
+
+    def _reset(self, environ, body):
+        models.reset()
+        return self._no_content
+
+    def _json_response(self, obj, status=_OK):
+        content = codec.dumps(obj)
+        return (status, self._content_headers(_JSON, len(content)), content)
+
+    def _wire_response(self, wire_format, content, status=_OK):
+        return (status,
+                self._content_headers(wire_format.content_type, len(content)),
+                content)
+
+    def _content_headers(self, content_type, length):
+        return ([('Content-Type', content_type),
+                 ('Content-Length', str(length))] + self._headers)
+
+    def _is_allowed_host(self, environ):
+        key = (environ.get('HTTP_HOST'), environ.get('HTTP_X_FORWARDED_HOST'),
+               environ.get('SERVER_NAME'), environ.get('SERVER_PORT'),
+               environ.get('wsgi.url_scheme'))
+        allowed = self._allowed_hosts.get(key)
+        if allowed is None:
+            request = HttpRequest()
+            request.META = environ
+            try:
+                request.get_host()
+                allowed = True
+            except DisallowedHost:
+                allowed = False
+            if len(self._allowed_hosts) < _MAX_CACHED_HOSTS:
+                self._allowed_hosts[key] = allowed
+        return allowed
+
+
+def _booking_status(response):
+    return _ACCEPTED if 'ticket_id' in response else _OK
+
+
+def _content_type(environ):
+    return environ.get('CONTENT_TYPE', '').split(';')[0].strip()
+
+
+def _decode_json(environ, body):
+    """Returns decoded JSON body, or None if Django should respond instead."""
+    if _content_type(environ) != 'application/json':
+        return None
+    try:
+        return codec.loads(body)
+    except ValueError:
+        return None
+
+
+def _decode_trips(wire_format, body, batch):
+    try:
+        return wire_format.decode_trips(body, batch)
+    except ValueError:
+        return None
+
+
+def _read_trip(booking):
+    try:
+        return Trip(booking)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _middleware_headers():
+    """Returns the headers the installed middleware adds to API responses."""
+    headers = []
+    middleware = settings.MIDDLEWARE
+    if 'django.middleware.security.SecurityMiddleware' in middleware:
+        if settings.SECURE_CONTENT_TYPE_NOSNIFF:
+            headers.append(('X-Content-Type-Options', 'nosniff'))
+        if settings.SECURE_BROWSER_XSS_FILTER:
+            headers.append(('X-XSS-Protection', '1; mode=block'))
+    if 'django.middleware.clickjacking.XFrameOptionsMiddleware' in middleware:
+        headers.append(('X-Frame-Options',
+                        getattr(settings, 'X_FRAME_OPTIONS', 'SAMEORIGIN')
+                        .upper()))
+    return headers
@@ -0,0 +1,335 @@
+import numpy as np
+from .point import MAX_COORDINATE, MIN_COORDINATE, Point, manhattan_dist
+
+
+FREE = 0
+OCCUPIED = 1
+ABSENT = 2
+RETIRED = 3
+
+COLUMNS = (
+    ('x', np.int32),
+    ('y', np.int32),
+    ('pickup_x', np.int32),
+    ('pickup_y', np.int32),
+    ('dst_x', np.int32),
+    ('dst_y', np.int32),
+    ('departure_time', np.int64),
+    ('arrival_time', np.int64),
+    ('status', np.int8),
+    ('start_x', np.int32),
+    ('start_y', np.int32),
+    ('next_pickup_x', np.int32),
+    ('next_pickup_y', np.int32),
+    ('next_dst_x', np.int32),
+    ('next_dst_y', np.int32),
+    ('chained', np.int8),
+)
+
+# Bytes the columns take per taxi.
+BYTES_PER_TAXI = sum(np.dtype(dtype).itemsize for name, dtype in COLUMNS)
+
+
+def read_starting_points(path):
+    """Reads the locations a fleet of taxis start from out of a file.
+
+    Args:
+        path: A path to a NumPy .npy file of an array of shape (taxis, 2), or
+            to a text file with a line "x,y" per taxi.
+
+    Returns:
+        A NumPy int64 array of shape (taxis, 2) of the x and y coordinates of
+        where each taxi starts from, in taxi ID order.
+
+    Raises:
+        ValueError: If the file does not hold valid coordinate pairs.
+    """
+    if path.endswith('.npy'):
+        points = np.load(path)
+    else:
+        points = np.loadtxt(path, delimiter=',', dtype=np.int64, ndmin=2)
+    return _checked_points(points)
+
+
+def _checked_points(points):
+    points = np.asarray(points)
+    if points.ndim != 2 or points.shape[1] != 2 or not (
+            np.issubdtype(points.dtype, np.integer) or not points.size):
+        raise ValueError('Expected an array of x and y coordinate pairs')
+    points = points.astype(np.int64)
+    if points.size and (points.min() < MIN_COORDINATE
+                        or points.max() > MAX_COORDINATE):
+        raise ValueError('Coordinates are outside of the grid')
+    return points
+
+
+class FleetStore:
+    """Stores the state of a fleet of taxis in parallel NumPy columns.
+
+    Row i of every column describes the taxi with ID i + 1, so taxi IDs are
+    implied by row order rather than stored. Coordinates are stored as 32 bit
+    integers, matching the extent of the grid, times as 64 bit integers, and
+    statuses and flags as 8 bit integers, which takes BYTES_PER_TAXI, i.e. 66,
+    bytes per taxi.
+
+    Attributes:
+        x: A column of x-coordinates of where free taxis are, and of where
+            occupied taxis set off from.
+        y: A column of the matching y-coordinates.
+        pickup_x: A column of x-coordinates of occupied taxis' customers.
+        pickup_y: A column of the matching y-coordinates.
+        dst_x: A column of x-coordinates of occupied taxis' destinations.
+        dst_y: A column of the matching y-coordinates.
+        departure_time: A column of the times occupied taxis were booked.
+        arrival_time: A column of the times occupied taxis reach their
+            destinations.
+        status: A column of taxi states, FREE, OCCUPIED, ABSENT for taxis
+            the store does not currently hold, e.g. those owned by another
+            shard of a ShardedSimulation, or RETIRED for taxis taken out of
+            service.
+        start_x: A column of x-coordinates of where taxis start from.
+        start_y: A column of the matching y-coordinates.
+        next_pickup_x: A column of x-coordinates of the customers of bookings
+            chained onto occupied taxis.
+        next_pickup_y: A column of the matching y-coordinates.
+        next_dst_x: A column of x-coordinates of the destinations of bookings
+            chained onto occupied taxis.
+        next_dst_y: A column of the matching y-coordinates.
+        chained: A column of flags set for occupied taxis with a booking
+            chained onto them, started when they reach their destinations.
+        _changed: A list of the rows of taxis changed since the last reset,
+            so that only those are reset, or None if not known.
+        _reset_status: The status the store was last reset to.
+    """
+
+    _changed = None
+    _reset_status = None
+    # Stores whose columns are also changed by others, e.g. other processes
+    # sharing them, cannot know which rows changed.
+    _tracks_changes = True
+
+    def __init__(self, num_taxis):
+        """Initializes store with given number of free taxis at (0, 0).
+
+        Args:
+            num_taxis: An integer number of taxis to store.
+        """
+        for name, dtype in COLUMNS:
+            setattr(self, name, np.zeros(num_taxis, dtype=dtype))
+
+    def __len__(self):
+        return len(self.status)
+
+    def copy(self):
+        """Returns a FleetStore holding a copy of every column of this one."""
+        fleet = FleetStore(0)
+        for name, dtype in COLUMNS:
+            setattr(fleet, name, getattr(self, name).copy())
+        return fleet
+
+    def is_free(self, taxi_id):
+        """Returns True if the taxi with given ID is free, False otherwise."""
+        return self.status[taxi_id - 1] == FREE
+
+    def location(self, taxi_id):
+        """Returns the Point a free taxi is at, or an occupied taxi set off from.
+        """
+        return Point(int(self.x[taxi_id - 1]), int(self.y[taxi_id - 1]))
+
+    def route(self, taxi_id):
+        """Returns the route an occupied taxi was booked on.
+
+        Returns:
+            A tuple of the Point locations the taxi set off from, picks the
+            customer up at and drops the customer off at, and the integer time
+            it set off at.
+        """
+        row = taxi_id - 1
+        return (Point(int(self.x[row]), int(self.y[row])),
+                Point(int(self.pickup_x[row]), int(self.pickup_y[row])),
+                Point(int(self.dst_x[row]), int(self.dst_y[row])),
+                int(self.departure_time[row]))
+
+    def free_taxi_ids(self):
+        """Returns a NumPy array of the IDs of free taxis in ascending order."""
+        return np.flatnonzero(self.status == FREE) + 1
+
+    def occupied_taxi_ids(self):
+        """Returns a NumPy array of the IDs of occupied taxis in ascending order.
+        """
+        return np.flatnonzero(self.status == OCCUPIED) + 1
+
+    def chained_taxi_ids(self):
+        """Returns a NumPy array of the IDs of chained taxis in ascending order.
+
+        Chained taxis are occupied taxis with a booking chained onto them.
+        """
+        return np.flatnonzero((self.status == OCCUPIED)
+                              & (self.chained != 0)) + 1
+
+    def occupy(self, taxi_id, pickup, destination, departure_time,
+               arrival_time):
+        """Marks a free taxi as occupied, travelling on the given route.
+
+        Args:
+            taxi_id: An integer ID of a free taxi.
+            pickup: A Point instance of the customer's location.
+            destination: A Point instance of the customer's destination.
+            departure_time: An integer time the taxi sets off at.
+            arrival_time: An integer time the taxi reaches destination at.
+        """
+        row = taxi_id - 1
+        self._record_change(row)
+        self.pickup_x[row] = pickup.x
+        self.pickup_y[row] = pickup.y
+        self.dst_x[row] = destination.x
+        self.dst_y[row] = destination.y
+        self.departure_time[row] = departure_time
+        self.arrival_time[row] = arrival_time
+        self.chained[row] = 0
+        self.status[row] = OCCUPIED
+
+    def chain(self, taxi_id, pickup, destination):
+        """Chains a booking onto an occupied taxi, to start at its destination.
+
+        Args:
+            taxi_id: An integer ID of an occupied taxi with no booking chained
+                onto it.
+            pickup: A Point instance of the chained customer's location.
+            destination: A Point instance of the chained customer's
+                destination.
+        """
+        row = taxi_id - 1
+        self.next_pickup_x[row] = pickup.x
+        self.next_pickup_y[row] = pickup.y
+        self.next_dst_x[row] = destination.x
+        self.next_dst_y[row] = destination.y
+        self.chained[row] = 1
+
+    def start_chained(self, taxi_id):
+        """Sets an occupied taxi off on the booking chained onto it.
+
+        The taxi sets off from its destination at its arrival time, as if
+        booked there and then.
+
+        Args:
+            taxi_id: An integer ID of a taxi with a booking chained onto it.
+        """
+        row = taxi_id - 1
+        origin = Point(int(self.dst_x[row]), int(self.dst_y[row]))
+        pickup = Point(int(self.next_pickup_x[row]),
+                       int(self.next_pickup_y[row]))
+        destination = Point(int(self.next_dst_x[row]),
+                            int(self.next_dst_y[row]))
+        departure_time = int(self.arrival_time[row])
+        self.x[row] = origin.x
+        self.y[row] = origin.y
+        self.occupy(taxi_id, pickup, destination, departure_time,
+                    departure_time + manhattan_dist(origin, pickup)
+                    + manhattan_dist(pickup, destination))
+
+    def free(self, taxi_ids):
+        """Marks occupied taxis as free at their destinations.
+
+        Args:
+            taxi_ids: A sequence of integer IDs of occupied taxis.
+        """
+        rows = np.asarray(taxi_ids, dtype=np.int64) - 1
+        self.x[rows] = self.dst_x[rows]
+        self.y[rows] = self.dst_y[rows]
+        self.status[rows] = FREE
+
+    def set_starts(self, starting_point, starting_points=None):
+        """Sets where each taxi starts from when the store is reset.
+
+        Args:
+            starting_point: A Point instance of where every taxi starts from,
+                if starting_points is None.
+            starting_points: An array-like of shape (taxis, 2) of the x and y
+                coordinates of where each taxi starts from, or None.
+
+        Raises:
+            ValueError: If starting_points is not a coordinate pair per taxi.
+        """
+        self._changed = None
+        if starting_points is None:
+            self.start_x.fill(starting_point.x)
+            self.start_y.fill(starting_point.y)
+            return
+        points = _checked_points(starting_points)
+        if len(points) != len(self):
+            raise ValueError('Expected {} starting points, got {}'.format(
+                len(self), len(points)))
+        self.start_x[:] = points[:, 0]
+        self.start_y[:] = points[:, 1]
+
+    def append(self, starting_points):
+        """Adds free taxis at the locations they start from to the store.
+
+        Args:
+            starting_points: An array-like of shape (taxis, 2) of the x and y
+                coordinates of where each new taxi starts from.
+
+        Returns:
+            A NumPy array of the IDs of the new taxis in ascending order.
+
+        Raises:
+            ValueError: If starting_points are not coordinate pairs.
+        """
+        points = _checked_points(starting_points)
+        num_taxis = len(self)
+        for name, dtype in COLUMNS:
+            setattr(self, name, np.concatenate(
+                (getattr(self, name), np.zeros(len(points), dtype=dtype))))
+        self.start_x[num_taxis:] = self.x[num_taxis:] = points[:, 0]
+        self.start_y[num_taxis:] = self.y[num_taxis:] = points[:, 1]
+        if self._reset_status != FREE:
+            self._changed = None
+        return np.arange(num_taxis + 1, len(self) + 1)
+
+    def place(self, taxi_id, location):
+        """Marks a taxi as free at the given Point location."""
+        row = taxi_id - 1
+        self._record_change(row)
+        self.x[row] = location.x
+        self.y[row] = location.y
+        self.status[row] = FREE
+
+    def remove(self, taxi_id):
+        """Marks a taxi as absent from the store."""
+        self._record_change(taxi_id - 1)
+        self.status[taxi_id - 1] = ABSENT
+
+    def retire(self, taxi_id):
+        """Marks a taxi as retired, which it stays even if the store is reset.
+        """
+        self.status[taxi_id - 1] = RETIRED
+
+    def reset(self, status=FREE):
+        """Marks every taxi but retired ones as free where it starts from.
+
+        Only the taxis changed since the last reset to the same status are
+        reset, when known, so resetting costs O(changed taxis) rather than
+        O(taxis).
+
+        Args:
+            status: FREE, or ABSENT to empty the store instead.
+        """
+        if self._changed is not None and status == self._reset_status:
+            rows = np.array(self._changed, dtype=np.int64)
+            self.x[rows] = self.start_x[rows]
+            self.y[rows] = self.start_y[rows]
+            self.status[rows[self.status[rows] != RETIRED]] = status
+        else:
+            self.x[:] = self.start_x
+            self.y[:] = self.start_y
+            self.status[self.status != RETIRED] = status
+        self._changed = [] if self._tracks_changes else None
+        self._reset_status = status
+
+    def _record_change(self, row):
+        if self._changed is not None:
+            self._changed.append(row)
+            # Past this, resetting every taxi is about as quick.
+            if len(self._changed) > len(self) // 4:
+                self._changed = None
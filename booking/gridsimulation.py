@@ -1,5 +1,16 @@
-from sortedcontainers import SortedDict
-from .point import manhattan_dist
+import numpy as np
+from .assignment import GreedyAssignment
+from .fleet import FREE, OCCUPIED, FleetStore
+from .schedule import BookingSchedule
+from .snapshot import SnapshotFleetStore, write
+from .spatialindex import QuadTreeIndex
+from .tickkernels import ArrivalQueueKernel
+
+
+# The most time units time can be advanced by at once, and the latest time it
+# can reach, leaving room in the int64 time columns for the longest trip.
+MAX_TICKS = 2 ** 20
+MAX_TIME = 2 ** 62
 
 
 class GridSimulation:
@@ -11,125 +22,669 @@ class GridSimulation:
     Point at any time.
 
     The number of simulated taxis and their starting Point locations are
-    defined during instantiation. Simulated taxis have IDs, ranging from 1 to
-    _NUM_TAXIS, that persist across available and occupied states.
+    defined during instantiation, either a single Point for the whole fleet or
+    one per taxi. Simulated taxis have IDs, ranging from 1 to _NUM_TAXIS, that
+    persist across available and occupied states. Taxis can be added, with
+    the next IDs, and free taxis retired while the simulation runs; retired
+    taxis keep their IDs, so the IDs of other taxis never change.
+
+    The state of every taxi, available or occupied, is kept in the columns of
+    a FleetStore, _fleet. Available taxis are additionally kept in a spatial
+    index so that the closest one can be found without scanning the whole
+    fleet.
+
+    Resetting does not depend on the size of the fleet: the index of the
+    fleet where it starts from is kept as a checkpoint when first built, and
+    restored on every later reset, and only the taxis of the FleetStore
+    changed since the last reset are reset.
+
+    Occupied taxis are moved and freed by a tick kernel. By default, an
+    ArrivalQueueKernel queues them by arrival time, which is known when they
+    are booked, and frees them when the simulation clock reaches it; the
+    location of a taxi on its way is only computed when asked for, from the
+    route it was booked on.
+
+    Given a dispatch policy, e.g. PredictiveDispatch, a booking may instead be
+    chained onto an occupied taxi that would reach the customer sooner than
+    any free one. The taxi starts on it when it reaches its destination, and
+    time is advanced in steps up to each such handover, so that the chained
+    booking sets off exactly when the taxi arrives, whatever the tick kernel.
+
+    Given a waiting queue, e.g. a FifoQueue, a booking no taxi is found for
+    is not turned away but given a ticket, and booked once a taxi is freed or
+    added, as the queue decides.
+
+    Bookings can also be made ahead, for a later time: they are kept in a
+    BookingSchedule until time is advanced to when they are due, and then
+    made together, as a batch.
 
-    A taxi's state is determined by which SortedDict its ID is a key in:
-    _free_taxis for available taxis, and _occupied_taxis for occupied taxis.
-    The two states are mutually exclusive.
+    The state of a simulation can be saved to a snapshot file, and a new
+    simulation loaded from it, e.g. to survive a restart.
+
+    Given a SimulationMetrics instance, the simulation also counts and times
+    the bookings it makes and the time it advances.
 
     Attributes:
-        _STARTING_POINT: A Point instance of where all taxis start from.
-        _NUM_TAXIS: An integer number of taxis to simulate.
-        _free_taxis: A SortedDict of Taxi IDs of available taxis mapped to
-            their current Point locations.
-        _occupied_taxis: A SortedDict of Taxi IDs of occupied taxis mapped to
-            dictionaries containing travelling data with keys 'destination' and
-            'time_left' mapped to the Point location of the taxi's destination
-            and integer time left before reaching the destination respectively.
+        _STARTING_POINT: A Point instance of where all taxis start from,
+            unless given a starting point each.
+        _NUM_TAXIS: An integer number of taxis simulated, including retired
+            ones.
+        _fleet: A FleetStore of the locations, routes and states of all taxis.
+        _free_taxi_index: A spatial index, e.g. a QuadTreeIndex, of available
+            taxis and their current Point locations.
+        _tick_kernel: A tick kernel, e.g. an ArrivalQueueKernel, tracking
+            occupied taxis on their way.
+        _time: An integer number of time units elapsed since the last reset.
+        _schedule: A BookingSchedule of the bookings made ahead since the
+            last reset.
+        _dispatch: A dispatch policy, e.g. a PredictiveDispatch, offering
+            occupied taxis for bookings, or None to only book free taxis.
+        _waiting: A WaitingQueue, e.g. a FifoQueue, of the bookings left
+            waiting for a taxi since the last reset, or None to turn them
+            away.
+        _metrics: A SimulationMetrics instance observing the simulation, or
+            None.
+        _baseline: A checkpoint of _free_taxi_index holding every taxi in
+            service where it starts from, or None until the next reset if the
+            fleet in service has changed since.
     """
 
-    def __init__(self, starting_point, num_taxis):
+    def __init__(self, starting_point, num_taxis, index_factory=QuadTreeIndex,
+                 assignment=None, tick_kernel=ArrivalQueueKernel, fleet=None,
+                 time=0, metrics=None, starting_points=None, schedule=None,
+                 dispatch=None, waiting=None, tickets=None):
         """Initializes simulation with given number of taxis at starting Point.
 
         Args:
             starting_point: A Point instance of where all taxis start from.
             num_taxis: An integer number of taxis to simulate.
+            index_factory: A callable returning an empty spatial index with
+                insert, insert_all, remove, clear and nearest methods, used
+                to look up the closest available taxi, e.g. QuadTreeIndex or
+                LinearScanIndex.
+            assignment: An assignment policy used by book_batch, e.g.
+                GreedyAssignment or OptimalAssignment. Defaults to
+                GreedyAssignment.
+            tick_kernel: A callable taking the simulation's FleetStore and
+                returning a tick kernel used to advance time, e.g.
+                ArrivalQueueKernel or VectorisedStepKernel.
+            fleet: A FleetStore of num_taxis taxis to resume the simulation
+                from, as it was at the given time. Defaults to a new
+                FleetStore with all taxis available at starting_point.
+            time: An integer time fleet was at, if fleet is given.
+            metrics: A SimulationMetrics instance to observe the simulation
+                with, or None to collect no metrics.
+            starting_points: An array-like of shape (num_taxis, 2) of the x
+                and y coordinates of where each taxi starts from, in ID
+                order, e.g. from fleet.read_starting_points(), or None for
+                every taxi to start from starting_point. Ignored if fleet is
+                given, which holds its own.
+            schedule: A BookingSchedule of the bookings made ahead to resume
+                the simulation with, if fleet is given. Defaults to an empty
+                one.
+            dispatch: A callable taking the simulation's FleetStore and
+                returning a dispatch policy that may chain bookings onto
+                occupied taxis, e.g. PredictiveDispatch, or None to only book
+                free taxis. Used by book(), and by book_batch() with
+                GreedyAssignment.
+            waiting: A callable returning an empty waiting queue, e.g.
+                FifoQueue or NearestFirstQueue, to leave bookings no taxi is
+                found for waiting for one, or None to turn them away.
+            tickets: An array of the waiting.TICKET_DTYPE records of the
+                tickets given out to resume the simulation with, if fleet is
+                given. Defaults to none.
+
+        Raises:
+            ValueError: If starting_points is not a coordinate pair per taxi,
+                if fleet has bookings chained onto taxis but no dispatch
+                policy is given to start them, or if tickets are given but no
+                waiting queue to keep them.
         """
         self._STARTING_POINT = starting_point
         self._NUM_TAXIS = num_taxis
-        self._free_taxis = SortedDict()
-        self._occupied_taxis = SortedDict()
-        self.reset()
+        self._fleet = fleet if fleet is not None else FleetStore(num_taxis)
+        self._free_taxi_index = index_factory()
+        self._assignment = assignment or GreedyAssignment()
+        self._tick_kernel = tick_kernel(self._fleet)
+        self._time = time
+        self._schedule = (schedule if schedule is not None
+                          else BookingSchedule())
+        self._dispatch = (dispatch(self._fleet) if dispatch is not None
+                          else None)
+        self._waiting = waiting() if waiting is not None else None
+        if tickets is not None and len(tickets):
+            if self._waiting is None:
+                raise ValueError('Tickets were given out, which only a '
+                                 'waiting queue keeps')
+            self._waiting.restore(tickets)
+        self._metrics = metrics
+        self._baseline = None
+        if fleet is None:
+            self._fleet.set_starts(starting_point, starting_points)
+            self.reset()
+        else:
+            self._rebuild()
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Returns a simulation resumed from a snapshot file.
+
+        The snapshot's columns are memory-mapped rather than read, so only the
+        tick kernel and the schedule of bookings made ahead are built when
+        loading. The spatial index of available taxis is built by the first
+        operation using it, e.g. the first booking, which for a million taxis
+        spread over many locations takes seconds.
+
+        Args:
+            path: A path to a file written by save().
+            **kwargs: Further keyword arguments for the simulation, except
+                starting_point, num_taxis, fleet, time, schedule and tickets,
+                which are read from the snapshot.
+
+        Raises:
+            ValueError: If the file is not a complete snapshot, or has
+                bookings chained onto taxis and no dispatch policy is given,
+                or tickets and no waiting queue.
+        """
+        fleet = SnapshotFleetStore(path)
+        return cls(fleet.starting_point, len(fleet), fleet=fleet,
+                   time=fleet.time,
+                   schedule=BookingSchedule.from_records(fleet.scheduled),
+                   tickets=fleet.tickets, **kwargs)
 
-    def book(self, trip):
+    def save(self, path):
+        """Writes a snapshot of the simulation to a file, to load() it from.
+
+        Args:
+            path: A path to the file to write, which is replaced atomically.
+        """
+        write(path, self._fleet, self._time, self._STARTING_POINT,
+              self._schedule.to_records(), self._ticket_records())
+
+    def capture(self):
+        """Returns a copy of the simulation's state, to be written later.
+
+        Returns:
+            A tuple of a copy of the FleetStore of all taxis, the integer
+            current time, the Point taxis start from, and arrays of the
+            bookings made ahead and of the tickets given out, as taken by
+            snapshot.write().
+        """
+        return (self._fleet.copy(), self._time, self._STARTING_POINT,
+                self._schedule.to_records(), self._ticket_records())
+
+    def capture_fleet(self):
+        """Returns a copy of the simulation's taxis, e.g. to be queried later.
+
+        Unlike capture(), leaves out the bookings made ahead and the tickets,
+        so it takes no longer than copying the fleet.
+
+        Returns:
+            A tuple of a copy of the FleetStore of all taxis and the integer
+            current time.
+        """
+        return self._fleet.copy(), self._time
+
+    def book(self, trip, at_time=None):
         """Makes a booking with given trip details.
 
         Assigns the closest available taxi to the customer. If more than one
         taxi qualifies, the taxi with the smallest ID is assigned to the
         customer. An available taxi can be assigned only one booking.
 
+        With a dispatch policy given during instantiation, an occupied taxi
+        may be booked instead, if it would pick the customer up sooner after
+        dropping off its current customer; the booking is then chained onto
+        it, and its total time includes the time the taxi has left on its way.
+
+        With a waiting queue given during instantiation, a valid booking no
+        taxi is found for is instead left waiting, and made once a taxi is
+        freed or added, as the queue decides. Its result is then read with
+        ticket().
+
         Booking fails if there are no available taxis, or if the trip is
         invalid, i.e. it starts and ends at the same location.
 
+        Given a later time, the booking is instead scheduled, and made when
+        time is advanced to it, after freeing the taxis arriving by then, in
+        the order it was scheduled among the bookings due at the same time.
+        Its result is then read with scheduled_booking().
+
         Args:
             trip: a Trip instance containing the customer's location and
                 destination of the trip to be booked.
+            at_time: an integer time to make the booking at, or None for now.
 
         Returns:
             a dictionary if booking succeeds, None otherwise. Dictionary has
             keys 'car_id' and 'total_time', containing the ID of taxi booked,
             and the total time needed for the taxi to travel from its current
             location to pick the customer up at the customer's location and to
-            drop the customer off at the customer's destination.
+            drop the customer off at the customer's destination. If the
+            booking is scheduled, a dictionary with keys 'booking_id' and
+            'time', containing the ID of the booking and the time it is made
+            at. If the booking is left waiting, a dictionary with key
+            'ticket_id', containing the ID of its ticket.
+
+        Raises:
+            ValueError: If at_time is before the current time, or more than
+                MAX_TICKS after it. Nothing is then booked.
         """
-        if not self._free_taxis or trip.travel_duration() == 0:
-            return None
+        if at_time is not None and self._is_ahead(at_time):
+            return self._schedule_booking(trip, at_time)
+        if self._metrics is not None:
+            result = self._metrics.book(self._book, trip,
+                                        self._free_taxi_index)
+        else:
+            result = self._book(trip)
+        if result is None and self._waiting is not None:
+            return self._wait(trip)
+        return result
 
-        taxi_id, pickup_duration = self._find_closest_free_taxi(trip)
-        duration = pickup_duration + trip.travel_duration()
-        self._occupy_taxi(trip, taxi_id)
-        return {'car_id': taxi_id, 'total_time': duration}
+    def book_batch(self, trips, at_time=None):
+        """Makes bookings for a batch of trips.
+
+        Taxis are assigned to the trips by the assignment policy given during
+        instantiation. With GreedyAssignment, this is the same as booking each
+        trip in turn with book().
+
+        Args:
+            trips: a list of Trip instances containing the customers' locations
+                and destinations of the trips to be booked.
+            at_time: an integer time to make the bookings at, in order, or
+                None for now, as book() takes.
 
-    def increment_time(self):
-        """Advances simulation time by 1 time unit.
+        Returns:
+            a list with a dictionary for each successful booking and None for
+            each unsuccessful booking, in the format returned by book().
+            Bookings left waiting are given tickets in order, after the
+            others are booked.
 
-        Time advancement is simulated by moving every occupied taxi by 1
-        distance unit in the x or y-axis. Taxis will travel according to the
-        manhattan distance from its current position to its destination, along
-        the x-axis first, then the y-axis. Any taxi that has reached its
-        destination is made available for further booking.
+        Raises:
+            ValueError: If at_time is before the current time, or more than
+                MAX_TICKS after it. Nothing is then booked.
         """
-        taxis_to_free = []
-        for taxi_id, travelling in self._occupied_taxis.items():
-            if travelling['curr_position'].x < travelling['destination'].x:
-                travelling['curr_position'].x += 1
-            elif travelling['curr_position'].x > travelling['destination'].x:
-                travelling['curr_position'].x -= 1
-            elif travelling['curr_position'].y < travelling['destination'].y:
-                travelling['curr_position'].y += 1
-            elif travelling['curr_position'].y > travelling['destination'].y:
-                travelling['curr_position'].y -= 1
-
-            if travelling['curr_position'].x == travelling['destination'].x\
-                    and travelling['curr_position'].y == travelling['destination'].y:
-                taxis_to_free.append(taxi_id)
-        self._free_up_taxis(taxis_to_free)
+        if at_time is not None and self._is_ahead(at_time):
+            return [self._schedule_booking(trip, at_time) for trip in trips]
+        if self._metrics is not None:
+            results = self._metrics.book_batch(self._assignment.assign, self,
+                                               trips)
+        else:
+            results = self._assignment.assign(self, trips)
+        if self._waiting is not None:
+            results = [self._wait(trip) if result is None else result
+                       for trip, result in zip(trips, results)]
+        return results
+
+    def increment_time(self, ticks=1):
+        """Advances simulation time by given number of time units.
+
+        Every occupied taxi travels 1 distance unit in the x or y-axis per time
+        unit, to the customer's location and then to the customer's
+        destination, along the x-axis first, then the y-axis. Any taxi that has
+        reached its destination is made available for further booking.
+
+        Arriving taxis are freed in order of arrival time then ID. How much
+        work is done per time unit depends on the tick kernel given during
+        instantiation. Taxis are given to bookings left waiting as soon as
+        they are freed. Bookings scheduled within the advanced time are made
+        at the time they are due, after taxis arriving by then are freed.
+        Taxis with a booking chained onto them set off on it when they arrive,
+        rather than being freed.
+
+        Args:
+            ticks: A positive integer number of time units to advance by, up
+                to MAX_TICKS.
+
+        Raises:
+            ValueError: If ticks is more than MAX_TICKS, or would advance time
+                past MAX_TIME. Time is then not advanced.
+        """
+        self._check_ticks(ticks)
+        if self._metrics is not None:
+            self._metrics.increment_time(self._advance, ticks, self._fleet)
+        else:
+            self._advance(ticks)
+
+    def add_taxis(self, starting_points):
+        """Adds available taxis to the simulation.
+
+        New taxis are given the next IDs in order, and start from the given
+        locations, now and whenever the simulation is reset. They are given
+        to bookings left waiting straight away.
+
+        Args:
+            starting_points: An array-like of shape (taxis, 2) of the x and y
+                coordinates of where each new taxi starts from.
+
+        Returns:
+            A list of the integer IDs of the new taxis.
+
+        Raises:
+            ValueError: If starting_points are not coordinate pairs.
+        """
+        taxi_ids = self._fleet.append(starting_points)
+        self._NUM_TAXIS = len(self._fleet)
+        self._baseline = None
+        self._tick_kernel.grow()
+        self._index_free_taxis(taxi_ids)
+        taxi_ids = taxi_ids.tolist()
+        self._serve_waiting(taxi_ids)
+        return taxi_ids
+
+    def retire_taxi(self, taxi_id):
+        """Takes an available taxi out of service for good.
+
+        The taxi is no longer booked, counted or located, even after a reset,
+        and its ID is not reused.
+
+        Args:
+            taxi_id: An integer ID of an available taxi.
+
+        Raises:
+            KeyError: If there is no taxi with the given ID in service.
+            ValueError: If the taxi is occupied.
+        """
+        if not 1 <= taxi_id <= len(self._fleet):
+            raise KeyError(taxi_id)
+        status = self._fleet.status[taxi_id - 1]
+        if status == OCCUPIED:
+            raise ValueError('Taxi {} is occupied'.format(taxi_id))
+        if status != FREE:
+            raise KeyError(taxi_id)
+        self._free_taxi_index.remove(taxi_id, self._fleet.location(taxi_id))
+        self._fleet.retire(taxi_id)
+        self._baseline = None
+
+    def scheduled_booking(self, booking_id):
+        """Returns the state of a booking scheduled since the last reset.
+
+        Args:
+            booking_id: An integer ID returned by book() when scheduling.
+
+        Returns:
+            A dictionary with keys 'booking_id', 'time' and 'status', one of
+            'scheduled', 'booked', 'unbooked' or 'waiting', and for booked
+            bookings 'car_id' and 'total_time', as book() returns, and for
+            waiting ones the 'ticket_id' to read their taxi with ticket().
+
+        Raises:
+            KeyError: If there is no such booking.
+        """
+        return self._schedule.get(booking_id)
+
+    def ticket(self, ticket_id):
+        """Returns the state of a booking left waiting since the last reset.
+
+        Args:
+            ticket_id: An integer ID returned by book() when leaving the
+                booking waiting.
+
+        Returns:
+            A dictionary with keys 'ticket_id', 'time' and 'status', 'waiting'
+            or 'booked', and for booked bookings 'car_id' and 'total_time', as
+            book() returns, and 'booked_at', the time the booking was made.
+
+        Raises:
+            KeyError: If there is no such ticket.
+        """
+        if self._waiting is None:
+            raise KeyError(ticket_id)
+        return self._waiting.get(ticket_id)
+
+    def taxi_location(self, taxi_id):
+        """Returns the current location of a taxi.
+
+        Args:
+            taxi_id: An integer ID of a simulated taxi.
+
+        Returns:
+            A Point instance of where the taxi is at the current time.
+
+        Raises:
+            KeyError: If there is no taxi with the given ID in service.
+        """
+        if not 1 <= taxi_id <= len(self._fleet):
+            raise KeyError(taxi_id)
+        if self._fleet.status[taxi_id - 1] not in (FREE, OCCUPIED):
+            raise KeyError(taxi_id)
+        if self._fleet.is_free(taxi_id):
+            return self._fleet.location(taxi_id)
+        return self._tick_kernel.location(taxi_id, self._time)
+
+    def taxi_counts(self):
+        """Returns a dictionary of the numbers of 'free' and 'occupied' taxis."""
+        counts = np.bincount(self._fleet.status, minlength=OCCUPIED + 1)
+        return {'free': int(counts[FREE]), 'occupied': int(counts[OCCUPIED])}
 
     def reset(self):
         """Resets simulation to its initial state.
 
-        All taxis are initially available for booking, and start from the same
-        Point as defined during instantiation.
+        All taxis are initially available for booking, and start from the
+        Points defined during instantiation, or when they were added. Retired
+        taxis stay retired, and bookings made ahead or left waiting are
+        dropped.
+
+        Takes time in proportion to the taxis booked since the last reset,
+        rather than to the size of the fleet, unless taxis were added or
+        retired since.
         """
+        self._time = 0
+        self._schedule.clear()
+        if self._waiting is not None:
+            self._waiting.clear()
         self._initialize_free_taxis()
         self._initialize_occupied_taxis()
 
+    def _book(self, trip):
+        if self._dispatch is not None:
+            return self._dispatch_booking(trip)
+        if not len(self._free_taxi_index) or trip.travel_duration() == 0:
+            return None
+
+        taxi_id, pickup_duration = self._find_closest_free_taxi(trip)
+        return self._assign_taxi(trip, taxi_id, pickup_duration)
+
+    def _dispatch_booking(self, trip):
+        if trip.travel_duration() == 0:
+            return None
+        closest = (self._find_closest_free_taxi(trip)
+                   if len(self._free_taxi_index) else None)
+        chained = self._dispatch.find(trip.src, self._time, closest)
+        if chained is not None:
+            return self._chain_taxi(trip, *chained)
+        if closest is None:
+            return None
+        return self._assign_taxi(trip, *closest)
+
+    def _advance(self, ticks):
+        end_time = self._time + ticks
+        due_time = self._schedule.next_time()
+        if due_time is None or due_time > end_time:
+            return self._advance_to(end_time)
+        freed = []
+        while due_time is not None and due_time <= end_time:
+            freed += self._advance_to(due_time)
+            booking_ids, trips = self._schedule.pop()
+            self._schedule.record(booking_ids, self.book_batch(trips))
+            due_time = self._schedule.next_time()
+        return freed + self._advance_to(end_time)
+
+    def _advance_to(self, time):
+        if self._dispatch is not None:
+            return self._advance_through_handovers(time)
+        if time == self._time:
+            return []
+        taxis_to_free = self._tick_kernel.advance(self._time, time - self._time)
+        self._time = time
+        self._free_up_taxis(taxis_to_free)
+        self._serve_waiting(taxis_to_free)
+        return taxis_to_free
+
+    def _advance_through_handovers(self, time):
+        freed = []
+        while self._time < time:
+            handover = self._dispatch.next_handover()
+            step_to = time if handover is None else min(handover, time)
+            arrived = self._tick_kernel.advance(self._time,
+                                                step_to - self._time)
+            self._time = step_to
+            handed_over = self._dispatch.arrive(step_to, arrived)
+            if handed_over:
+                self._start_chained_taxis(handed_over)
+                handed_over = set(handed_over)
+                arrived = [taxi_id for taxi_id in arrived
+                           if taxi_id not in handed_over]
+            self._free_up_taxis(arrived)
+            self._serve_waiting(arrived)
+            freed += arrived
+        return freed
+
+    def _check_ticks(self, ticks):
+        if ticks > MAX_TICKS or self._time + ticks > MAX_TIME:
+            raise ValueError('Cannot advance time {} by {} ticks, at most {} '
+                             'at once'.format(self._time, ticks, MAX_TICKS))
+
+    def _is_ahead(self, time):
+        if time < self._time:
+            raise ValueError('Cannot book at time {}, before the current time '
+                             '{}'.format(time, self._time))
+        if time > self._time + MAX_TICKS:
+            raise ValueError('Cannot book at time {}, more than {} ticks '
+                             'after the current time {}'.format(
+                                 time, MAX_TICKS, self._time))
+        return time > self._time
+
+    def _wait(self, trip):
+        if trip.travel_duration() == 0:
+            return None
+        return {'ticket_id': self._waiting.add(self._time, trip)}
+
+    def _serve_waiting(self, taxi_ids):
+        if self._waiting is not None and taxi_ids and len(self._waiting):
+            self._waiting.serve(self, taxi_ids)
+
+    def _ticket_records(self):
+        if self._waiting is None:
+            return None
+        return self._waiting.to_records()
+
+    def _schedule_booking(self, trip, time):
+        return {'booking_id': self._schedule.add(time, trip), 'time': time}
+
+    def _assign_taxi(self, trip, taxi_id, pickup_duration):
+        duration = pickup_duration + trip.travel_duration()
+        self._occupy_taxi(trip, taxi_id, duration)
+        return {'car_id': taxi_id, 'total_time': duration}
+
+    def _chain_taxi(self, trip, taxi_id, pickup_duration):
+        self._fleet.chain(taxi_id, trip.src, trip.dst)
+        self._dispatch.chain(taxi_id)
+        return {'car_id': taxi_id,
+                'total_time': pickup_duration + trip.travel_duration()}
+
+    def _start_chained_taxis(self, taxi_ids):
+        for taxi_id in taxi_ids:
+            self._fleet.start_chained(taxi_id)
+            self._tick_kernel.occupy(taxi_id)
+            self._dispatch.occupy(taxi_id)
+
     def _find_closest_free_taxi(self, trip):
-        pickup_location = trip.src
-        closest_taxi_id, shortest_pickup_time = None, float('inf')
-        for taxi_id, taxi_location in self._free_taxis.items():
-            pickup_time = manhattan_dist(taxi_location, pickup_location)
-            if pickup_time < shortest_pickup_time:
-                closest_taxi_id = taxi_id
-                shortest_pickup_time = pickup_time
-        return closest_taxi_id, shortest_pickup_time
+        return self._free_taxi_index.nearest(trip.src)
 
     def _free_up_taxis(self, taxis):
+        if not taxis:
+            return
+        self._fleet.free(taxis)
         for taxi_id in taxis:
-            self._free_taxis[taxi_id] \
-                = self._occupied_taxis[taxi_id]['destination']
-            del self._occupied_taxis[taxi_id]
+            self._free_taxi_index.insert(taxi_id, self._fleet.location(taxi_id))
 
-    def _occupy_taxi(self, trip, taxi_id):
-        self._occupied_taxis[taxi_id] = {'curr_position': trip.src,
-                                         'destination': trip.dst}
-        del self._free_taxis[taxi_id]
+    def _occupy_taxi(self, trip, taxi_id, duration):
+        origin = self._fleet.location(taxi_id)
+        arrival_time = self._time + duration
+        self._fleet.occupy(taxi_id, trip.src, trip.dst, self._time,
+                           arrival_time)
+        self._tick_kernel.occupy(taxi_id)
+        self._free_taxi_index.remove(taxi_id, origin)
+        if self._dispatch is not None:
+            self._dispatch.occupy(taxi_id)
 
     def _initialize_free_taxis(self):
-        self._free_taxis.clear()
-        for i in range(self._NUM_TAXIS):
-            self._free_taxis[i + 1] = self._STARTING_POINT
+        self._fleet.reset()
+        if self._baseline is not None:
+            self._free_taxi_index.restore(self._baseline)
+            return
+        self._free_taxi_index.clear()
+        self._index_free_taxis(self._fleet.free_taxi_ids())
+        self._baseline = self._free_taxi_index.checkpoint()
 
     def _initialize_occupied_taxis(self):
-        self._occupied_taxis.clear()
+        self._tick_kernel.reset()
+        if self._dispatch is not None:
+            self._dispatch.reset()
+
+    def _rebuild(self):
+        if self._dispatch is None and len(self._fleet.chained_taxi_ids()):
+            raise ValueError('Taxis have bookings chained onto them, which '
+                             'only a dispatch policy starts')
+        self._free_taxi_index.clear()
+        # Indexing a large fleet spread over many locations takes seconds, so
+        # is left to the first operation looking up or changing free taxis.
+        taxi_ids = self._fleet.free_taxi_ids()
+        rows = taxi_ids - 1
+        self._free_taxi_index = _UnbuiltIndex(
+            self, self._free_taxi_index, taxi_ids, self._fleet.x[rows],
+            self._fleet.y[rows])
+        self._tick_kernel.rebuild(self._time)
+        if self._dispatch is not None:
+            self._dispatch.rebuild()
+
+    def _index_free_taxis(self, taxi_ids):
+        rows = taxi_ids - 1
+        self._free_taxi_index.insert_all(taxi_ids, self._fleet.x[rows],
+                                         self._fleet.y[rows])
+
+
+class _UnbuiltIndex:
+    """Stands in for a simulation's spatial index until it is first used.
+
+    Holds a copy of the free taxis and their locations as they were when the
+    simulation was resumed, and indexes them the first time the index is
+    searched or changed, replacing itself with the index in the simulation.
+    Only counting and clearing the taxis does not build the index.
+
+    Attributes:
+        _simulation: The GridSimulation whose _free_taxi_index this is.
+        _index: The empty spatial index to build.
+        _taxi_ids: A NumPy array of the IDs of the taxis to index, or None
+            once built.
+        _xs: A NumPy array of the matching x-coordinates.
+        _ys: A NumPy array of the matching y-coordinates.
+    """
+
+    def __init__(self, simulation, index, taxi_ids, xs, ys):
+        self._simulation = simulation
+        self._index = index
+        self._taxi_ids = taxi_ids
+        self._xs = xs
+        self._ys = ys
+
+    def __len__(self):
+        if self._taxi_ids is None:
+            return len(self._index)
+        return len(self._taxi_ids)
+
+    def __getattr__(self, name):
+        return getattr(self._built(), name)
+
+    def clear(self):
+        self._taxi_ids = self._xs = self._ys = None
+        self._index.clear()
+        self._simulation._free_taxi_index = self._index
+
+    def _built(self):
+        if self._taxi_ids is not None:
+            self._index.insert_all(self._taxi_ids, self._xs, self._ys)
+            self._taxi_ids = self._xs = self._ys = None
+            self._simulation._free_taxi_index = self._index
+        return self._index
@@ -0,0 +1,51 @@
+import itertools
+import json
+import os
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from ...sweep import LAYOUTS, Scenario, format_table, sweep, write_trace
+
+
+class Command(BaseCommand):
+    help = ('Replays a trace of bookings against every combination of fleet '
+            'size and layout in parallel, and prints a table of the results.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'trace', help='JSON lines file of book, book/batch and tick '
+                          'operations, e.g. written by the replay benchmark')
+        parser.add_argument('--taxis', type=int, nargs='+', required=True,
+                            help='fleet sizes to simulate')
+        parser.add_argument('--layouts', choices=LAYOUTS, nargs='+',
+                            default=['centre'],
+                            help='where taxis start from')
+        parser.add_argument('--workers', type=int,
+                            help='worker processes, one per processor if '
+                                 'not given')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='seed of spread starting points')
+
+    def handle(self, *args, **options):
+        scenarios = [Scenario(layout, num_taxis, options['seed'])
+                     for layout, num_taxis in itertools.product(
+                         options['layouts'], options['taxis'])]
+        if any(scenario.num_taxis < 0 for scenario in scenarios):
+            raise CommandError('Fleet sizes must not be negative')
+
+        file, path = tempfile.mkstemp(suffix='.trace')
+        os.close(file)
+        try:
+            try:
+                with open(options['trace']) as trace:
+                    write_trace(path, (json.loads(line) for line in trace
+                                       if line.strip()))
+            except (KeyError, TypeError, ValueError) as error:
+                raise CommandError('Error reading trace: {}'.format(error))
+            try:
+                results = sweep(path, scenarios, options['workers'])
+            except Exception as error:
+                raise CommandError('Error replaying trace: {!r}'.format(
+                    error))
+        finally:
+            os.remove(path)
+        self.stdout.write(format_table(results))
@@ -0,0 +1,227 @@
+from bisect import bisect_left
+import time
+import numpy as np
+from .fleet import OCCUPIED
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_SECONDS_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1)
+_COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384,
+                  65536, 262144, 1048576)
+
+
+class Histogram:
+    """Counts observed values into buckets, as a Prometheus histogram.
+
+    Attributes:
+        name: A string metric name.
+        help: A string description of the metric.
+        buckets: A sorted tuple of upper bounds of buckets.
+        counts: A list of numbers of values observed in each bucket, and above
+            the last bucket.
+        sum: A sum of observed values.
+    """
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        """Counts the given value into its bucket."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self):
+        """Returns a list of lines of the histogram in Prometheus text format.
+        """
+        lines = ['# HELP {} {}'.format(self.name, self.help),
+                 '# TYPE {} histogram'.format(self.name)]
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append('{}_bucket{{le="{}"}} {}'.format(self.name, bound,
+                                                          cumulative))
+        lines.append('{}_sum {}'.format(self.name, self.sum))
+        lines.append('{}_count {}'.format(self.name, cumulative))
+        return lines
+
+
+class SimulationMetrics:
+    """Collects metrics of the calls made to a GridSimulation.
+
+    Counts bookings by result, time units advanced and taxis freed on every
+    call. Distributions of search time and candidates examined per booking,
+    of duration per batch of bookings, and of duration, taxis moved and taxis
+    freed per call to advance time, are sampled: one call in every
+    1 / sample_rate is timed and observed.
+
+    Simulations collect no metrics unless given a SimulationMetrics instance,
+    so disabled metrics cost one comparison per call.
+
+    Attributes:
+        sample_every: An integer number of calls per sampled call.
+        booked: An integer number of successful bookings.
+        unbooked: An integer number of unsuccessful bookings.
+        ticks: An integer number of time units advanced.
+        freed: An integer number of taxis freed.
+        book_seconds: A Histogram of time taken by sampled bookings.
+        book_candidates: A Histogram of distinct taxi locations examined by
+            sampled successful bookings.
+        batch_seconds: A Histogram of time taken by sampled batches of
+            bookings.
+        tick_seconds: A Histogram of time taken by sampled calls to advance
+            time.
+        tick_moved: A Histogram of occupied taxis moved by sampled calls to
+            advance time.
+        tick_freed: A Histogram of taxis freed by sampled calls to advance
+            time.
+    """
+
+    def __init__(self, sample_rate=1.0):
+        """Initializes metrics, sampling given fraction of calls.
+
+        Args:
+            sample_rate: A float fraction of calls, above 0 and up to 1, to
+                observe distributions of.
+
+        Raises:
+            ValueError: If sample_rate is out of range.
+        """
+        if not 0 < sample_rate <= 1:
+            raise ValueError('Sample rate {} is not in (0, 1]'
+                             .format(sample_rate))
+        self.sample_every = max(1, int(round(1 / sample_rate)))
+        self._book_calls = 0
+        self._batch_calls = 0
+        self._tick_calls = 0
+        self.booked = 0
+        self.unbooked = 0
+        self.ticks = 0
+        self.freed = 0
+        self.book_seconds = Histogram(
+            'taxi_book_duration_seconds',
+            'Time taken to make a booking.', _SECONDS_BUCKETS)
+        self.book_candidates = Histogram(
+            'taxi_book_scanned_candidates',
+            'Distinct taxi locations examined to make a booking.',
+            _COUNT_BUCKETS)
+        self.batch_seconds = Histogram(
+            'taxi_book_batch_duration_seconds',
+            'Time taken to make a batch of bookings.', _SECONDS_BUCKETS)
+        self.tick_seconds = Histogram(
+            'taxi_tick_duration_seconds',
+            'Time taken to advance time.', _SECONDS_BUCKETS)
+        self.tick_moved = Histogram(
+            'taxi_tick_moved_taxis',
+            'Occupied taxis moved when advancing time.', _COUNT_BUCKETS)
+        self.tick_freed = Histogram(
+            'taxi_tick_freed_taxis',
+            'Taxis freed when advancing time.', _COUNT_BUCKETS)
+
+    def book(self, book, trip, index):
+        """Makes a booking with the given book function, observing it.
+
+        Args:
+            book: A callable taking trip, making the booking.
+            trip: A Trip instance to book.
+            index: The spatial index book searches, read for last_scanned.
+
+        Returns:
+            The result of book(trip).
+        """
+        self._book_calls += 1
+        if self._book_calls % self.sample_every:
+            result = book(trip)
+        else:
+            start = time.perf_counter()
+            result = book(trip)
+            self.book_seconds.observe(time.perf_counter() - start)
+            if result is not None:
+                self.book_candidates.observe(index.last_scanned)
+        if result is None:
+            self.unbooked += 1
+        else:
+            self.booked += 1
+        return result
+
+    def book_batch(self, assign, simulation, trips):
+        """Makes bookings with the given assign function, observing them.
+
+        Args:
+            assign: A callable taking simulation and trips, making the
+                bookings, e.g. an assignment policy's assign method.
+            simulation: A GridSimulation instance to book taxis from.
+            trips: A list of Trip instances to book.
+
+        Returns:
+            The result of assign(simulation, trips).
+        """
+        self._batch_calls += 1
+        if self._batch_calls % self.sample_every:
+            results = assign(simulation, trips)
+        else:
+            start = time.perf_counter()
+            results = assign(simulation, trips)
+            self.batch_seconds.observe(time.perf_counter() - start)
+        booked = sum(result is not None for result in results)
+        self.booked += booked
+        self.unbooked += len(results) - booked
+        return results
+
+    def increment_time(self, advance, ticks, fleet):
+        """Advances time with the given advance function, observing it.
+
+        Args:
+            advance: A callable taking ticks, advancing time and returning the
+                IDs of taxis freed.
+            ticks: A positive integer number of time units to advance by.
+            fleet: The FleetStore of the simulation, read for occupied taxis.
+        """
+        self._tick_calls += 1
+        if self._tick_calls % self.sample_every:
+            freed = advance(ticks)
+        else:
+            self.tick_moved.observe(int(np.count_nonzero(
+                fleet.status == OCCUPIED)))
+            start = time.perf_counter()
+            freed = advance(ticks)
+            self.tick_seconds.observe(time.perf_counter() - start)
+            self.tick_freed.observe(len(freed))
+        self.ticks += ticks
+        self.freed += len(freed)
+
+    def render(self, taxi_counts):
+        """Returns the metrics in Prometheus text exposition format.
+
+        Args:
+            taxi_counts: A dictionary mapping 'free' and 'occupied' to the
+                integer numbers of taxis in each state, e.g. as returned by
+                GridSimulation.taxi_counts.
+        """
+        lines = ['# HELP taxi_bookings_total Bookings made, by result.',
+                 '# TYPE taxi_bookings_total counter',
+                 'taxi_bookings_total{{result="booked"}} {}'.format(
+                     self.booked),
+                 'taxi_bookings_total{{result="unbooked"}} {}'.format(
+                     self.unbooked),
+                 '# HELP taxi_ticks_total Time units advanced.',
+                 '# TYPE taxi_ticks_total counter',
+                 'taxi_ticks_total {}'.format(self.ticks),
+                 '# HELP taxi_freed_total Taxis freed at their destinations.',
+                 '# TYPE taxi_freed_total counter',
+                 'taxi_freed_total {}'.format(self.freed),
+                 '# HELP taxi_fleet_taxis Taxis in the fleet, by state.',
+                 '# TYPE taxi_fleet_taxis gauge']
+        for state in ('free', 'occupied'):
+            lines.append('taxi_fleet_taxis{{state="{}"}} {}'.format(
+                state, taxi_counts[state]))
+        for histogram in (self.book_seconds, self.book_candidates,
+                          self.batch_seconds, self.tick_seconds, self.tick_moved,
+                          self.tick_freed):
+            lines.extend(histogram.render())
+        return '\n'.join(lines) + '\n'
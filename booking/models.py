@@ -1,20 +1,199 @@
+import atexit
+import os
+import threading
+from django.conf import settings
+from . import oplog, snapshot
+from .assignment import make_assignment
+from .dispatch import PredictiveDispatch
+from .fleet import read_starting_points
 from .gridsimulation import GridSimulation
+from .metrics import SimulationMetrics
 from .point import Point
+from .queries import ViewPublisher
+from .sharedstate import SharedSimulation
+from .tenants import SimulationRegistry
 from .trip import Trip
+from .waiting import QUEUES
 
 
-_STARTING_POINT = Point(0, 0)
-_NUM_TAXIS = 3
-simulation = GridSimulation(_STARTING_POINT, _NUM_TAXIS)
+_STARTING_POINT = Point(*getattr(settings, 'BOOKING_STARTING_POINT', (0, 0)))
+_FLEET_FILE = getattr(settings, 'BOOKING_FLEET_FILE', None)
+_STARTING_POINTS = read_starting_points(_FLEET_FILE) if _FLEET_FILE else None
+_NUM_TAXIS = (len(_STARTING_POINTS) if _FLEET_FILE
+              else getattr(settings, 'BOOKING_FLEET_SIZE', 3))
+_SAMPLE_RATE = getattr(settings, 'BOOKING_METRICS_SAMPLE_RATE', None)
+_SNAPSHOT_PATH = getattr(settings, 'BOOKING_SNAPSHOT_PATH', None)
+_LOG_PATH = getattr(settings, 'BOOKING_LOG_PATH', None)
+metrics = SimulationMetrics(_SAMPLE_RATE) if _SAMPLE_RATE else None
+_QUERY_MAX_AGE = getattr(settings, 'BOOKING_QUERY_MAX_AGE', 1.0)
+_DISPATCH = (PredictiveDispatch
+             if getattr(settings, 'BOOKING_PREDICTIVE_DISPATCH', False)
+             else None)
+_WAITING_QUEUE = getattr(settings, 'BOOKING_WAITING_QUEUE', None)
+_WAITING = QUEUES[_WAITING_QUEUE] if _WAITING_QUEUE else None
+_ASSIGNMENT = make_assignment(
+    getattr(settings, 'BOOKING_ASSIGNMENT', 'greedy'),
+    getattr(settings, 'BOOKING_ASSIGNMENT_CANDIDATES', None))
+simulations = SimulationRegistry(
+    getattr(settings, 'BOOKING_MAX_SIMULATIONS', 256),
+    getattr(settings, 'BOOKING_SIMULATIONS_PATH', None), _QUERY_MAX_AGE,
+    _DISPATCH, _WAITING, _ASSIGNMENT,
+    getattr(settings, 'BOOKING_MAX_SIMULATION_TAXIS', None))
+log = None
+snapshots = None
+if getattr(settings, 'BOOKING_SHARED_STATE_PATH', None):
+    simulation = SharedSimulation(settings.BOOKING_SHARED_STATE_PATH,
+                                  _STARTING_POINT, _NUM_TAXIS,
+                                  starting_points=_STARTING_POINTS,
+                                  metrics=metrics, dispatch=_DISPATCH,
+                                  waiting=_WAITING, assignment=_ASSIGNMENT)
+else:
+    simulation = None
+    _log_position = 0
+    if _SNAPSHOT_PATH and os.path.exists(_SNAPSHOT_PATH):
+        _log_position = snapshot.log_position(_SNAPSHOT_PATH)
+        # A snapshot taken without the log cannot be caught up with it, so
+        # the whole log is replayed instead.
+        if _log_position is None and _LOG_PATH and os.path.exists(_LOG_PATH):
+            _log_position = 0
+        else:
+            simulation = GridSimulation.load(_SNAPSHOT_PATH, metrics=metrics,
+                                             dispatch=_DISPATCH,
+                                             waiting=_WAITING,
+                                             assignment=_ASSIGNMENT)
+            _log_position = _log_position or 0
+    if simulation is None:
+        simulation = GridSimulation(_STARTING_POINT, _NUM_TAXIS,
+                                    metrics=metrics,
+                                    starting_points=_STARTING_POINTS,
+                                    dispatch=_DISPATCH, waiting=_WAITING,
+                                    assignment=_ASSIGNMENT)
+    if _LOG_PATH:
+        oplog.recover(_LOG_PATH, simulation, _log_position)
+        log = oplog.OperationLog(_LOG_PATH)
+        atexit.register(log.close)
+_lock = threading.Lock()
+views = ViewPublisher(simulation, _lock, _QUERY_MAX_AGE)
+if getattr(settings, 'BOOKING_SHARED_STATE_PATH', None):
+    # Other workers' operations are only seen by taking views regularly.
+    views.start()
+    atexit.register(views.stop)
+if _SNAPSHOT_PATH and not getattr(settings, 'BOOKING_SHARED_STATE_PATH', None):
+    snapshots = snapshot.PeriodicSnapshot(
+        simulation, _SNAPSHOT_PATH, settings.BOOKING_SNAPSHOT_INTERVAL, _lock,
+        log)
+    if log is not None:
+        # Records where the log was recovered up to straight away.
+        snapshots.snapshot()
+    snapshots.start()
+    atexit.register(snapshots.stop)
 
 
-def make(booking):
-    return simulation.book(Trip(booking))
+def make(booking, at_time=None):
+    return book(Trip(booking), at_time)
 
 
-def increment_time():
-    simulation.increment_time()
+def book(trip, at_time=None):
+    with _lock:
+        result = simulation.book(trip, at_time)
+        position = log.book(trip, result) if log else None
+    _flush(position)
+    views.changed()
+    return result
+
+
+def make_batch(bookings, at_time=None):
+    return book_batch([Trip(booking) for booking in bookings], at_time)
+
+
+def book_batch(trips, at_time=None):
+    with _lock:
+        results = simulation.book_batch(trips, at_time)
+        position = log.book_batch(trips, results) if log else None
+    _flush(position)
+    views.changed()
+    return results
+
+
+def increment_time(ticks=1):
+    with _lock:
+        simulation.increment_time(ticks)
+        position = log.increment_time(ticks) if log else None
+    _flush(position)
+    views.changed()
 
 
 def reset():
-    simulation.reset()
+    with _lock:
+        simulation.reset()
+        position = log.reset() if log else None
+    _flush(position)
+    views.changed()
+
+
+def add_taxis(starting_points):
+    with _lock:
+        taxi_ids = simulation.add_taxis(starting_points)
+        position = log.add_taxis(starting_points, taxi_ids) if log else None
+    _flush(position)
+    views.changed()
+    return taxi_ids
+
+
+def retire_taxi(taxi_id):
+    with _lock:
+        simulation.retire_taxi(taxi_id)
+        position = log.retire_taxi(taxi_id) if log else None
+    _flush(position)
+    views.changed()
+
+
+def scheduled_booking(booking_id):
+    with _lock:
+        return simulation.scheduled_booking(booking_id)
+
+
+def ticket(ticket_id):
+    with _lock:
+        return simulation.ticket(ticket_id)
+
+
+def view():
+    return views.view()
+
+
+def create_simulation(name, num_taxis=None, starting_point=None,
+                      starting_points=None):
+    """Creates a named simulation in simulations.
+
+    Parts of the fleet not given default to the default simulation's: with
+    none given, the named simulation starts with the same fleet.
+
+    Returns:
+        True if the simulation was created, or False if it already exists.
+
+    Raises:
+        ValueError: If the name or fleet is invalid.
+    """
+    if (num_taxis is None and starting_point is None
+            and starting_points is None):
+        starting_points = _STARTING_POINTS
+    if num_taxis is None:
+        num_taxis = (len(starting_points) if starting_points is not None
+                     else _NUM_TAXIS)
+    if starting_point is None:
+        starting_point = _STARTING_POINT
+    return simulations.create(name, starting_point, num_taxis,
+                              starting_points)
+
+
+def _flush(position):
+    # Waits outside the lock, so that operations made meanwhile are committed
+    # by the same fsync.
+    if position is not None:
+        log.flush(position)
+
+
+def render_metrics():
+    with _lock:
+        return metrics.render(simulation.taxi_counts())
@@ -0,0 +1,309 @@
+"""Append-only log of the operations applied to a simulation.
+
+Every booking, batch of bookings, tick, reset, addition and retirement of
+taxis is appended as fixed-size little-endian records, together with the
+result of each booking, so the log is both a write-ahead log to recover the
+simulation from and an audit trail of which taxi each booking received. A
+batch of bookings or of added taxis is logged as a header record followed by
+one record per booking or taxi. Bookings made ahead are logged with the ID
+and time they were scheduled with; the taxis they receive when due are not
+logged, as replaying the ticks up to then books them again. Likewise,
+bookings left waiting are logged with their ticket IDs, but not the taxis
+they receive once freed.
+
+Appends are made durable by a background thread, which writes and fsyncs
+everything appended since its last fsync at once, so that callers appending
+concurrently share the cost of a single fsync.
+"""
+
+from collections import namedtuple
+import os
+import struct
+import threading
+from .point import Point
+from .trip import Trip
+
+
+_RECORD = struct.Struct('<Biiiiqq')
+_BOOK = 1
+_BATCH = 2
+_TICK = 3
+_RESET = 4
+_ADD = 5
+_TAXI = 6
+_RETIRE = 7
+_SCHEDULED = 8
+_WAITING = 9
+_OPERATIONS = {_BOOK: 'book', _BATCH: 'book/batch', _TICK: 'tick',
+               _RESET: 'reset', _RETIRE: 'taxis/retire'}
+
+Entry = namedtuple('Entry', ('operation', 'trips', 'results', 'ticks',
+                             'taxis'))
+Entry.__doc__ = """An operation read from the log.
+
+Attributes:
+    operation: A string naming the operation after its API endpoint: 'book',
+        'book/batch', 'tick', 'reset', 'taxis/add' or 'taxis/retire'.
+    trips: A list of the Trip instances booked, empty unless booking.
+    results: A list of the results of booking each trip, as returned by
+        GridSimulation.book.
+    ticks: An integer number of time units advanced by, 0 unless ticking.
+    taxis: A list of (taxi ID, Point) tuples of the taxis added and where
+        they start from, or of (taxi ID, None) of the taxi retired, empty
+        otherwise.
+"""
+
+
+def _booking_record(trip, result):
+    if result and 'booking_id' in result:
+        return _RECORD.pack(_SCHEDULED, trip.src.x, trip.src.y, trip.dst.x,
+                            trip.dst.y, result['booking_id'], result['time'])
+    if result and 'ticket_id' in result:
+        return _RECORD.pack(_WAITING, trip.src.x, trip.src.y, trip.dst.x,
+                            trip.dst.y, result['ticket_id'], 0)
+    car_id, total_time = ((result['car_id'], result['total_time'])
+                          if result else (0, 0))
+    return _RECORD.pack(_BOOK, trip.src.x, trip.src.y, trip.dst.x, trip.dst.y,
+                        car_id, total_time)
+
+
+def _read_booking(record):
+    operation, src_x, src_y, dst_x, dst_y, car_id, total_time = record
+    trip = Trip.from_points(Point(src_x, src_y), Point(dst_x, dst_y))
+    if operation == _SCHEDULED:
+        return trip, {'booking_id': car_id, 'time': total_time}
+    if operation == _WAITING:
+        return trip, {'ticket_id': car_id}
+    result = ({'car_id': car_id, 'total_time': total_time} if car_id
+              else None)
+    return trip, result
+
+
+def _scheduled_time(results):
+    """Returns the time logged bookings were made ahead for, or None."""
+    if results and results[0] and 'booking_id' in results[0]:
+        return results[0]['time']
+    return None
+
+
+def _entries(file):
+    """Yields (end position, Entry) tuples of the whole entries in file."""
+    position = file.tell()
+    while True:
+        data = file.read(_RECORD.size)
+        if len(data) < _RECORD.size:
+            return
+        record = _RECORD.unpack(data)
+        operation = record[0]
+        if operation in (_BOOK, _SCHEDULED, _WAITING):
+            trip, result = _read_booking(record)
+            entry = Entry('book', [trip], [result], 0, [])
+        elif operation == _BATCH:
+            count = record[5]
+            data = file.read(count * _RECORD.size)
+            if len(data) < count * _RECORD.size:
+                return
+            bookings = [_read_booking(booking)
+                        for booking in _RECORD.iter_unpack(data)]
+            entry = Entry('book/batch', [trip for trip, result in bookings],
+                          [result for trip, result in bookings], 0, [])
+        elif operation == _ADD:
+            count = record[5]
+            data = file.read(count * _RECORD.size)
+            if len(data) < count * _RECORD.size:
+                return
+            taxis = [(taxi[5], Point(taxi[1], taxi[2]))
+                     for taxi in _RECORD.iter_unpack(data)]
+            entry = Entry('taxis/add', [], [], 0, taxis)
+        elif operation in _OPERATIONS:
+            entry = Entry(_OPERATIONS[operation], [], [],
+                          record[5] if operation == _TICK else 0,
+                          [(record[5], None)] if operation == _RETIRE
+                          else [])
+        else:
+            raise ValueError('Unknown operation {} at position {}'.format(
+                operation, position))
+        position = file.tell()
+        yield position, entry
+
+
+def read(path, position=0):
+    """Yields the Entry of every operation in a log, e.g. to audit it.
+
+    Args:
+        path: A path to a log written by OperationLog.
+        position: An integer byte position in the log to read from.
+    """
+    with open(path, 'rb') as file:
+        file.seek(position)
+        for end, entry in _entries(file):
+            yield entry
+
+
+def recover(path, simulation, position=0):
+    """Replays the operations logged after position onto a simulation.
+
+    A partial entry at the end of the log, left by a crash while it was being
+    written, is truncated, as its operation was never acknowledged.
+
+    Args:
+        path: A path to a log written by OperationLog. Nothing is replayed if
+            it does not exist.
+        simulation: A GridSimulation in the state the log was in at position,
+            e.g. loaded from a snapshot taken there.
+        position: An integer byte position in the log to replay from.
+
+    Returns:
+        An integer number of operations replayed.
+
+    Raises:
+        ValueError: If a booking receives a different result, or added taxis
+            different IDs, than when logged, i.e. the simulation was not in
+            the state the log was in at position.
+    """
+    if not os.path.exists(path):
+        return 0
+    replayed = 0
+    with open(path, 'r+b') as file:
+        file.seek(position)
+        end = position
+        for end, entry in _entries(file):
+            expected = entry.results
+            if entry.operation == 'book':
+                results = [simulation.book(entry.trips[0],
+                                           _scheduled_time(entry.results))]
+            elif entry.operation == 'book/batch':
+                results = simulation.book_batch(
+                    entry.trips, _scheduled_time(entry.results))
+            elif entry.operation == 'tick':
+                simulation.increment_time(entry.ticks)
+                results = []
+            elif entry.operation == 'reset':
+                simulation.reset()
+                results = []
+            elif entry.operation == 'taxis/add':
+                results = simulation.add_taxis(
+                    [(location.x, location.y) for _, location in entry.taxis])
+                expected = [taxi_id for taxi_id, _ in entry.taxis]
+            else:
+                simulation.retire_taxi(entry.taxis[0][0])
+                results = []
+            if results != expected:
+                raise ValueError('Replayed {} at position {} of {} received '
+                                 '{} instead of {}'.format(
+                                     entry.operation, end, path, results,
+                                     expected))
+            replayed += 1
+        file.truncate(end)
+    return replayed
+
+
+class OperationLog:
+    """Appends operations to a log, committing them in groups.
+
+    Appending returns the position the log must be durable up to for the
+    operation to survive a crash; callers wait for it with flush(), after
+    releasing any lock held while operating on the simulation, so that other
+    callers can append meanwhile and share the next fsync.
+
+    Attributes:
+        _file: The log file, opened for appending.
+        _buffer: A bytearray of records appended but not yet written.
+        _position: An integer byte position the log is appended up to.
+        _durable: An integer byte position the log is fsynced up to.
+        _condition: A threading.Condition guarding the attributes above.
+        _closed: True once close() is called.
+        _thread: The threading.Thread writing and fsyncing the log.
+    """
+
+    def __init__(self, path):
+        """Opens the log at path for appending, creating it if needed.
+
+        Args:
+            path: A path to the log, recovered first if it already exists.
+        """
+        self._file = open(path, 'ab')
+        self._buffer = bytearray()
+        self._position = self._durable = self._file.tell()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def position(self):
+        """The integer byte position the log is appended up to."""
+        with self._condition:
+            return self._position
+
+    def book(self, trip, result):
+        """Appends a booking and its result, returning the position after it.
+        """
+        return self._append(_booking_record(trip, result))
+
+    def book_batch(self, trips, results):
+        """Appends a batch of bookings and their results, as book() does."""
+        data = bytearray(_RECORD.pack(_BATCH, 0, 0, 0, 0, len(trips), 0))
+        for trip, result in zip(trips, results):
+            data += _booking_record(trip, result)
+        return self._append(data)
+
+    def increment_time(self, ticks):
+        """Appends advancing time by ticks, returning the position after it."""
+        return self._append(_RECORD.pack(_TICK, 0, 0, 0, 0, ticks, 0))
+
+    def reset(self):
+        """Appends a reset, returning the position after it."""
+        return self._append(_RECORD.pack(_RESET, 0, 0, 0, 0, 0, 0))
+
+    def add_taxis(self, starting_points, taxi_ids):
+        """Appends taxis added at starting points with the given IDs.
+
+        Returns:
+            The integer position after the appended operation.
+        """
+        data = bytearray(_RECORD.pack(_ADD, 0, 0, 0, 0, len(taxi_ids), 0))
+        for (x, y), taxi_id in zip(starting_points, taxi_ids):
+            data += _RECORD.pack(_TAXI, x, y, 0, 0, taxi_id, 0)
+        return self._append(data)
+
+    def retire_taxi(self, taxi_id):
+        """Appends retiring a taxi, returning the position after it."""
+        return self._append(_RECORD.pack(_RETIRE, 0, 0, 0, 0, taxi_id, 0))
+
+    def flush(self, position):
+        """Blocks until the log is durable up to the given position."""
+        with self._condition:
+            while self._durable < position:
+                self._condition.wait()
+
+    def close(self):
+        """Makes everything appended durable and closes the log."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._file.close()
+
+    def _append(self, data):
+        with self._condition:
+            self._buffer += data
+            self._position += len(data)
+            self._condition.notify_all()
+            return self._position
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._buffer and not self._closed:
+                    self._condition.wait()
+                if not self._buffer:
+                    return
+                data, self._buffer = self._buffer, bytearray()
+                position = self._position
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            with self._condition:
+                self._durable = position
+                self._condition.notify_all()
@@ -1,11 +1,20 @@
+MIN_COORDINATE = -2 ** 31
+MAX_COORDINATE = 2 ** 31 - 1
+
+
 class Point:
     """Contains the x and y coordinates of a point on a 2D grid.
 
+    Points are values: they compare equal and hash alike when their
+    coordinates are equal, and are not modified once created.
+
     Attributes:
         x: An integer x-coordinate of the point.
         y: An integer y-coordinate of the point.
     """
 
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         """Initializes Point with x and y coordinates.
 
@@ -16,6 +25,17 @@ class Point:
         self.x = x
         self.y = y
 
+    def __eq__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return self.x == other.x and self.y == other.y
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __repr__(self):
+        return 'Point({}, {})'.format(self.x, self.y)
+
 
 def manhattan_dist(src, dst):
     """Returns the manhattan distance between two Point instances.
@@ -28,3 +48,27 @@ def manhattan_dist(src, dst):
         An integer of Manhattan distance units between two Point instances.
     """
     return abs(src.x - dst.x) + abs(src.y - dst.y)
+
+
+def position_along(src, dst, elapsed):
+    """Returns where a taxi travelling from src to dst is after some time.
+
+    Taxis travel along the x-axis first, then the y-axis, covering 1 distance
+    unit per time unit, and stay at dst once they have reached it.
+
+    Args:
+        src: A Point instance the taxi sets off from.
+        dst: A Point instance the taxi is travelling to.
+        elapsed: An integer number of time units since the taxi set off.
+
+    Returns:
+        A Point instance of the taxi's location after elapsed time units.
+    """
+    dx = dst.x - src.x
+    if elapsed <= abs(dx):
+        return Point(src.x + elapsed if dx > 0 else src.x - elapsed, src.y)
+    elapsed -= abs(dx)
+    dy = dst.y - src.y
+    if elapsed >= abs(dy):
+        return Point(dst.x, dst.y)
+    return Point(dst.x, src.y + elapsed if dy > 0 else src.y - elapsed)
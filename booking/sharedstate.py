@@ -0,0 +1,364 @@
+from contextlib import contextmanager
+import fcntl
+import mmap
+import os
+import threading
+import numpy as np
+from .fleet import COLUMNS, FREE, OCCUPIED, FleetStore
+from .gridsimulation import GridSimulation
+from .point import Point
+from .snapshot import write
+from .tickkernels import ArrivalQueueKernel
+
+
+_MAGIC = 0x54415849
+_JOURNAL_CAPACITY = 2 ** 16
+
+# Slots of the int64 header at the start of the shared file.
+_HEADER_SLOTS = 8
+_MAGIC_SLOT = 0
+_NUM_TAXIS_SLOT = 1
+_JOURNAL_CAPACITY_SLOT = 2
+_VERSION_SLOT = 3
+_RESET_VERSION_SLOT = 4
+_TIME_SLOT = 5
+
+
+def _aligned(size):
+    return (size + 7) // 8 * 8
+
+
+class SharedFleetStore(FleetStore):
+    """A FleetStore whose columns live in a memory-mapped file.
+
+    Every process mapping the same file sees the same columns. The file starts
+    with a header, followed by the columns, followed by a journal: a ring
+    buffer of the IDs of the taxis changed by each version of the fleet. The
+    header holds the fleet's current version and time, and the version it was
+    last reset at.
+
+    Attributes:
+        header: A NumPy int64 array view of the file's header.
+        journal: A NumPy int64 array view of the file's journal.
+    """
+
+    _tracks_changes = False
+
+    def __init__(self, path, num_taxis, journal_capacity=_JOURNAL_CAPACITY):
+        """Maps the file at path, creating it if it does not exist.
+
+        Callers must hold the file's lock, as a new file is initialized.
+
+        Args:
+            path: A path to the file to map.
+            num_taxis: An integer number of taxis the file holds.
+            journal_capacity: An integer number of journal entries kept.
+
+        Raises:
+            ValueError: If the file holds a different number of taxis.
+        """
+        offsets = []
+        size = _HEADER_SLOTS * 8
+        for name, dtype in COLUMNS:
+            offsets.append(size)
+            size += _aligned(num_taxis * np.dtype(dtype).itemsize)
+        journal_offset = size
+        size += journal_capacity * 8
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        self.header = np.frombuffer(self._mmap, dtype=np.int64,
+                                    count=_HEADER_SLOTS)
+        for (name, dtype), offset in zip(COLUMNS, offsets):
+            setattr(self, name, np.frombuffer(self._mmap, dtype=dtype,
+                                              count=num_taxis, offset=offset))
+        self.journal = np.frombuffer(self._mmap, dtype=np.int64,
+                                     count=journal_capacity,
+                                     offset=journal_offset)
+
+        if self.header[_MAGIC_SLOT] != _MAGIC:
+            self.header[:] = 0
+            self.header[_NUM_TAXIS_SLOT] = num_taxis
+            self.header[_JOURNAL_CAPACITY_SLOT] = journal_capacity
+            self.header[_RESET_VERSION_SLOT] = -1
+            self.header[_MAGIC_SLOT] = _MAGIC
+        elif (self.header[_NUM_TAXIS_SLOT] != num_taxis
+              or self.header[_JOURNAL_CAPACITY_SLOT] != journal_capacity):
+            raise ValueError('{} holds a different fleet'.format(path))
+
+    @property
+    def initialized(self):
+        """True once the fleet has been reset at least once."""
+        return self.header[_RESET_VERSION_SLOT] >= 0
+
+
+class SharedSimulation(GridSimulation):
+    """A GridSimulation shared by every process mapping the same file.
+
+    Lets several WSGI worker processes serve bookings against one fleet. Taxi
+    state lives in a SharedFleetStore; each process keeps its own spatial
+    index and arrival queue, derived from it. Every operation that changes
+    the fleet takes an exclusive lock on the file, and read-only ones, e.g.
+    taxi_location(), a shared lock, so reads in different processes run side
+    by side, but writes are made one at a time across every process: adding
+    workers does not add booking or tick throughput. Every operation first
+    catches up with changes made by other processes: the journal names the
+    taxis changed since the version this process last saw, so only those
+    are re-indexed. A process that has fallen behind by more than the journal
+    holds, or that has missed a reset, rebuilds its index and arrival queue
+    from the columns instead.
+
+    Attributes:
+        _lock_path: A path to the file locked while operating on the fleet.
+        _thread_lock: A threading.RLock serialising threads of this process,
+            which share the file lock.
+        _lock_depth: An integer number of nested operations holding the lock.
+        _version: An integer fleet version this process has caught up with.
+        _indexed: A NumPy bool array flagging taxis in this process's index.
+        _indexed_x: A NumPy int32 array of x-coordinates taxis are indexed at.
+        _indexed_y: A NumPy int32 array of y-coordinates taxis are indexed at.
+        _changed: A list of IDs of taxis changed by the current operation.
+    """
+
+    def __init__(self, path, starting_point, num_taxis, starting_points=None,
+                 **kwargs):
+        """Attaches to, or creates, the shared simulation stored at path.
+
+        The first process to create the file resets the simulation; others
+        resume it as it is.
+
+        Args:
+            path: A path to the file to share simulation state through.
+            starting_point: A Point instance of where all taxis start from.
+            num_taxis: An integer number of taxis to simulate.
+            starting_points: An array-like of shape (num_taxis, 2) of where
+                each taxi starts from, or None for all to start from
+                starting_point. Only used by the process creating the file.
+            **kwargs: Further keyword arguments for GridSimulation, except
+                tick_kernel, which is always ArrivalQueueKernel.
+
+        Raises:
+            NotImplementedError: If given a dispatch policy or a waiting
+                queue, as bookings chained onto taxis or left waiting would
+                only be kept by this process.
+        """
+        if kwargs.get('dispatch') is not None:
+            raise NotImplementedError(
+                'A shared fleet cannot be dispatched predictively')
+        if kwargs.get('waiting') is not None:
+            raise NotImplementedError(
+                'Bookings cannot be left waiting for a shared fleet')
+        self._lock_path = path + '.lock'
+        self._thread_lock = threading.RLock()
+        self._lock_depth = 0
+        self._changed = []
+        with self._locked():
+            fleet = SharedFleetStore(path, num_taxis)
+            self._indexed = np.zeros(num_taxis, dtype=bool)
+            self._indexed_x = np.zeros(num_taxis, dtype=np.int32)
+            self._indexed_y = np.zeros(num_taxis, dtype=np.int32)
+            super().__init__(starting_point, num_taxis,
+                             tick_kernel=ArrivalQueueKernel, fleet=fleet,
+                             time=int(fleet.header[_TIME_SLOT]), **kwargs)
+            self._version = int(fleet.header[_VERSION_SLOT])
+            if not fleet.initialized:
+                fleet.set_starts(starting_point, starting_points)
+                GridSimulation.reset(self)
+                self._publish(reset=True)
+
+    def book(self, trip, at_time=None):
+        """Makes a booking as GridSimulation.book does, on the shared fleet.
+
+        Raises:
+            NotImplementedError: If given at_time, as bookings made ahead
+                would only be kept by this process.
+        """
+        _check_unscheduled(at_time)
+        with self._operation():
+            return super().book(trip)
+
+    def book_batch(self, trips, at_time=None):
+        """Books trips as GridSimulation.book_batch does, on the shared fleet.
+
+        Raises:
+            NotImplementedError: If given at_time, as book() does.
+        """
+        _check_unscheduled(at_time)
+        with self._operation():
+            return super().book_batch(trips)
+
+    def increment_time(self, ticks=1):
+        """Advances time as GridSimulation.increment_time does, for everyone.
+        """
+        with self._operation():
+            super().increment_time(ticks)
+
+    def reset(self):
+        """Resets the shared simulation to its initial state."""
+        with self._locked():
+            GridSimulation.reset(self)
+            self._publish(reset=True)
+
+    def add_taxis(self, starting_points):
+        """Raises NotImplementedError, as the shared file has a fixed size."""
+        raise NotImplementedError('A shared fleet cannot be added to')
+
+    def retire_taxi(self, taxi_id):
+        """Retires a taxi as GridSimulation.retire_taxi does, for everyone."""
+        with self._operation():
+            super().retire_taxi(taxi_id)
+            self._indexed[taxi_id - 1] = False
+            self._changed.append(taxi_id)
+
+    def taxi_location(self, taxi_id):
+        """Returns the current location of a taxi in the shared fleet."""
+        with self._reading():
+            return super().taxi_location(taxi_id)
+
+    def taxi_counts(self):
+        """Returns the numbers of free and occupied taxis in the shared fleet.
+        """
+        with self._reading():
+            return super().taxi_counts()
+
+    def save(self, path):
+        """Writes a snapshot of the shared simulation to a file."""
+        write(path, *self.capture())
+
+    def capture(self):
+        """Returns a copy of the shared simulation's state."""
+        with self._reading():
+            return super().capture()
+
+    def capture_fleet(self):
+        """Returns a copy of the shared simulation's taxis."""
+        with self._reading():
+            return super().capture_fleet()
+
+    @contextmanager
+    def _locked(self, shared=False):
+        with self._thread_lock:
+            # Operations may nest, e.g. book_batch calling book.
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file,
+                            fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _operation(self):
+        with self._locked():
+            self._catch_up()
+            try:
+                yield
+            finally:
+                self._publish()
+
+    @contextmanager
+    def _reading(self):
+        # Only this process's index and time are caught up, so nothing is
+        # written to the file while others may be reading it too.
+        with self._locked(shared=True):
+            self._catch_up()
+            yield
+
+    def _catch_up(self):
+        header = self._fleet.header
+        self._time = int(header[_TIME_SLOT])
+        version = int(header[_VERSION_SLOT])
+        if version == self._version:
+            return
+        capacity = len(self._fleet.journal)
+        if (header[_RESET_VERSION_SLOT] > self._version
+                or version - self._version > capacity):
+            self._rebuild()
+        else:
+            positions = np.arange(self._version, version) % capacity
+            for taxi_id in np.unique(self._fleet.journal[positions]).tolist():
+                self._reindex(taxi_id)
+        self._version = version
+
+    def _publish(self, reset=False):
+        header = self._fleet.header
+        journal = self._fleet.journal
+        version = int(header[_VERSION_SLOT])
+        if self._changed:
+            positions = (np.arange(version, version + len(self._changed))
+                         % len(journal))
+            journal[positions] = self._changed
+            version += len(self._changed)
+            self._changed = []
+        if reset:
+            # Processes behind this version rebuild rather than read the
+            # journal, so the reset's own slot is never read.
+            version += 1
+            header[_RESET_VERSION_SLOT] = version
+        header[_TIME_SLOT] = self._time
+        header[_VERSION_SLOT] = version
+        self._version = version
+
+    def _reindex(self, taxi_id):
+        row = taxi_id - 1
+        if self._indexed[row]:
+            self._free_taxi_index.remove(
+                taxi_id, Point(int(self._indexed_x[row]),
+                               int(self._indexed_y[row])))
+            self._indexed[row] = False
+        if self._fleet.status[row] == FREE:
+            self._free_taxi_index.insert(taxi_id, self._fleet.location(taxi_id))
+            self._mark_indexed([taxi_id])
+        elif self._fleet.status[row] == OCCUPIED:
+            self._tick_kernel.occupy(taxi_id)
+
+    def _mark_indexed(self, taxi_ids):
+        rows = np.asarray(taxi_ids, dtype=np.int64) - 1
+        self._indexed[rows] = True
+        self._indexed_x[rows] = self._fleet.x[rows]
+        self._indexed_y[rows] = self._fleet.y[rows]
+
+    def _free_up_taxis(self, taxis):
+        super()._free_up_taxis(taxis)
+        self._mark_indexed(taxis)
+        self._changed.extend(taxis)
+
+    def _occupy_taxi(self, trip, taxi_id, duration):
+        super()._occupy_taxi(trip, taxi_id, duration)
+        self._indexed[taxi_id - 1] = False
+        self._changed.append(taxi_id)
+
+    def _rebuild(self):
+        super()._rebuild()
+        self._indexed[:] = self._fleet.status == FREE
+        self._indexed_x[:] = self._fleet.x
+        self._indexed_y[:] = self._fleet.y
+
+    def _initialize_free_taxis(self):
+        # Other processes may have added or retired taxis since the index's
+        # baseline was taken.
+        self._baseline = None
+        super()._initialize_free_taxis()
+        self._indexed[:] = self._fleet.status == FREE
+        self._indexed_x[:] = self._fleet.x
+        self._indexed_y[:] = self._fleet.y
+
+
+def _check_unscheduled(at_time):
+    if at_time is not None:
+        raise NotImplementedError('A shared fleet cannot be booked ahead')
@@ -0,0 +1,231 @@
+import os
+import threading
+import numpy as np
+from .fleet import COLUMNS, FleetStore
+from .point import Point
+from .schedule import SCHEDULE_DTYPE
+from .waiting import TICKET_DTYPE
+
+
+_MAGIC = 0x54415853
+_FORMAT_VERSION = 5
+
+# Slots of the int64 header at the start of a snapshot file.
+_HEADER_SLOTS = 9
+_MAGIC_SLOT = 0
+_FORMAT_VERSION_SLOT = 1
+_NUM_TAXIS_SLOT = 2
+_TIME_SLOT = 3
+_STARTING_X_SLOT = 4
+_STARTING_Y_SLOT = 5
+_LOG_POSITION_SLOT = 6
+_NUM_SCHEDULED_SLOT = 7
+_NUM_TICKETS_SLOT = 8
+
+
+def _aligned(size):
+    return (size + 7) // 8 * 8
+
+
+def _column_offsets(num_taxis):
+    offsets = []
+    size = _HEADER_SLOTS * 8
+    for name, dtype in COLUMNS:
+        offsets.append(size)
+        size += _aligned(num_taxis * np.dtype(dtype).itemsize)
+    return offsets, size
+
+
+def write(path, fleet, time, starting_point, scheduled=None, tickets=None,
+          log_position=None):
+    """Writes a snapshot of a fleet at the given time to a file.
+
+    The file starts with an int64 header, followed by each column of the
+    fleet as it is laid out in memory, padded to 8 bytes, so that it can be
+    mapped back without decoding, and then by the records of the bookings
+    made ahead and of the tickets given out. It is written to a temporary
+    file first and then renamed over path, so path always holds a complete
+    snapshot, even if the process dies while writing.
+
+    Args:
+        path: A path to the file to write.
+        fleet: A FleetStore of the taxis to write.
+        time: An integer time the fleet is at.
+        starting_point: A Point instance of where the fleet's taxis start
+            from when the simulation is reset.
+        scheduled: An array of the schedule.SCHEDULE_DTYPE records of the
+            bookings made ahead since the last reset, or None for none.
+        tickets: An array of the waiting.TICKET_DTYPE records of the tickets
+            given out since the last reset, or None for none.
+        log_position: An integer byte position of the OperationLog the
+            fleet is in the state of, or None if operations are not logged.
+    """
+    header = np.zeros(_HEADER_SLOTS, dtype=np.int64)
+    header[_MAGIC_SLOT] = _MAGIC
+    header[_FORMAT_VERSION_SLOT] = _FORMAT_VERSION
+    header[_NUM_TAXIS_SLOT] = len(fleet)
+    header[_TIME_SLOT] = time
+    header[_STARTING_X_SLOT] = starting_point.x
+    header[_STARTING_Y_SLOT] = starting_point.y
+    header[_LOG_POSITION_SLOT] = -1 if log_position is None else log_position
+    if scheduled is None:
+        scheduled = np.zeros(0, dtype=SCHEDULE_DTYPE)
+    header[_NUM_SCHEDULED_SLOT] = len(scheduled)
+    if tickets is None:
+        tickets = np.zeros(0, dtype=TICKET_DTYPE)
+    header[_NUM_TICKETS_SLOT] = len(tickets)
+
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'wb') as file:
+        file.write(header.tobytes())
+        for name, dtype in COLUMNS:
+            column = np.ascontiguousarray(getattr(fleet, name), dtype=dtype)
+            file.write(column.data)
+            file.write(bytes(_aligned(column.nbytes) - column.nbytes))
+        file.write(np.ascontiguousarray(scheduled, dtype=SCHEDULE_DTYPE).data)
+        file.write(np.ascontiguousarray(tickets, dtype=TICKET_DTYPE).data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+def log_position(path):
+    """Returns the OperationLog position a snapshot file was taken at.
+
+    Returns:
+        An integer byte position of the log, or None if the snapshot was
+        taken without one.
+
+    Raises:
+        ValueError: If the file is not a snapshot.
+    """
+    header = np.fromfile(path, dtype=np.int64, count=_HEADER_SLOTS)
+    if (len(header) != _HEADER_SLOTS or header[_MAGIC_SLOT] != _MAGIC
+            or header[_FORMAT_VERSION_SLOT] != _FORMAT_VERSION):
+        raise ValueError('{} is not a snapshot'.format(path))
+    position = int(header[_LOG_POSITION_SLOT])
+    return None if position < 0 else position
+
+
+class SnapshotFleetStore(FleetStore):
+    """A FleetStore restored from a snapshot file.
+
+    The file is memory-mapped copy-on-write: columns are read from the page
+    cache as they are touched, and changes to them stay private to this
+    process, leaving the file as it was written.
+
+    Attributes:
+        time: An integer time the snapshot was taken at.
+        starting_point: A Point instance of where taxis start from when the
+            simulation is reset.
+        log_position: An integer byte position of the OperationLog the
+            snapshot is in the state of, or None if it was taken without one.
+        scheduled: An array of the schedule.SCHEDULE_DTYPE records of the
+            bookings made ahead when the snapshot was taken.
+        tickets: An array of the waiting.TICKET_DTYPE records of the tickets
+            given out when the snapshot was taken.
+    """
+
+    def __init__(self, path):
+        """Maps the snapshot file at path.
+
+        Args:
+            path: A path to a file written by write().
+
+        Raises:
+            ValueError: If the file is not a complete snapshot.
+        """
+        data = np.memmap(path, dtype=np.uint8, mode='c')
+        header = data[:_HEADER_SLOTS * 8].view(np.int64)
+        if (len(header) != _HEADER_SLOTS or header[_MAGIC_SLOT] != _MAGIC
+                or header[_FORMAT_VERSION_SLOT] != _FORMAT_VERSION):
+            raise ValueError('{} is not a snapshot'.format(path))
+        num_taxis = int(header[_NUM_TAXIS_SLOT])
+        offsets, size = _column_offsets(num_taxis)
+        num_scheduled = int(header[_NUM_SCHEDULED_SLOT])
+        tickets_offset = size + num_scheduled * SCHEDULE_DTYPE.itemsize
+        num_tickets = int(header[_NUM_TICKETS_SLOT])
+        if len(data) != tickets_offset + num_tickets * TICKET_DTYPE.itemsize:
+            raise ValueError('{} is not a complete snapshot'.format(path))
+
+        for (name, dtype), offset in zip(COLUMNS, offsets):
+            end = offset + num_taxis * np.dtype(dtype).itemsize
+            setattr(self, name, data[offset:end].view(dtype))
+        self.time = int(header[_TIME_SLOT])
+        self.starting_point = Point(int(header[_STARTING_X_SLOT]),
+                                    int(header[_STARTING_Y_SLOT]))
+        log_position = int(header[_LOG_POSITION_SLOT])
+        self.log_position = None if log_position < 0 else log_position
+        self.scheduled = data[size:tickets_offset].view(SCHEDULE_DTYPE)
+        self.tickets = data[tickets_offset:].view(TICKET_DTYPE)
+
+
+class PeriodicSnapshot:
+    """Snapshots a simulation to a file at a fixed interval.
+
+    Runs in a daemon thread. The lock guarding the simulation is only held
+    while its state is copied; the copy is written to disk after releasing
+    it, so bookings are not held up by the write. Every writer of the
+    simulation, e.g. the views and the ASGI application through models, must
+    hold the same lock, so that no snapshot is taken halfway through an
+    operation, or between an operation and its being logged. Given an
+    OperationLog, each snapshot records the position of the log it was taken
+    at, once the log is durable up to it, so that recovery only replays the
+    log after it.
+
+    Attributes:
+        _simulation: The GridSimulation to snapshot.
+        _path: A path to the snapshot file.
+        _interval: A number of seconds between snapshots.
+        _lock: A lock held by every caller of the simulation.
+        _log: The OperationLog the simulation's operations are appended to,
+            or None.
+        _stopped: A threading.Event set once stop() is called.
+        _thread: The threading.Thread taking snapshots, or None.
+    """
+
+    def __init__(self, simulation, path, interval, lock, log=None):
+        """Initializes snapshots of simulation, without starting them.
+
+        Args:
+            simulation: A GridSimulation to snapshot.
+            path: A path to the file to write snapshots to.
+            interval: A positive number of seconds between snapshots.
+            lock: A lock held by every caller of the simulation, e.g. a
+                threading.Lock.
+            log: An OperationLog the simulation's operations are appended
+                to, or None.
+        """
+        self._simulation = simulation
+        self._path = path
+        self._interval = interval
+        self._lock = lock
+        self._log = log
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts taking snapshots in a background thread."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops taking snapshots, after taking a final one."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.snapshot()
+
+    def snapshot(self):
+        """Writes a snapshot of the simulation as it is now."""
+        with self._lock:
+            state = self._simulation.capture()
+            log_position = self._log.position if self._log else None
+        if log_position is not None:
+            self._log.flush(log_position)
+        write(self._path, *state, log_position=log_position)
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            self.snapshot()
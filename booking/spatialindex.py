@@ -0,0 +1,650 @@
+from bisect import bisect_left, insort
+import gc
+import heapq
+from itertools import count, islice
+import numpy as np
+from sortedcontainers import SortedDict, SortedList
+from .point import Point, manhattan_dist
+
+
+_LEAF_CAPACITY = 16
+_ROOT_HALF_SIZE = 2 ** 31
+_SORTED_LIST_MIN = 256
+
+
+class LinearScanIndex:
+    """Indexes taxi locations by scanning every taxi on lookup.
+
+    Lookups cost O(n) in the number of indexed taxis. Kept as the reference
+    implementation that QuadTreeIndex is checked against.
+
+    Attributes:
+        _locations: A SortedDict of taxi IDs mapped to their Point locations.
+        last_scanned: An integer number of candidates examined by the most
+            recent nearest() call.
+    """
+
+    def __init__(self):
+        self._locations = SortedDict()
+        self.last_scanned = 0
+
+    def __len__(self):
+        return len(self._locations)
+
+    def insert(self, taxi_id, location):
+        """Adds a taxi at the given Point location to the index."""
+        self._locations[taxi_id] = location
+
+    def insert_many(self, taxi_ids, location):
+        """Adds taxis all at the same Point location to the index."""
+        for taxi_id in taxi_ids:
+            self._locations[taxi_id] = location
+
+    def insert_all(self, taxi_ids, xs, ys):
+        """Adds taxis at the given coordinates to the index.
+
+        Args:
+            taxi_ids: A NumPy array of taxi IDs.
+            xs: A NumPy array of the matching x-coordinates.
+            ys: A NumPy array of the matching y-coordinates.
+        """
+        for taxi_id, x, y in zip(taxi_ids.tolist(), xs.tolist(), ys.tolist()):
+            self._locations[taxi_id] = Point(x, y)
+
+    def remove(self, taxi_id, location):
+        """Removes a taxi previously inserted at the given Point location."""
+        del self._locations[taxi_id]
+
+    def clear(self):
+        """Removes every taxi from the index."""
+        self._locations.clear()
+
+    def checkpoint(self):
+        """Returns a copy of the index's contents, to restore() it to later.
+        """
+        return self._locations.copy()
+
+    def restore(self, checkpoint):
+        """Sets the index's contents to those of a checkpoint() of it."""
+        self._locations = checkpoint.copy()
+
+    def nearest(self, location):
+        """Finds the indexed taxi closest to the given Point location.
+
+        Args:
+            location: A Point instance to measure Manhattan distance from.
+
+        Returns:
+            A tuple of the closest taxi's ID and its distance to location. If
+            more than one taxi qualifies, the taxi with the smallest ID is
+            returned. (None, inf) is returned if the index is empty.
+        """
+        closest_taxi_id, shortest_dist = None, float('inf')
+        for taxi_id, taxi_location in self._locations.items():
+            dist = manhattan_dist(taxi_location, location)
+            if dist < shortest_dist:
+                closest_taxi_id = taxi_id
+                shortest_dist = dist
+        self.last_scanned = len(self._locations)
+        return closest_taxi_id, shortest_dist
+
+    def iter_nearest(self, location):
+        """Yields indexed taxis in order of distance to given Point location.
+
+        Taxis at the same distance are yielded in order of ID.
+
+        Args:
+            location: A Point instance to measure Manhattan distance from.
+
+        Yields:
+            Tuples of a taxi's ID and its distance to location.
+        """
+        self.last_scanned = len(self._locations)
+        candidates = sorted((manhattan_dist(taxi_location, location), taxi_id)
+                            for taxi_id, taxi_location
+                            in self._locations.items())
+        for dist, taxi_id in candidates:
+            yield taxi_id, dist
+
+
+class _TaxiIds(list):
+    """A sorted list of the IDs of the taxis at one location.
+
+    Has the methods of SortedList that QuadTreeIndex uses, and is much
+    cheaper to create, which matters when a fleet is spread over many
+    locations. Locations holding many taxis use a SortedList instead.
+    """
+
+    __slots__ = ()
+
+    def add(self, taxi_id):
+        insort(self, taxi_id)
+
+    def update(self, taxi_ids):
+        self.extend(taxi_ids)
+        self.sort()
+
+    def remove(self, taxi_id):
+        position = bisect_left(self, taxi_id)
+        if position == len(self) or self[position] != taxi_id:
+            raise ValueError('{} not in list'.format(taxi_id))
+        del self[position]
+
+
+def _taxi_ids(sorted_ids):
+    if len(sorted_ids) >= _SORTED_LIST_MIN:
+        return SortedList(sorted_ids)
+    return _TaxiIds(sorted_ids)
+
+
+class _OverlayIds:
+    """The IDs of the taxis at one location, as changed since a checkpoint.
+
+    The checkpoint's sorted IDs are shared with it rather than copied, which
+    matters for locations holding many taxis, e.g. a fleet parked at a single
+    Point. IDs removed from them are kept in a set, and IDs added since in a
+    _TaxiIds. Has the methods of SortedList that QuadTreeIndex uses.
+
+    Attributes:
+        _base: The checkpoint's sorted IDs, which are not modified.
+        _head: An integer position in _base before which every ID is removed.
+        _removed: A set of the IDs removed from _base.
+        _added: A _TaxiIds of the IDs added.
+    """
+
+    __slots__ = ('_base', '_head', '_removed', '_added')
+
+    def __init__(self, base):
+        self._base = base
+        self._head = 0
+        self._removed = set()
+        self._added = _TaxiIds()
+
+    def __len__(self):
+        return len(self._base) - len(self._removed) + len(self._added)
+
+    def __getitem__(self, position):
+        """Returns the smallest ID, the only one QuadTreeIndex looks up."""
+        if position != 0:
+            raise IndexError(position)
+        base, removed = self._base, self._removed
+        # Taxis are mostly removed smallest ID first, so this skips each
+        # removed ID about once.
+        while self._head < len(base) and base[self._head] in removed:
+            self._head += 1
+        if self._head < len(base):
+            if self._added and self._added[0] < base[self._head]:
+                return self._added[0]
+            return base[self._head]
+        return self._added[0]
+
+    def __iter__(self):
+        removed = self._removed
+        return heapq.merge((taxi_id for taxi_id
+                            in islice(self._base, self._head, None)
+                            if taxi_id not in removed), self._added)
+
+    def add(self, taxi_id):
+        if taxi_id in self._removed:
+            self._removed.remove(taxi_id)
+            self._head = min(self._head, bisect_left(self._base, taxi_id))
+        else:
+            self._added.add(taxi_id)
+
+    def update(self, taxi_ids):
+        for taxi_id in taxi_ids:
+            self.add(taxi_id)
+
+    def remove(self, taxi_id):
+        position = bisect_left(self._added, taxi_id)
+        if position < len(self._added) and self._added[position] == taxi_id:
+            del self._added[position]
+            return
+        position = bisect_left(self._base, taxi_id)
+        if (position == len(self._base) or self._base[position] != taxi_id
+                or taxi_id in self._removed):
+            raise ValueError('{} not in list'.format(taxi_id))
+        self._removed.add(taxi_id)
+
+
+def _copied_ids(taxi_ids):
+    # Returns IDs to modify in place of IDs shared with a checkpoint.
+    if len(taxi_ids) < _SORTED_LIST_MIN:
+        return _TaxiIds(taxi_ids)
+    if isinstance(taxi_ids, _OverlayIds):
+        return SortedList(taxi_ids)
+    return _OverlayIds(taxi_ids)
+
+
+class _Node:
+    """A square cell of a QuadTreeIndex covering [x0, x0 + size) on both axes.
+
+    A leaf node maps distinct (x, y) coordinates to a _TaxiIds, SortedList or
+    _OverlayIds of IDs of the taxis at that coordinate. An internal node has
+    exactly four children.
+
+    A node belongs to the epoch of the index it was created in, and is only
+    modified in that epoch. A leaf copied from an earlier epoch's shares that
+    leaf's IDs at the coordinates in shared, until they are first modified.
+    """
+
+    __slots__ = ('x0', 'y0', 'size', 'count', 'children', 'locations',
+                 'epoch', 'shared')
+
+    def __init__(self, x0, y0, size, epoch):
+        self.x0 = x0
+        self.y0 = y0
+        self.size = size
+        self.count = 0
+        self.children = None
+        self.locations = {}
+        self.epoch = epoch
+        self.shared = None
+
+    def copy(self, epoch):
+        node = _Node(self.x0, self.y0, self.size, epoch)
+        node.count = self.count
+        if self.children is not None:
+            node.children = list(self.children)
+            node.locations = None
+        else:
+            node.locations = dict(self.locations)
+            if node.locations:
+                node.shared = set(node.locations)
+        return node
+
+    def min_dist(self, x, y):
+        if x < self.x0:
+            dx = self.x0 - x
+        elif x >= self.x0 + self.size:
+            dx = x - (self.x0 + self.size - 1)
+        else:
+            dx = 0
+        if y < self.y0:
+            dy = self.y0 - y
+        elif y >= self.y0 + self.size:
+            dy = y - (self.y0 + self.size - 1)
+        else:
+            dy = 0
+        return dx + dy
+
+    def contains(self, x, y):
+        return (self.x0 <= x < self.x0 + self.size
+                and self.y0 <= y < self.y0 + self.size)
+
+    def quadrant(self, x, y):
+        half = self.size // 2
+        return (x >= self.x0 + half) + 2 * (y >= self.y0 + half)
+
+    def child_for(self, x, y):
+        return self.children[self.quadrant(x, y)]
+
+
+class QuadTreeIndex:
+    """Indexes taxi locations in a region quadtree for sub-linear lookups.
+
+    The tree initially covers the 32-bit grid and doubles its extent whenever
+    a location outside of it is inserted. Taxis sharing a location are grouped,
+    so a fleet parked at a single Point occupies one leaf entry. A leaf splits
+    into quadrants once it holds more than leaf_capacity distinct locations.
+
+    Nearest-taxi lookups are best-first searches ordered by the Manhattan
+    distance from the query Point to each cell, so only cells that could hold a
+    closer taxi than the best found so far are visited.
+
+    The tree is copied on write: a checkpoint() keeps the current tree and
+    starts a new epoch, whose changes copy the nodes on the path to the cell
+    changed the first time they are modified, and a restore() puts a kept tree
+    back, both without visiting any node.
+
+    Attributes:
+        last_scanned: An integer number of distinct locations examined by the
+            most recent nearest() call.
+    """
+
+    def __init__(self, leaf_capacity=_LEAF_CAPACITY):
+        """Initializes an empty index.
+
+        Args:
+            leaf_capacity: An integer number of distinct locations a leaf can
+                hold before it is split.
+        """
+        self._leaf_capacity = leaf_capacity
+        self._half_size = _ROOT_HALF_SIZE
+        self._epoch = 0
+        self._root = _Node(-self._half_size, -self._half_size,
+                           2 * self._half_size, self._epoch)
+        self.last_scanned = 0
+
+    def __len__(self):
+        return self._root.count
+
+    def insert(self, taxi_id, location):
+        """Adds a taxi at the given Point location to the index."""
+        x, y = location.x, location.y
+        leaf = self._leaf_for_insert(x, y, 1)
+        taxi_ids = leaf.locations.get((x, y))
+        if taxi_ids is None:
+            leaf.locations[(x, y)] = _TaxiIds([taxi_id])
+            self._split_if_full(leaf)
+        else:
+            self._own_ids(leaf, (x, y)).add(taxi_id)
+
+    def insert_many(self, taxi_ids, location):
+        """Adds taxis all at the same Point location to the index.
+
+        Sorts the IDs once rather than inserting them one at a time, which
+        makes placing a large fleet at a single Point cheap.
+        """
+        taxi_ids = _taxi_ids(sorted(taxi_ids))
+        if not taxi_ids:
+            return
+        x, y = location.x, location.y
+        leaf = self._leaf_for_insert(x, y, len(taxi_ids))
+        existing_ids = leaf.locations.get((x, y))
+        if existing_ids is None:
+            leaf.locations[(x, y)] = taxi_ids
+            self._split_if_full(leaf)
+        else:
+            self._own_ids(leaf, (x, y)).update(taxi_ids)
+
+    def insert_all(self, taxi_ids, xs, ys):
+        """Adds taxis at the given coordinates to the index.
+
+        Into an empty index, e.g. when placing a whole fleet, the tree is
+        built top-down a level at a time with NumPy operations over all
+        locations, splitting each cell once rather than as it fills up, and
+        taxis sharing a location are grouped with a single sort.
+
+        Args:
+            taxi_ids: A NumPy array of taxi IDs.
+            xs: A NumPy array of the matching x-coordinates.
+            ys: A NumPy array of the matching y-coordinates.
+        """
+        if not len(taxi_ids):
+            return
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        order = np.lexsort((taxi_ids, ys, xs))
+        taxi_ids, xs, ys = taxi_ids[order], xs[order], ys[order]
+        starts = np.flatnonzero(np.concatenate(
+            ([True], (xs[1:] != xs[:-1]) | (ys[1:] != ys[:-1]))))
+        ends = np.append(starts[1:], len(taxi_ids))
+        xs, ys = xs[starts], ys[starts]
+        if len(self) or not (
+                -self._half_size <= min(xs.min(), ys.min())
+                and max(xs.max(), ys.max()) < self._half_size):
+            ids = taxi_ids.tolist()
+            for x, y, start, end in zip(xs.tolist(), ys.tolist(),
+                                        starts.tolist(), ends.tolist()):
+                self.insert_many(ids[start:end], Point(x, y))
+            return
+        # Building allocates an object or more per location, none of which
+        # can form reference cycles, so collecting garbage meanwhile is
+        # wasted work.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._build(xs, ys, starts, ends, taxi_ids.tolist())
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def remove(self, taxi_id, location):
+        """Removes a taxi previously inserted at the given Point location.
+
+        Raises:
+            KeyError: If the taxi is not indexed at the given location.
+        """
+        x, y = location.x, location.y
+        epoch = self._epoch
+        node = self._writable_root()
+        path = [node]
+        while node.children is not None:
+            quadrant = node.quadrant(x, y)
+            child = node.children[quadrant]
+            if child.epoch != epoch:
+                child = node.children[quadrant] = child.copy(epoch)
+            path.append(child)
+            node = child
+        taxi_ids = node.locations[(x, y)]
+        if node.shared:
+            taxi_ids = self._own_ids(node, (x, y))
+        taxi_ids.remove(taxi_id)
+        leaf = node
+        if not taxi_ids:
+            del leaf.locations[(x, y)]
+        for node in path:
+            node.count -= 1
+            if node.count == 0:
+                node.children = None
+                node.locations = {}
+                node.shared = None
+                break
+
+    def clear(self):
+        """Removes every taxi from the index."""
+        self._root = _Node(-self._half_size, -self._half_size,
+                           2 * self._half_size, self._epoch)
+
+    def checkpoint(self):
+        """Returns the index's contents, to restore() it to later.
+
+        Takes O(1) time: the tree is kept as it is, and copied on write from
+        then on.
+        """
+        self._epoch += 1
+        return self._root, self._half_size
+
+    def restore(self, checkpoint):
+        """Sets the index's contents to those of a checkpoint() of it.
+
+        Takes O(1) time, plus freeing the nodes copied since the index was
+        last checkpointed or restored.
+        """
+        self._epoch += 1
+        self._root, self._half_size = checkpoint
+
+    def nearest(self, location):
+        """Finds the indexed taxi closest to the given Point location.
+
+        Args:
+            location: A Point instance to measure Manhattan distance from.
+
+        Returns:
+            A tuple of the closest taxi's ID and its distance to location. If
+            more than one taxi qualifies, the taxi with the smallest ID is
+            returned. (None, inf) is returned if the index is empty.
+        """
+        x, y = location.x, location.y
+        self.last_scanned = 0
+        if self._root.count == 0:
+            return None, float('inf')
+
+        # Cells sort before taxis at equal distance, so when a taxi is popped
+        # every cell that could hold a closer or equally close taxi with a
+        # smaller ID has already been expanded. Only the closest taxi of each
+        # leaf can be the answer, so leaves contribute a single entry.
+        tie_breaker = count()
+        heap = [(self._root.min_dist(x, y), 0, next(tie_breaker), self._root)]
+        while heap:
+            dist, is_taxi, key, node = heapq.heappop(heap)
+            if is_taxi:
+                return key, dist
+            if node.children is None:
+                best = None
+                for (taxi_x, taxi_y), taxi_ids in node.locations.items():
+                    candidate = (abs(taxi_x - x) + abs(taxi_y - y), taxi_ids[0])
+                    if best is None or candidate < best:
+                        best = candidate
+                self.last_scanned += len(node.locations)
+                heapq.heappush(heap, (best[0], 1, best[1], None))
+            else:
+                for child in node.children:
+                    if child.count:
+                        heapq.heappush(heap, (child.min_dist(x, y), 0,
+                                              next(tie_breaker), child))
+        return None, float('inf')
+
+    def iter_nearest(self, location):
+        """Yields indexed taxis in order of distance to given Point location.
+
+        Taxis at the same distance are yielded in order of ID. The index must
+        not be modified while the iteration is in progress.
+
+        Args:
+            location: A Point instance to measure Manhattan distance from.
+
+        Yields:
+            Tuples of a taxi's ID and its distance to location.
+        """
+        x, y = location.x, location.y
+        self.last_scanned = 0
+        if self._root.count == 0:
+            return
+
+        tie_breaker = count()
+        heap = [(self._root.min_dist(x, y), 0, next(tie_breaker), self._root)]
+        while heap:
+            dist, is_taxi, key, item = heapq.heappop(heap)
+            if is_taxi:
+                yield key, dist
+                next_id = next(item, None)
+                if next_id is not None:
+                    heapq.heappush(heap, (dist, 1, next_id, item))
+            elif item.children is None:
+                for (taxi_x, taxi_y), taxi_ids in item.locations.items():
+                    taxi_ids = iter(taxi_ids)
+                    heapq.heappush(heap, (abs(taxi_x - x) + abs(taxi_y - y), 1,
+                                          next(taxi_ids), taxi_ids))
+                self.last_scanned += len(item.locations)
+            else:
+                for child in item.children:
+                    if child.count:
+                        heapq.heappush(heap, (child.min_dist(x, y), 0,
+                                              next(tie_breaker), child))
+
+    def _leaf_for_insert(self, x, y, num_taxis):
+        if not self._root.contains(x, y):
+            self._grow_to_contain(x, y)
+        epoch = self._epoch
+        node = self._writable_root()
+        while True:
+            node.count += num_taxis
+            if node.children is None:
+                return node
+            quadrant = node.quadrant(x, y)
+            child = node.children[quadrant]
+            if child.epoch != epoch:
+                child = node.children[quadrant] = child.copy(epoch)
+            node = child
+
+    def _writable_root(self):
+        if self._root.epoch != self._epoch:
+            self._root = self._root.copy(self._epoch)
+        return self._root
+
+    def _own_ids(self, leaf, key):
+        taxi_ids = leaf.locations[key]
+        if leaf.shared and key in leaf.shared:
+            leaf.shared.remove(key)
+            taxi_ids = leaf.locations[key] = _copied_ids(taxi_ids)
+        return taxi_ids
+
+    def _split_if_full(self, node):
+        if len(node.locations) > self._leaf_capacity and node.size > 1:
+            self._split(node)
+
+    def _split(self, node):
+        half = node.size // 2
+        node.children = [_Node(node.x0, node.y0, half, self._epoch),
+                         _Node(node.x0 + half, node.y0, half, self._epoch),
+                         _Node(node.x0, node.y0 + half, half, self._epoch),
+                         _Node(node.x0 + half, node.y0 + half, half,
+                               self._epoch)]
+        locations, node.locations = node.locations, None
+        shared, node.shared = node.shared, None
+        for (x, y), taxi_ids in locations.items():
+            child = node.child_for(x, y)
+            child.locations[(x, y)] = taxi_ids
+            child.count += len(taxi_ids)
+            if shared and (x, y) in shared:
+                if child.shared is None:
+                    child.shared = set()
+                child.shared.add((x, y))
+        for child in node.children:
+            self._split_if_full(child)
+
+    def _build(self, xs, ys, starts, ends, taxi_ids):
+        # Each pass places the locations of the current level's cells: a cell
+        # with few enough distinct locations becomes a leaf holding them, any
+        # other is split, and its locations move to the next level.
+        epoch = self._epoch
+        self.clear()
+        keys = list(zip(xs.tolist(), ys.tolist()))
+        starts_list, ends_list = starts.tolist(), ends.tolist()
+        counts = ends - starts
+        nodes = [self._root]
+        node_x0 = np.array([self._root.x0], dtype=np.int64)
+        node_y0 = np.array([self._root.y0], dtype=np.int64)
+        node_size = np.array([self._root.size], dtype=np.int64)
+        locations = np.arange(len(xs))
+        cell = np.zeros(len(xs), dtype=np.int64)
+        while len(locations):
+            num_locations = np.bincount(cell, minlength=len(nodes))
+            num_taxis = np.bincount(cell, weights=counts[locations],
+                                    minlength=len(nodes))
+            for node, node_count in zip(nodes, num_taxis.tolist()):
+                node.count = int(node_count)
+            is_leaf = (num_locations <= self._leaf_capacity) | (node_size == 1)
+
+            in_leaf = is_leaf[cell]
+            for location, node in zip(locations[in_leaf].tolist(),
+                                      cell[in_leaf].tolist()):
+                ids = taxi_ids[starts_list[location]:ends_list[location]]
+                nodes[node].locations[keys[location]] = _taxi_ids(ids)
+
+            split = np.flatnonzero(~is_leaf)
+            children = []
+            for node in split.tolist():
+                node = nodes[node]
+                half = node.size // 2
+                node.children = [
+                    _Node(node.x0, node.y0, half, epoch),
+                    _Node(node.x0 + half, node.y0, half, epoch),
+                    _Node(node.x0, node.y0 + half, half, epoch),
+                    _Node(node.x0 + half, node.y0 + half, half, epoch)]
+                node.locations = None
+                children.extend(node.children)
+            child_index = np.full(len(nodes), -1, dtype=np.int64)
+            child_index[split] = 4 * np.arange(len(split))
+
+            locations, parent = locations[~in_leaf], cell[~in_leaf]
+            half = node_size[parent] // 2
+            cell = (child_index[parent]
+                    + (xs[locations] >= node_x0[parent] + half)
+                    + 2 * (ys[locations] >= node_y0[parent] + half))
+            half = node_size[split] // 2
+            node_x0 = (node_x0[split][:, None]
+                       + half[:, None] * np.array([0, 1, 0, 1])).ravel()
+            node_y0 = (node_y0[split][:, None]
+                       + half[:, None] * np.array([0, 0, 1, 1])).ravel()
+            node_size = np.repeat(half, 4)
+            nodes = children
+
+    def _grow_to_contain(self, x, y):
+        entries = list(self._entries(self._root))
+        while not (-self._half_size <= x < self._half_size
+                   and -self._half_size <= y < self._half_size):
+            self._half_size *= 2
+        self.clear()
+        for taxi_x, taxi_y, taxi_ids in entries:
+            self.insert_many(taxi_ids, Point(taxi_x, taxi_y))
+
+    def _entries(self, node):
+        if node.children is None:
+            for (x, y), taxi_ids in node.locations.items():
+                yield x, y, taxi_ids
+        else:
+            for child in node.children:
+                yield from self._entries(child)
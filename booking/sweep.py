@@ -0,0 +1,254 @@
+"""Runs scenarios of fleets against the same trace of bookings in parallel.
+
+The trace is written once to a binary file: an int64 header, followed by a
+record per booking of the time it is made and its trip, in time order.
+Scenarios are fanned out to a pool of worker processes, which each map the
+file rather than being sent a copy of the trace, so every worker reads the
+same pages of the page cache. Each worker replays the whole trace against a
+GridSimulation of its scenario's fleet, and returns a few totals, which are
+aggregated into one results table.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import time
+import numpy as np
+from .gridsimulation import MAX_TICKS, GridSimulation
+from .point import Point
+from .trip import Trip
+
+
+_MAGIC = 0x54524143
+_FORMAT_VERSION = 1
+
+# Slots of the int64 header at the start of a trace file.
+_HEADER_SLOTS = 4
+_MAGIC_SLOT = 0
+_FORMAT_VERSION_SLOT = 1
+_NUM_BOOKINGS_SLOT = 2
+_DURATION_SLOT = 3
+
+BOOKING_DTYPE = np.dtype([('time', '<i8'), ('src_x', '<i4'),
+                          ('src_y', '<i4'), ('dst_x', '<i4'),
+                          ('dst_y', '<i4')])
+
+# Where every taxi of a scenario starts from: all from the centre of the
+# grid, or spread uniformly at random over the area bookings are made in.
+LAYOUTS = ('centre', 'spread')
+
+Scenario = namedtuple('Scenario', ('layout', 'num_taxis', 'seed'))
+Scenario.__doc__ = """A fleet to replay a trace against.
+
+Attributes:
+    layout: A string in LAYOUTS of where the fleet's taxis start from.
+    num_taxis: An integer number of taxis in the fleet.
+    seed: An integer seed of the random starting points of a spread layout.
+"""
+
+Result = namedtuple('Result', ('scenario', 'bookings', 'booked',
+                               'pickup_time', 'busy_time', 'duration',
+                               'seconds'))
+Result.__doc__ = """The totals of replaying a trace against a Scenario.
+
+Attributes:
+    scenario: The Scenario replayed.
+    bookings: An integer number of bookings made.
+    booked: An integer number of bookings a taxi was found for.
+    pickup_time: An integer total of the time taken to pick up customers.
+    busy_time: An integer total of the time taxis spent booked, up to the end
+        of the trace.
+    duration: An integer number of time units the trace lasts.
+    seconds: A float number of seconds the replay took.
+"""
+
+
+def write_trace(path, operations):
+    """Writes a trace of bookings to a file, to be replayed by scenarios.
+
+    Args:
+        path: A path to the file to write.
+        operations: An iterable of operations, as read by the replay
+            benchmark, e.g. {"op": "book", "booking": {...}},
+            {"op": "book/batch", "bookings": [...]} and {"op": "tick", "n": 1}.
+
+    Returns:
+        An integer number of bookings written.
+
+    Raises:
+        ValueError: If an operation is not a booking or tick, as scenarios
+            are replayed from the start only, or a booking is invalid.
+        KeyError, TypeError: If an operation is malformed.
+    """
+    records = []
+    now = 0
+    for operation in operations:
+        name = operation['op']
+        if name == 'book':
+            bookings = [operation['booking']]
+        elif name == 'book/batch':
+            bookings = operation['bookings']
+        elif name == 'tick':
+            now += operation.get('n', 1)
+            continue
+        else:
+            raise ValueError('Cannot sweep a trace with {} operations'
+                             .format(name))
+        for booking in bookings:
+            trip = Trip(booking)
+            records.append((now, trip.src.x, trip.src.y, trip.dst.x,
+                            trip.dst.y))
+
+    header = np.zeros(_HEADER_SLOTS, dtype=np.int64)
+    header[_MAGIC_SLOT] = _MAGIC
+    header[_FORMAT_VERSION_SLOT] = _FORMAT_VERSION
+    header[_NUM_BOOKINGS_SLOT] = len(records)
+    header[_DURATION_SLOT] = now
+    with open(path, 'wb') as file:
+        file.write(header.tobytes())
+        file.write(np.array(records, dtype=BOOKING_DTYPE).tobytes())
+    return len(records)
+
+
+def read_trace(path):
+    """Maps a trace file written by write_trace(), without reading it.
+
+    Returns:
+        A tuple of a read-only array of BOOKING_DTYPE records of every
+        booking, in time order, and the integer number of time units the
+        trace lasts.
+
+    Raises:
+        ValueError: If the file is not a complete trace.
+    """
+    header = np.fromfile(path, dtype=np.int64, count=_HEADER_SLOTS)
+    if (len(header) != _HEADER_SLOTS or header[_MAGIC_SLOT] != _MAGIC
+            or header[_FORMAT_VERSION_SLOT] != _FORMAT_VERSION):
+        raise ValueError('{} is not a trace'.format(path))
+    num_bookings = int(header[_NUM_BOOKINGS_SLOT])
+    if not num_bookings:
+        return np.zeros(0, dtype=BOOKING_DTYPE), int(header[_DURATION_SLOT])
+    bookings = np.memmap(path, dtype=BOOKING_DTYPE, mode='r',
+                         offset=_HEADER_SLOTS * 8, shape=(num_bookings,))
+    return bookings, int(header[_DURATION_SLOT])
+
+
+def starting_points(scenario, bookings):
+    """Returns where each taxi of a scenario starts from.
+
+    Args:
+        scenario: A Scenario.
+        bookings: An array of the BOOKING_DTYPE records of the trace.
+
+    Returns:
+        An array of shape (num_taxis, 2) of x and y coordinates.
+    """
+    if scenario.layout == 'centre' or not len(bookings):
+        return np.zeros((scenario.num_taxis, 2), dtype=np.int64)
+    rng = np.random.RandomState(scenario.seed)
+    points = np.empty((scenario.num_taxis, 2), dtype=np.int64)
+    for column, name in enumerate(('src_x', 'src_y')):
+        points[:, column] = rng.randint(int(bookings[name].min()),
+                                        int(bookings[name].max()) + 1,
+                                        size=scenario.num_taxis)
+    return points
+
+
+def run_scenario(path, scenario):
+    """Replays the trace at path against a fleet, in a worker process.
+
+    Bookings made at the same time are booked as a batch, in trace order,
+    which gives the same results as booking each in turn.
+
+    Returns:
+        A Result of the replay.
+    """
+    start = time.perf_counter()
+    bookings, duration = read_trace(path)
+    simulation = GridSimulation(Point(0, 0), scenario.num_taxis,
+                                starting_points=starting_points(scenario,
+                                                                bookings))
+    booked = pickup_time = busy_time = 0
+    now = 0
+    times = bookings['time']
+    begin = 0
+    while begin < len(bookings):
+        booking_time = int(times[begin])
+        end = int(np.searchsorted(times, booking_time, side='right'))
+        # Bookings may be further apart than time can be advanced at once.
+        while booking_time - now > MAX_TICKS:
+            if not simulation.taxi_counts()['occupied']:
+                # Nothing changes while every taxi is free, so the rest of
+                # the gap is skipped, leaving the simulation's own time
+                # behind the trace's.
+                now = booking_time
+                break
+            simulation.increment_time(MAX_TICKS)
+            now += MAX_TICKS
+        if booking_time > now:
+            simulation.increment_time(booking_time - now)
+            now = booking_time
+        trips = [Trip.from_points(Point(src_x, src_y), Point(dst_x, dst_y))
+                 for _, src_x, src_y, dst_x, dst_y
+                 in bookings[begin:end].tolist()]
+        for trip, result in zip(trips, simulation.book_batch(trips)):
+            if result is not None:
+                booked += 1
+                pickup_time += result['total_time'] - trip.travel_duration()
+                busy_time += min(result['total_time'], duration - now)
+        begin = end
+    return Result(scenario, len(bookings), booked, pickup_time, busy_time,
+                  duration, time.perf_counter() - start)
+
+
+def sweep(path, scenarios, workers=None):
+    """Replays the trace at path against every scenario in parallel.
+
+    Args:
+        path: A path to a trace file written by write_trace().
+        scenarios: An iterable of Scenario instances.
+        workers: An integer number of worker processes, or None for as many
+            as there are processors.
+
+    Returns:
+        A list of the Result of each scenario, in order.
+
+    Raises:
+        Any exception raised replaying a scenario in its worker.
+    """
+    scenarios = list(scenarios)
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(run_scenario, [path] * len(scenarios),
+                                 scenarios))
+
+
+def rejection_rate(result):
+    """Returns the fraction of bookings no taxi was found for."""
+    if not result.bookings:
+        return 0.0
+    return 1 - result.booked / result.bookings
+
+
+def mean_pickup_time(result):
+    """Returns the mean time taken to pick up a booked customer."""
+    return result.pickup_time / result.booked if result.booked else 0.0
+
+
+def utilisation(result):
+    """Returns the fraction of the fleet's time spent booked."""
+    available_time = result.scenario.num_taxis * result.duration
+    return result.busy_time / available_time if available_time else 0.0
+
+
+def format_table(results):
+    """Returns a text table of the aggregated results of scenarios."""
+    lines = ['{:<8}{:>10}{:>10}{:>12}{:>14}{:>14}{:>10}'.format(
+        'layout', 'taxis', 'bookings', 'rejected %', 'mean pickup',
+        'utilisation %', 'seconds')]
+    for result in results:
+        lines.append('{:<8}{:>10}{:>10}{:>12.1f}{:>14.2f}{:>14.1f}{:>10.2f}'
+                     .format(result.scenario.layout,
+                             result.scenario.num_taxis, result.bookings,
+                             100 * rejection_rate(result),
+                             mean_pickup_time(result),
+                             100 * utilisation(result), result.seconds))
+    return '\n'.join(lines)
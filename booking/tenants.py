@@ -0,0 +1,386 @@
+"""Named simulations, each with its own fleet, created and destroyed at will.
+
+Every named simulation is independent of the others and of the default one in
+models.py, and is only guarded by its own lock, so operations on different
+simulations do not wait for each other. At most a fixed number of them, each
+of at most a fixed number of taxis, are kept in memory: creating or using one
+beyond that evicts the least recently used, which is written to a snapshot
+file and loaded back when next used if the registry has a directory to write
+them to, and dropped otherwise. Simulations are written and loaded without
+holding the registry's lock, so that only those using the simulation being
+moved wait for it.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import os
+import re
+import threading
+from .gridsimulation import GridSimulation
+from .queries import ViewPublisher
+from .trip import Trip
+
+
+# Names are used in URLs and file names, so are limited to Django's slugs.
+_NAME = re.compile(r'^[-a-zA-Z0-9_]{1,64}$')
+_SUFFIX = '.snapshot'
+
+
+class _Tenant:
+    """A named simulation and the lock guarding it.
+
+    Attributes:
+        simulation: The GridSimulation.
+        lock: A threading.Lock held by every caller of the simulation.
+        views: A ViewPublisher of the simulation, for read-only queries.
+        removed: True once the simulation is evicted or destroyed, after
+            which it must no longer be operated on.
+    """
+
+    __slots__ = ('simulation', 'lock', 'views', 'removed')
+
+    def __init__(self, simulation, view_max_age):
+        self.simulation = simulation
+        self.lock = threading.Lock()
+        self.views = ViewPublisher(simulation, self.lock, view_max_age)
+        self.removed = False
+
+
+class SimulationRegistry:
+    """Keeps named simulations, evicting the least recently used ones.
+
+    Attributes:
+        _capacity: An integer maximum number of simulations kept in memory.
+        _directory: A path to the directory evicted simulations are written
+            to, or None to drop them.
+        _view_max_age: A number of seconds views of a simulation are served
+            for.
+        _dispatch: A dispatch policy factory simulations are created and
+            loaded with, or None.
+        _waiting: A waiting queue factory simulations are created and loaded
+            with, or None.
+        _assignment: An assignment policy simulations are created and loaded
+            with, or None for GreedyAssignment.
+        _max_taxis: An integer maximum number of taxis of a simulation, or
+            None for no limit.
+        _tenants: An OrderedDict of the _Tenant of each simulation in memory
+            by name, from least to most recently used.
+        _moving: A dictionary mapping the name of each simulation being
+            written to or loaded from a snapshot file to a threading.Event
+            set once it has been.
+        _lock: A threading.Lock guarding _tenants, _moving and the snapshot
+            files.
+    """
+
+    def __init__(self, capacity, directory=None, view_max_age=1.0,
+                 dispatch=None, waiting=None, assignment=None,
+                 max_taxis=None):
+        """Initializes an empty registry.
+
+        Args:
+            capacity: A positive integer maximum number of simulations kept
+                in memory.
+            directory: A path to an existing directory evicted simulations
+                are written to, or None to drop them when evicted.
+            view_max_age: A non-negative number of seconds views of a
+                simulation are served for before new ones are taken.
+            dispatch: A dispatch policy factory for every simulation, as
+                GridSimulation takes, or None to only book free taxis.
+            waiting: A waiting queue factory for every simulation, as
+                GridSimulation takes, or None to turn away bookings no taxi
+                is found for.
+            assignment: An assignment policy for every simulation, as
+                GridSimulation takes, or None for GreedyAssignment.
+            max_taxis: A non-negative integer maximum number of taxis of
+                every simulation, including those added later, or None for
+                no limit.
+        """
+        self._capacity = capacity
+        self._directory = directory
+        self._view_max_age = view_max_age
+        self._dispatch = dispatch
+        self._waiting = waiting
+        self._assignment = assignment
+        self._max_taxis = max_taxis
+        self._tenants = OrderedDict()
+        self._moving = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        with self._lock:
+            return self._exists(name)
+
+    def names(self):
+        """Returns a sorted list of the names of every simulation."""
+        with self._lock:
+            names = set(self._tenants).union(self._moving)
+            if self._directory is not None:
+                names.update(
+                    file_name[:-len(_SUFFIX)]
+                    for file_name in os.listdir(self._directory)
+                    if file_name.endswith(_SUFFIX))
+        return sorted(names)
+
+    def create(self, name, starting_point, num_taxis, starting_points=None):
+        """Creates a named simulation, as GridSimulation would.
+
+        Args:
+            name: A string of up to 64 letters, digits, hyphens and
+                underscores naming the simulation.
+            starting_point: A Point instance of where all taxis start from.
+            num_taxis: A non-negative integer number of taxis to simulate.
+            starting_points: An array-like of shape (num_taxis, 2) of where
+                each taxi starts from, or None for all to start from
+                starting_point.
+
+        Returns:
+            True if the simulation was created, or False if there already is
+            one with the name.
+
+        Raises:
+            ValueError: If the name or fleet is invalid, or the fleet has more
+                taxis than the registry's maximum.
+        """
+        if not _NAME.match(name):
+            raise ValueError('Invalid simulation name {!r}'.format(name))
+        if num_taxis < 0:
+            raise ValueError('Expected a non-negative number of taxis')
+        self.check_fleet_size(num_taxis)
+        if name in self:
+            return False
+        # Built without holding the registry's lock, as large fleets take a
+        # while to index.
+        simulation = GridSimulation(starting_point, num_taxis,
+                                    starting_points=starting_points,
+                                    dispatch=self._dispatch,
+                                    waiting=self._waiting,
+                                    assignment=self._assignment)
+        with self._lock:
+            if self._exists(name):
+                return False
+            evicted = self._add(name, _Tenant(simulation, self._view_max_age))
+        self._evict(evicted)
+        return True
+
+    def check_fleet_size(self, num_taxis):
+        """Checks that a simulation may have num_taxis taxis.
+
+        Raises:
+            ValueError: If num_taxis is more than the registry's maximum.
+        """
+        if self._max_taxis is not None and num_taxis > self._max_taxis:
+            raise ValueError('Expected at most {} taxis'.format(
+                self._max_taxis))
+
+    def destroy(self, name):
+        """Destroys a named simulation, wherever it is kept.
+
+        Raises:
+            KeyError: If there is no simulation with the name.
+        """
+        while True:
+            with self._lock:
+                moving = self._moving.get(name)
+                if moving is None:
+                    tenant = self._tenants.pop(name, None)
+                    if tenant is None and not self._is_spilled(name):
+                        raise KeyError(name)
+                    if tenant is None:
+                        os.remove(self._path(name))
+                    break
+            moving.wait()
+        if tenant is not None:
+            with tenant.lock:
+                tenant.removed = True
+            tenant.views.stop()
+
+    def world(self, name):
+        """Returns a World to operate on a named simulation.
+
+        Raises:
+            KeyError: If there is no simulation with the name.
+        """
+        if name not in self:
+            raise KeyError(name)
+        return World(self, name)
+
+    @contextmanager
+    def locked(self, name):
+        """Holds the lock of a named simulation while it is operated on.
+
+        The simulation is loaded back into memory if it was evicted, and
+        becomes the most recently used.
+
+        Yields:
+            The GridSimulation, for as long as the context is entered.
+
+        Raises:
+            KeyError: If there is no simulation with the name.
+        """
+        with self._locked_tenant(name) as tenant:
+            yield tenant.simulation
+
+    @contextmanager
+    def operating(self, name):
+        """Holds the lock of a named simulation while it is changed.
+
+        As locked(), and publishes the change to views of the simulation
+        once the lock is released.
+
+        Yields:
+            The GridSimulation, for as long as the context is entered.
+
+        Raises:
+            KeyError: If there is no simulation with the name.
+        """
+        with self._locked_tenant(name) as tenant:
+            yield tenant.simulation
+        tenant.views.changed()
+
+    @contextmanager
+    def _locked_tenant(self, name):
+        while True:
+            tenant = self._use(name)
+            with tenant.lock:
+                # Retried if evicted between being looked up and locked.
+                if not tenant.removed:
+                    yield tenant
+                    return
+
+    def view(self, name):
+        """Returns a recent FleetView of a named simulation.
+
+        Raises:
+            KeyError: If there is no simulation with the name.
+        """
+        return self._use(name).views.view()
+
+    def _use(self, name):
+        while True:
+            with self._lock:
+                tenant = self._tenants.get(name)
+                if tenant is not None:
+                    self._tenants.move_to_end(name)
+                    return tenant
+                moving = self._moving.get(name)
+                if moving is None:
+                    if not self._is_spilled(name):
+                        raise KeyError(name)
+                    moving = self._moving[name] = threading.Event()
+                    break
+            # Waits for the simulation to be written or loaded, then retries.
+            moving.wait()
+
+        path = self._path(name)
+        tenant = evicted = None
+        try:
+            tenant = _Tenant(GridSimulation.load(
+                path, dispatch=self._dispatch, waiting=self._waiting,
+                assignment=self._assignment), self._view_max_age)
+        finally:
+            with self._lock:
+                del self._moving[name]
+                if tenant is not None:
+                    # The loaded columns stay mapped after the file is
+                    # removed.
+                    os.remove(path)
+                    evicted = self._add(name, tenant)
+            moving.set()
+        self._evict(evicted)
+        return tenant
+
+    def _add(self, name, tenant):
+        """Adds a tenant, holding _lock, returning those to be _evict()ed.
+        """
+        self._tenants[name] = tenant
+        evicted = []
+        while len(self._tenants) > self._capacity:
+            evicted_name, evicted_tenant = self._tenants.popitem(last=False)
+            self._moving[evicted_name] = threading.Event()
+            evicted.append((evicted_name, evicted_tenant))
+        return evicted
+
+    def _evict(self, evicted):
+        """Writes out tenants returned by _add(), not holding _lock."""
+        for name, tenant in evicted:
+            try:
+                with tenant.lock:
+                    tenant.removed = True
+                    if self._directory is not None:
+                        tenant.simulation.save(self._path(name))
+                tenant.views.stop()
+            finally:
+                with self._lock:
+                    moving = self._moving.pop(name)
+                moving.set()
+
+    def _exists(self, name):
+        return (name in self._tenants or name in self._moving
+                or self._is_spilled(name))
+
+    def _is_spilled(self, name):
+        return (self._directory is not None and _NAME.match(name) is not None
+                and os.path.exists(self._path(name)))
+
+    def _path(self, name):
+        return os.path.join(self._directory, name + _SUFFIX)
+
+
+class World:
+    """Operates on a named simulation, as models.py does on the default one.
+
+    Raises KeyError from every operation if the simulation has since been
+    destroyed.
+
+    Attributes:
+        _registry: The SimulationRegistry keeping the simulation.
+        name: A string name of the simulation.
+    """
+
+    def __init__(self, registry, name):
+        self._registry = registry
+        self.name = name
+
+    def make(self, booking, at_time=None):
+        return self.book(Trip(booking), at_time)
+
+    def book(self, trip, at_time=None):
+        with self._registry.operating(self.name) as simulation:
+            return simulation.book(trip, at_time)
+
+    def make_batch(self, bookings, at_time=None):
+        return self.book_batch([Trip(booking) for booking in bookings],
+                               at_time)
+
+    def book_batch(self, trips, at_time=None):
+        with self._registry.operating(self.name) as simulation:
+            return simulation.book_batch(trips, at_time)
+
+    def increment_time(self, ticks=1):
+        with self._registry.operating(self.name) as simulation:
+            simulation.increment_time(ticks)
+
+    def reset(self):
+        with self._registry.operating(self.name) as simulation:
+            simulation.reset()
+
+    def add_taxis(self, starting_points):
+        with self._registry.operating(self.name) as simulation:
+            self._registry.check_fleet_size(simulation._NUM_TAXIS
+                                            + len(starting_points))
+            return simulation.add_taxis(starting_points)
+
+    def retire_taxi(self, taxi_id):
+        with self._registry.operating(self.name) as simulation:
+            simulation.retire_taxi(taxi_id)
+
+    def scheduled_booking(self, booking_id):
+        with self._registry.locked(self.name) as simulation:
+            return simulation.scheduled_booking(booking_id)
+
+    def ticket(self, ticket_id):
+        with self._registry.locked(self.name) as simulation:
+            return simulation.ticket(ticket_id)
+
+    def view(self):
+        return self._registry.view(self.name)
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import unittest
+from taxi_booking.booking.asgi import BookingApplication
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.tenants import SimulationRegistry
+
+
+class TestBookingApplication(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.simulation = GridSimulation(Point(0, 0), 3)
+        self.application = BookingApplication(self.simulation)
+
+    def tearDown(self):
+        self.assertEqual(['lifespan.shutdown.complete'],
+                         self.loop.run_until_complete(
+                             self.lifespan('lifespan.shutdown')))
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    async def request(self, path, method='POST', data=None,
+                      content_type='application/json', query=b''):
+        body = json.dumps(data).encode() if data is not None else b''
+        scope = {'type': 'http', 'method': method, 'path': path,
+                 'query_string': query,
+                 'headers': [(b'content-type', content_type.encode())]}
+        messages = [{'type': 'http.request', 'body': body[:5],
+                     'more_body': True},
+                    {'type': 'http.request', 'body': body[5:]}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await self.application(scope, receive, send)
+        return sent[0]['status'], sent[1]['body']
+
+    async def lifespan(self, *message_types):
+        messages = [{'type': message_type} for message_type in message_types]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        await self.application({'type': 'lifespan'}, receive, send)
+        return sent
+
+    def run_requests(self, *requests):
+        tasks = [asyncio.ensure_future(request, loop=self.loop)
+                 for request in requests]
+        return self.loop.run_until_complete(asyncio.gather(*tasks))
+
+    def booking(self, src, dst):
+        return {'source': {'x': src[0], 'y': src[1]},
+                'destination': {'x': dst[0], 'y': dst[1]}}
+
+    def test_lifespan_starts_simulation_actor(self):
+        self.assertEqual(
+            ['lifespan.startup.complete'],
+            self.loop.run_until_complete(self.lifespan('lifespan.startup',
+                                                       'lifespan.shutdown'))[:1])
+        (status, body), = self.run_requests(self.request('/api/reset/'))
+        self.assertEqual(204, status)
+
+    def test_book(self):
+        (status, body), = self.run_requests(
+            self.request('/api/book/', data=self.booking((1, 2), (3, 4))))
+        self.assertEqual(200, status)
+        self.assertEqual({'car_id': 1, 'total_time': 7}, json.loads(body))
+
+    def test_book_invalid_requests(self):
+        responses = self.run_requests(
+            self.request('/api/book/', data=self.booking((1, 2), (1, 2))),
+            self.request('/api/book/', method='GET'),
+            self.request('/api/book/', data={}, content_type='text/html'),
+            self.request('/api/book/', data={'source': {}}),
+            self.request('/api/unknown/'))
+        self.assertEqual([204, 405, 415, 400, 404],
+                         [status for status, body in responses])
+        self.assertEqual(b'Expected Content-Type: application/json\n'
+                         b'Received Content-Type: text/html', responses[2][1])
+
+    def test_book_batch(self):
+        (status, body), = self.run_requests(self.request(
+            '/api/book/batch/',
+            data=[self.booking((1, 2), (3, 4)), self.booking((1, 2), (1, 2))]))
+        self.assertEqual(200, status)
+        self.assertEqual([{'car_id': 1, 'total_time': 7}, None],
+                         json.loads(body))
+
+    def test_book_ahead(self):
+        responses = self.run_requests(
+            self.request('/api/book/', data=self.booking((1, 2), (3, 4)),
+                         query=b'at=4'),
+            self.request('/api/book/batch/',
+                         data=[self.booking((1, 2), (3, 4))], query=b'at=4'),
+            self.request('/api/book/', data=self.booking((1, 2), (3, 4)),
+                         query=b'at=soon'),
+            self.request('/api/book/', data=self.booking((1, 2), (3, 4)),
+                         query=str(10 ** 20).join(('at=', '')).encode()),
+            self.request('/api/book/batch/',
+                         data=[self.booking((1, 2), (3, 4))],
+                         query=b'at=1099511627776'))
+        self.assertEqual([202, 202, 400, 400, 400],
+                         [status for status, body in responses])
+        self.assertEqual({'booking_id': 1, 'time': 4},
+                         json.loads(responses[0][1]))
+        self.assertEqual([{'booking_id': 2, 'time': 4}],
+                         json.loads(responses[1][1]))
+        self.simulation.increment_time(5)
+        (status, body), = self.run_requests(self.request(
+            '/api/book/', data=self.booking((1, 2), (3, 4)), query=b'at=4'))
+        self.assertEqual(400, status)
+        self.assertEqual('booked', self.simulation.scheduled_booking(2)['status'])
+
+    def test_tick_and_reset(self):
+        responses = self.run_requests(
+            self.request('/api/tick/', query=b'n=5'),
+            self.request('/api/tick/', query=b'n=0'),
+            self.request('/api/tick/', query=str(2 ** 63).join(
+                ('n=', '')).encode()),
+            self.request('/api/reset/'))
+        self.assertEqual([204, 400, 400, 204],
+                         [status for status, body in responses])
+
+    def test_concurrent_requests_are_applied_in_order(self):
+        trip = self.booking((0, 1), (0, 2))
+        responses = self.run_requests(
+            *[self.request('/api/book/', data=trip) for booking in range(3)],
+            self.request('/api/book/', data=trip),
+            self.request('/api/tick/', query=b'n=2'),
+            self.request('/api/book/', data=trip))
+        self.assertEqual([{'car_id': 1, 'total_time': 2},
+                          {'car_id': 2, 'total_time': 2},
+                          {'car_id': 3, 'total_time': 2}],
+                         [json.loads(body) for status, body in responses[:3]])
+        self.assertEqual([204, 204, 200],
+                         [status for status, body in responses[3:]])
+        self.assertEqual({'car_id': 1, 'total_time': 2},
+                         json.loads(responses[5][1]))
+
+
+class TestBookingApplicationWorld(TestBookingApplication):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.registry = SimulationRegistry(1)
+        self.registry.create('a', Point(0, 0), 3)
+        self.simulation = self.registry.world('a')
+        self.application = BookingApplication(self.simulation)
+
+    def test_calls_hold_world_lock(self):
+        with self.registry.locked('a') as simulation:
+            task = asyncio.ensure_future(
+                self.request('/api/book/', data=self.booking((1, 2), (3, 4))),
+                loop=self.loop)
+            # The event loop keeps running while the call waits for the lock.
+            self.loop.run_until_complete(asyncio.sleep(0.05))
+            self.assertFalse(task.done())
+            self.assertEqual({'free': 3, 'occupied': 0},
+                             simulation.taxi_counts())
+        status, body = self.loop.run_until_complete(task)
+        self.assertEqual(200, status)
+        self.assertEqual({'car_id': 1, 'total_time': 7}, json.loads(body))
+
+
+if __name__ == '__main__':
+    unittest.main()
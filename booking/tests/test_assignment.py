@@ -0,0 +1,109 @@
+from itertools import permutations
+import random
+import unittest
+import numpy as np
+from taxi_booking.booking.assignment import (GreedyAssignment,
+                                             OptimalAssignment,
+                                             make_assignment,
+                                             min_cost_assignment)
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.trip import Trip
+
+
+def make_trip(src_x, src_y, dst_x, dst_y):
+    return Trip({'source': {'x': src_x, 'y': src_y},
+                 'destination': {'x': dst_x, 'y': dst_y}})
+
+
+class TestMinCostAssignment(unittest.TestCase):
+
+    def test_min_cost_assignment_matches_brute_force(self):
+        rng = random.Random(7)
+        for num_rows, num_cols in ((1, 1), (2, 3), (3, 3), (4, 6), (5, 5)):
+            for i in range(20):
+                cost = np.array([[rng.randint(0, 20) for col in range(num_cols)]
+                                 for row in range(num_rows)], dtype=np.int64)
+                assignment = min_cost_assignment(cost)
+                self.assertEqual(num_rows, len(set(assignment)))
+                best = min(sum(cost[row, col] for row, col in enumerate(cols))
+                           for cols in permutations(range(num_cols), num_rows))
+                self.assertEqual(best, cost[np.arange(num_rows), assignment].sum())
+
+
+class TestOptimalAssignment(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = GridSimulation(Point(0, 0), 2,
+                                         assignment=OptimalAssignment())
+        # Move taxi 1 to (0, 10), leaving taxi 2 at (0, 0).
+        self.simulation.book(make_trip(0, 0, 0, 10))
+        self.simulation.increment_time(10)
+
+    def test_book_batch_minimises_total_pickup_time(self):
+        trips = [make_trip(0, 6, 0, 7), make_trip(0, 11, 0, 12)]
+        greedy_simulation = GridSimulation(Point(0, 0), 2)
+        greedy_simulation.book(make_trip(0, 0, 0, 10))
+        greedy_simulation.increment_time(10)
+
+        self.assertEqual([{'car_id': 1, 'total_time': 5},
+                          {'car_id': 2, 'total_time': 12}],
+                         greedy_simulation.book_batch(trips))
+        self.assertEqual([{'car_id': 2, 'total_time': 7},
+                          {'car_id': 1, 'total_time': 2}],
+                         self.simulation.book_batch(trips))
+
+    def test_bookings_made_ahead_for_a_tick_are_matched_together(self):
+        trips = [make_trip(0, 6, 0, 7), make_trip(0, 11, 0, 12)]
+        for trip in trips:
+            self.simulation.book(trip, at_time=11)
+        self.simulation.increment_time()
+        self.assertEqual([(2, 7), (1, 2)], [
+            (state['car_id'], state['total_time'])
+            for state in map(self.simulation.scheduled_booking, (1, 2))])
+
+    def test_book_batch_for_invalid_trips_and_no_free_taxis(self):
+        trips = [make_trip(3, 3, 3, 3), make_trip(0, 11, 0, 12),
+                 make_trip(0, 1, 0, 2), make_trip(0, 11, 0, 12)]
+        self.assertEqual([None, {'car_id': 1, 'total_time': 2},
+                          {'car_id': 2, 'total_time': 2}, None],
+                         self.simulation.book_batch(trips))
+        self.assertEqual([None], self.simulation.book_batch(trips[1:2]))
+
+    def test_book_batch_with_bounded_candidates(self):
+        rng = random.Random(3)
+        start = Point(0, 0)
+        exact = GridSimulation(start, 50, assignment=OptimalAssignment())
+        bounded = GridSimulation(start, 50,
+                                 assignment=OptimalAssignment(max_candidates=3))
+        greedy = GridSimulation(start, 50, assignment=GreedyAssignment())
+        for simulation in (exact, bounded, greedy):
+            simulation.book_batch([make_trip(0, 0, 20 * i, -5 * i)
+                                   for i in range(1, 51)])
+            simulation.increment_time(1000)
+
+        trips = [make_trip(rng.randint(0, 1000), rng.randint(-250, 0), 0, 0)
+                 for i in range(40)]
+        totals = []
+        for simulation in (exact, bounded, greedy):
+            results = simulation.book_batch(trips)
+            self.assertTrue(all(results))
+            self.assertEqual(40, len({result['car_id'] for result in results}))
+            totals.append(sum(result['total_time'] for result in results))
+        self.assertLessEqual(totals[0], totals[1])
+        self.assertLessEqual(totals[1], totals[2])
+
+
+class TestMakeAssignment(unittest.TestCase):
+
+    def test_make_assignment(self):
+        self.assertIsInstance(make_assignment('greedy'), GreedyAssignment)
+        optimal = make_assignment('optimal', max_candidates=4)
+        self.assertIsInstance(optimal, OptimalAssignment)
+        self.assertEqual(4, optimal.max_candidates)
+        with self.assertRaises(ValueError):
+            make_assignment('random')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,13 @@
 from django.test import SimpleTestCase
 import json
+from taxi_booking.booking.gridsimulation import MAX_TICKS
 
 
 class TestBookingApp(SimpleTestCase):
 
     def setUp(self):
         self.book_url = '/api/book/'
+        self.book_batch_url = '/api/book/batch/'
         self.tick_url = '/api/tick/'
         self.reset_url = '/api/reset/'
         self.client.post(self.reset_url)
@@ -71,6 +73,21 @@ class TestBookingApp(SimpleTestCase):
         self.assertEqual(self.encoding, response.charset)
         self.assertEqual("", response.content.decode(response.charset))
 
+    def test_booking_app_for_book_invalid_booking_data(self):
+        for booking in ({'source': {'x': 1.5, 'y': 2},
+                         'destination': {'x': 3, 'y': 4}},
+                        {'source': {'x': 2 ** 31, 'y': 2},
+                         'destination': {'x': 3, 'y': 4}},
+                        {'source': {'x': 1},
+                         'destination': {'x': 3, 'y': 4}},
+                        [self.raw_json_data]):
+            response = self.client.post(self.book_url,
+                                        data=json.dumps(booking),
+                                        content_type=self.json_content_type)
+            self.assertEqual(400, response.status_code)
+            self.assertEqual("Error reading booking data",
+                             response.content.decode(response.charset))
+
     def test_booking_app_for_book_no_free_taxis(self):
         # Book first taxi
         response = self.client.post(self.book_url,
@@ -141,11 +158,112 @@ class TestBookingApp(SimpleTestCase):
                                              encoding=response.charset)
         self.assertEqual(expected_response_content, actual_response_content)
 
+    # /api/book/batch/
+    def test_booking_app_for_valid_book_batch_http_post_request(self):
+        invalid_json_data = {'source': {'x': 1, 'y': 2},
+                             'destination': {'x': 1, 'y': 2}}
+        json_data = json.dumps([self.raw_json_data, invalid_json_data,
+                                self.raw_json_data, self.raw_json_data,
+                                self.raw_json_data])
+        response = self.client.post(self.book_batch_url,
+                                    data=json_data,
+                                    content_type=self.json_content_type)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(self.json_content_type,
+                         response.__getitem__("content-type"))
+
+        expected_response_content = [{'car_id': 1, 'total_time': 7}, None,
+                                     {'car_id': 2, 'total_time': 7},
+                                     {'car_id': 3, 'total_time': 7}, None]
+        actual_response_content = json.loads(response.content,
+                                             encoding=response.charset)
+        self.assertEqual(expected_response_content, actual_response_content)
+
+    def test_booking_app_for_invalid_book_batch_http_get_request_method(self):
+        response = self.client.get(self.book_batch_url)
+        self.assertEqual(405, response.status_code)
+
+    def test_booking_app_for_book_batch_invalid_html_content_type(self):
+        response = self.client.post(self.book_batch_url,
+                                    data=json.dumps([self.raw_json_data]),
+                                    content_type=self.html_content_type)
+        self.assertEqual(415, response.status_code)
+
+    def test_booking_app_for_book_batch_invalid_json_data(self):
+        response = self.client.post(self.book_batch_url,
+                                    data=self.raw_json_data,
+                                    content_type=self.json_content_type)
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("Error decoding JSON data",
+                         response.content.decode(response.charset))
+
+    def test_booking_app_for_book_batch_not_an_array(self):
+        response = self.client.post(self.book_batch_url,
+                                    data=self.json_data,
+                                    content_type=self.json_content_type)
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("Expected a JSON array of bookings",
+                         response.content.decode(response.charset))
+
+    def test_booking_app_for_book_batch_invalid_booking_is_not_applied(self):
+        json_data = json.dumps([self.raw_json_data, {'source': {'x': 1}}])
+        response = self.client.post(self.book_batch_url,
+                                    data=json_data,
+                                    content_type=self.json_content_type)
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("Error reading booking data",
+                         response.content.decode(response.charset))
+
+        response = self.client.post(self.book_url,
+                                    data=self.json_data,
+                                    content_type=self.json_content_type)
+        expected_response_content = {'car_id': 1, 'total_time': 7}
+        actual_response_content = json.loads(response.content,
+                                             encoding=response.charset)
+        self.assertEqual(expected_response_content, actual_response_content)
+
     # /api/tick/
     def test_booking_app_for_valid_tick_http_post_request(self):
         response = self.client.post(self.tick_url)
         self.assertEqual(204, response.status_code)
 
+    def test_booking_app_for_valid_multi_tick_http_post_request(self):
+        raw_json_data = {'source': {'x': 0, 'y': 0},
+                         'destination': {'x': 0, 'y': 5}}
+        self.client.post(self.book_url, data=json.dumps(raw_json_data),
+                         content_type=self.json_content_type)
+        self.client.post(self.book_url, data=json.dumps(raw_json_data),
+                         content_type=self.json_content_type)
+        self.client.post(self.book_url, data=json.dumps(raw_json_data),
+                         content_type=self.json_content_type)
+
+        response = self.client.post(self.tick_url + '?n=5')
+        self.assertEqual(204, response.status_code)
+
+        response = self.client.post(self.book_url,
+                                    data=self.json_data,
+                                    content_type=self.json_content_type)
+        self.assertEqual(200, response.status_code)
+        expected_response_content = {'car_id': 1, 'total_time': 8}
+        actual_response_content = json.loads(response.content,
+                                             encoding=response.charset)
+        self.assertEqual(expected_response_content, actual_response_content)
+
+    def test_booking_app_for_invalid_tick_count(self):
+        for n in ('0', '-3', 'abc', ''):
+            response = self.client.post(self.tick_url + '?n=' + n)
+            self.assertEqual(400, response.status_code)
+            self.assertEqual("Expected n to be a positive integer",
+                             response.content.decode(response.charset))
+
+    def test_booking_app_for_too_many_ticks(self):
+        for n in (str(MAX_TICKS + 1), str(2 ** 63)):
+            response = self.client.post(self.tick_url + '?n=' + n)
+            self.assertEqual(400, response.status_code)
+        response = self.client.post(self.book_url, data=self.json_data,
+                                    content_type=self.json_content_type)
+        self.assertEqual(200, response.status_code)
+
     def test_booking_app_for_invalid_tick_http_put_request(self):
         response = self.client.put(self.tick_url)
         self.assertEqual(405, response.status_code)
@@ -166,3 +284,190 @@ class TestBookingApp(SimpleTestCase):
     def test_booking_app_for_invalid_reset_http_put_request_method(self):
         response = self.client.put(self.reset_url)
         self.assertEqual(405, response.status_code)
+
+    # /api/taxis/
+    def test_booking_app_for_add_and_retire_taxis(self):
+        response = self.client.post('/api/taxis/',
+                                    data=json.dumps([{'x': 1, 'y': 2}]),
+                                    content_type=self.json_content_type)
+        self.assertEqual(200, response.status_code)
+        car_ids = json.loads(response.content.decode(response.charset))['car_ids']
+        self.assertEqual(1, len(car_ids))
+
+        retire_url = '/api/taxis/{}/'.format(car_ids[0])
+        self.assertEqual(204, self.client.delete(retire_url).status_code)
+        self.assertEqual(404, self.client.delete(retire_url).status_code)
+
+    def test_booking_app_for_add_taxis_invalid_locations(self):
+        for locations in ({'x': 1, 'y': 2}, [{'x': 1}], [{'x': 1.5, 'y': 2}],
+                          [{'x': 2 ** 31, 'y': 0}]):
+            response = self.client.post('/api/taxis/',
+                                        data=json.dumps(locations),
+                                        content_type=self.json_content_type)
+            self.assertEqual(400, response.status_code)
+
+    def test_booking_app_for_retire_occupied_taxi(self):
+        self.client.post(self.book_url, data=self.json_data,
+                         content_type=self.json_content_type)
+        self.assertEqual(409, self.client.delete('/api/taxis/1/').status_code)
+        self.assertEqual(405, self.client.post('/api/taxis/1/').status_code)
+
+    # /api/sim/
+    def test_booking_app_for_named_simulation(self):
+        fleet = {'starting_points': [{'x': 1, 'y': 2}, {'x': 9, 'y': 9}]}
+        response = self.client.post('/api/sim/app-test/',
+                                    data=json.dumps(fleet),
+                                    content_type=self.json_content_type)
+        self.assertEqual(201, response.status_code)
+        try:
+            response = self.client.post('/api/sim/app-test/',
+                                        data=json.dumps(fleet),
+                                        content_type=self.json_content_type)
+            self.assertEqual(409, response.status_code)
+            response = self.client.get('/api/sim/')
+            self.assertIn('app-test', json.loads(
+                response.content.decode(response.charset))['simulations'])
+
+            response = self.client.post('/api/sim/app-test/book/',
+                                        data=self.json_data,
+                                        content_type=self.json_content_type)
+            self.assertEqual({'car_id': 1, 'total_time': 4}, json.loads(
+                response.content.decode(response.charset)))
+            self.assertEqual(204, self.client.post(
+                '/api/sim/app-test/tick/').status_code)
+            response = self.client.post(self.book_url, data=self.json_data,
+                                        content_type=self.json_content_type)
+            self.assertEqual({'car_id': 1, 'total_time': 7}, json.loads(
+                response.content.decode(response.charset)))
+        finally:
+            self.assertEqual(204, self.client.delete(
+                '/api/sim/app-test/').status_code)
+        self.assertEqual(404, self.client.delete(
+            '/api/sim/app-test/').status_code)
+        self.assertEqual(404, self.client.post(
+            '/api/sim/app-test/reset/').status_code)
+
+    def test_booking_app_for_named_simulation_invalid_fleet(self):
+        for fleet in ([], {'taxis': 'many'}, {'taxis': -1},
+                      {'starting_point': {'x': 1}},
+                      {'taxis': 3, 'starting_points': [{'x': 1, 'y': 2}]},
+                      {'taxis': 10000000000}):
+            response = self.client.post('/api/sim/app-test/',
+                                        data=json.dumps(fleet),
+                                        content_type=self.json_content_type)
+            self.assertEqual(400, response.status_code)
+        self.assertEqual(404, self.client.delete(
+            '/api/sim/app-test/').status_code)
+
+    # /api/book/?at= and /api/bookings/<id>/
+    def test_booking_app_for_book_ahead(self):
+        fleet = {'starting_points': [{'x': 1, 'y': 2}]}
+        self.client.post('/api/sim/app-test/', data=json.dumps(fleet),
+                         content_type=self.json_content_type)
+        try:
+            response = self.client.post('/api/sim/app-test/book/?at=3',
+                                        data=self.json_data,
+                                        content_type=self.json_content_type)
+            self.assertEqual(202, response.status_code)
+            self.assertEqual({'booking_id': 1, 'time': 3}, json.loads(
+                response.content.decode(response.charset)))
+            response = self.client.post('/api/sim/app-test/book/batch/?at=3',
+                                        data=json.dumps([self.raw_json_data]),
+                                        content_type=self.json_content_type)
+            self.assertEqual(202, response.status_code)
+            self.assertEqual([{'booking_id': 2, 'time': 3}], json.loads(
+                response.content.decode(response.charset)))
+
+            self.client.post('/api/sim/app-test/tick/?n=3')
+            response = self.client.get('/api/sim/app-test/bookings/1/')
+            self.assertEqual({'booking_id': 1, 'time': 3, 'status': 'booked',
+                              'car_id': 1, 'total_time': 4}, json.loads(
+                                  response.content.decode(response.charset)))
+            response = self.client.get('/api/sim/app-test/bookings/2/')
+            self.assertEqual('unbooked', json.loads(
+                response.content.decode(response.charset))['status'])
+            self.assertEqual(404, self.client.get(
+                '/api/sim/app-test/bookings/3/').status_code)
+            self.assertEqual(400, self.client.post(
+                '/api/sim/app-test/book/?at=2', data=self.json_data,
+                content_type=self.json_content_type).status_code)
+        finally:
+            self.client.delete('/api/sim/app-test/')
+
+    def test_booking_app_for_ticket_without_waiting_queue(self):
+        self.assertEqual(404, self.client.get('/api/tickets/1/').status_code)
+        self.assertEqual(405, self.client.post('/api/tickets/1/').status_code)
+
+    def test_booking_app_for_book_ahead_invalid_time(self):
+        for url in (self.book_url, self.book_batch_url):
+            response = self.client.post(url + '?at=soon', data=self.json_data,
+                                        content_type=self.json_content_type)
+            self.assertEqual(400, response.status_code)
+        for url in (self.book_url, self.book_batch_url):
+            response = self.client.post(
+                url + '?at=3', data=bytes(16),
+                content_type='application/x-taxi-trips')
+            self.assertEqual(400, response.status_code)
+            self.assertIn(b'JSON', response.content)
+
+    def test_booking_app_for_book_ahead_out_of_range(self):
+        for at_time in (10 ** 20, -10 ** 20, 2 ** 40):
+            for url in (self.book_url, self.book_batch_url):
+                data = (self.json_data if url == self.book_url
+                        else '[{}]'.format(self.json_data))
+                response = self.client.post(
+                    '{}?at={}'.format(url, at_time), data=data,
+                    content_type=self.json_content_type)
+                self.assertEqual(400, response.status_code)
+        response = self.client.get('/api/bookings/1/')
+        self.assertEqual(404, response.status_code)
+
+    # /api/taxis/nearest/, /api/eta/ and /api/utilisation/
+    def test_booking_app_for_queries(self):
+        fleet = {'starting_points': [{'x': 1, 'y': 2}, {'x': 9, 'y': 9}]}
+        self.client.post('/api/sim/app-test/', data=json.dumps(fleet),
+                         content_type=self.json_content_type)
+        try:
+            self.client.post('/api/sim/app-test/book/', data=self.json_data,
+                             content_type=self.json_content_type)
+            response = self.client.get('/api/sim/app-test/taxis/nearest/',
+                                       {'x': 0, 'y': 0, 'k': 5})
+            self.assertEqual({'time': 0, 'taxis': [
+                {'car_id': 2, 'location': {'x': 9, 'y': 9},
+                 'distance': 18}]},
+                json.loads(response.content.decode(response.charset)))
+            response = self.client.get('/api/sim/app-test/eta/',
+                                       {'x': 3, 'y': 4})
+            self.assertEqual({'time': 0, 'car_id': 1, 'eta': 4},
+                             json.loads(response.content.decode(
+                                 response.charset)))
+            response = self.client.get('/api/sim/app-test/utilisation/')
+            self.assertEqual({'time': 0, 'free': 1, 'occupied': 1,
+                              'utilisation': 0.5},
+                             json.loads(response.content.decode(
+                                 response.charset)))
+        finally:
+            self.client.delete('/api/sim/app-test/')
+
+    def test_booking_app_for_invalid_queries(self):
+        for query in ({}, {'x': 1}, {'x': 'a', 'y': 1}, {'x': 2 ** 31, 'y': 0},
+                      {'x': 1, 'y': 1, 'k': 0}, {'x': 1, 'y': 1, 'k': 1001},
+                      {'x': 1, 'y': 1, 'radius': -1}):
+            response = self.client.get('/api/taxis/nearest/', query)
+            self.assertEqual(400, response.status_code)
+        self.assertEqual(400, self.client.get('/api/eta/').status_code)
+        self.assertEqual(405, self.client.post(
+            '/api/utilisation/').status_code)
+        self.assertEqual(404, self.client.get(
+            '/api/sim/app-test/utilisation/').status_code)
+
+    # /metrics/
+    def test_booking_app_for_disabled_metrics(self):
+        response = self.client.get('/metrics/')
+        self.assertEqual(404, response.status_code)
+        self.assertEqual("Metrics are disabled",
+                         response.content.decode(response.charset))
+
+    def test_booking_app_for_invalid_metrics_http_post_request_method(self):
+        response = self.client.post('/metrics/')
+        self.assertEqual(405, response.status_code)
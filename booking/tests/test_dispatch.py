@@ -0,0 +1,194 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from taxi_booking.booking.dispatch import PredictiveDispatch
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.point import Point, manhattan_dist
+from taxi_booking.booking.queries import FleetView
+from taxi_booking.booking.spatialindex import LinearScanIndex, QuadTreeIndex
+from taxi_booking.booking.tickkernels import (ArrivalQueueKernel,
+                                              VectorisedStepKernel)
+from taxi_booking.booking.trip import Trip
+
+
+def trip(src_x, src_y, dst_x, dst_y):
+    return Trip.from_points(Point(src_x, src_y), Point(dst_x, dst_y))
+
+
+class ReferenceDispatch:
+    """Dispatches predictively by comparing every taxi with every booking.
+
+    Each taxi is only tracked by when and where it drops its last customer
+    off, and until when it is busy with the customer before a booking chained
+    onto it.
+    """
+
+    def __init__(self, starting_points):
+        self.time = 0
+        self.free_at = [0] * len(starting_points)
+        self.location = [Point(x, y) for x, y in starting_points]
+        self.handover_at = [0] * len(starting_points)
+
+    def book(self, trip):
+        if trip.travel_duration() == 0:
+            return None
+        candidates = []
+        for row, (free_at, location) in enumerate(
+                zip(self.free_at, self.location)):
+            wait = max(free_at - self.time, 0)
+            if self.handover_at[row] <= self.time:
+                candidates.append(
+                    (wait + manhattan_dist(location, trip.src), row + 1))
+        if not candidates:
+            return None
+        pickup_duration, taxi_id = min(candidates)
+        row = taxi_id - 1
+        if self.free_at[row] > self.time:
+            self.handover_at[row] = self.free_at[row]
+        self.free_at[row] = (self.time + pickup_duration
+                             + trip.travel_duration())
+        self.location[row] = trip.dst
+        return {'car_id': taxi_id,
+                'total_time': pickup_duration + trip.travel_duration()}
+
+    def increment_time(self, ticks):
+        self.time += ticks
+
+    def free_taxis(self):
+        return {row + 1: location for row, (free_at, location)
+                in enumerate(zip(self.free_at, self.location))
+                if free_at <= self.time}
+
+
+class TestPredictiveDispatch(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = GridSimulation(
+            Point(0, 0), 2, starting_points=[(0, 0), (20, 0)],
+            dispatch=PredictiveDispatch)
+
+    def test_booking_is_chained_onto_taxi_arriving_sooner(self):
+        self.assertEqual({'car_id': 1, 'total_time': 10},
+                         self.simulation.book(trip(0, 0, 10, 0)))
+        self.simulation.increment_time(5)
+        # Taxi 2 is 9 away; taxi 1 has 5 left and is then 1 away.
+        self.assertEqual({'car_id': 1, 'total_time': 7},
+                         self.simulation.book(trip(11, 0, 12, 0)))
+        self.assertEqual({'free': 1, 'occupied': 1},
+                         self.simulation.taxi_counts())
+        self.simulation.increment_time(6)
+        self.assertEqual(Point(11, 0), self.simulation.taxi_location(1))
+        self.assertEqual({'free': 1, 'occupied': 1},
+                         self.simulation.taxi_counts())
+        self.simulation.increment_time()
+        self.assertEqual(Point(12, 0), self.simulation.taxi_location(1))
+        self.assertEqual({'free': 2, 'occupied': 0},
+                         self.simulation.taxi_counts())
+
+    def test_free_taxi_is_booked_when_as_close_with_smaller_id(self):
+        simulation = GridSimulation(
+            Point(0, 0), 2, starting_points=[(10, 0), (0, 0)],
+            dispatch=PredictiveDispatch)
+        self.assertEqual(2, simulation.book(trip(0, 0, 1, 0))['car_id'])
+        # Taxi 2 has 1 left and is then 4 away, as long as taxi 1 takes.
+        self.assertEqual(1, simulation.book(trip(5, 0, 6, 0))['car_id'])
+
+    def test_taxi_takes_one_chained_booking(self):
+        self.simulation.book(trip(0, 0, 10, 0))
+        self.assertEqual(1, self.simulation.book(trip(10, 0, 9, 0))['car_id'])
+        self.assertEqual({'car_id': 2, 'total_time': 11},
+                         self.simulation.book(trip(10, 0, 9, 0)))
+        self.assertEqual({'car_id': 2, 'total_time': 13},
+                         self.simulation.book(trip(10, 0, 9, 0)))
+        self.assertIsNone(self.simulation.book(trip(10, 0, 9, 0)))
+
+    def test_chained_bookings_are_dropped_by_reset(self):
+        self.simulation.book(trip(0, 0, 10, 0))
+        self.simulation.book(trip(10, 0, 9, 0))
+        self.simulation.reset()
+        self.simulation.increment_time(20)
+        self.assertEqual({'free': 2, 'occupied': 0},
+                         self.simulation.taxi_counts())
+        self.assertEqual(Point(0, 0), self.simulation.taxi_location(1))
+
+    def test_eta_counts_chained_bookings(self):
+        self.simulation.book(trip(0, 0, 10, 0))
+        self.simulation.book(trip(10, 0, 15, 0))
+        self.simulation.book(trip(20, 0, 40, 0))
+        fleet, time = self.simulation.capture()[:2]
+        # Taxi 1 drops its chained customer off at (15, 0) at time 15.
+        self.assertEqual((1, 15 + 10),
+                         FleetView(fleet, time).eta(Point(10, 5)))
+
+    def test_matches_reference(self):
+        for tick_kernel, index_factory in (
+                (ArrivalQueueKernel, QuadTreeIndex),
+                (VectorisedStepKernel, LinearScanIndex)):
+            for seed in range(4):
+                with self.subTest(tick_kernel=tick_kernel.__name__, seed=seed):
+                    self.check_matches_reference(tick_kernel, index_factory,
+                                                 seed)
+
+    def check_matches_reference(self, tick_kernel, index_factory, seed):
+        rng = random.Random(seed)
+        starting_points = [(rng.randint(-10, 10), rng.randint(-10, 10))
+                           for _ in range(12)]
+        simulation = GridSimulation(
+            Point(0, 0), 12, index_factory=index_factory,
+            tick_kernel=tick_kernel, starting_points=starting_points,
+            dispatch=lambda fleet: PredictiveDispatch(fleet, index_factory))
+        reference = ReferenceDispatch(starting_points)
+        for _ in range(300):
+            if rng.random() < 0.6:
+                booking = trip(rng.randint(-10, 10), rng.randint(-10, 10),
+                               rng.randint(-10, 10), rng.randint(-10, 10))
+                self.assertEqual(reference.book(booking),
+                                 simulation.book(booking))
+            else:
+                ticks = rng.choice((1, 2, 7, 30))
+                simulation.increment_time(ticks)
+                reference.increment_time(ticks)
+                free_taxis = reference.free_taxis()
+                self.assertEqual(len(free_taxis),
+                                 simulation.taxi_counts()['free'])
+                for taxi_id, location in free_taxis.items():
+                    self.assertEqual(location,
+                                     simulation.taxi_location(taxi_id))
+
+
+class TestPredictiveDispatchSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'snapshot')
+        self.simulation = GridSimulation(
+            Point(0, 0), 2, starting_points=[(0, 0), (20, 0)],
+            dispatch=PredictiveDispatch)
+        self.simulation.book(trip(0, 0, 10, 0))
+        self.simulation.increment_time(5)
+        self.simulation.book(trip(11, 0, 12, 0))
+        self.simulation.save(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_loaded_simulation_starts_chained_bookings(self):
+        loaded = GridSimulation.load(self.path, dispatch=PredictiveDispatch)
+        for simulation in (self.simulation, loaded):
+            # Chained taxis are not offered again.
+            self.assertEqual(2, simulation.book(trip(12, 0, 13, 0))['car_id'])
+            simulation.increment_time(6)
+            self.assertEqual(Point(11, 0), simulation.taxi_location(1))
+            simulation.increment_time()
+            self.assertEqual({'free': 1, 'occupied': 1},
+                             simulation.taxi_counts())
+
+    def test_load_without_dispatch(self):
+        with self.assertRaises(ValueError):
+            GridSimulation.load(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import io
+import json
+import unittest
+import numpy as np
+from django.core.wsgi import get_wsgi_application
+from taxi_booking.booking.fastpath import FastPathApplication
+from taxi_booking.booking.wire import BinaryFormat, TRIP_DTYPE
+
+
+class TestFastPathApplication(unittest.TestCase):
+
+    def setUp(self):
+        self.django = get_wsgi_application()
+        self.fast_path = FastPathApplication(self.django)
+        self.booking = {'source': {'x': 1, 'y': 2},
+                        'destination': {'x': 3, 'y': 4}}
+
+    def call(self, application, path, body=b'', method='POST',
+             content_type='application/json', query='', host='localhost'):
+        environ = {'REQUEST_METHOD': method, 'PATH_INFO': path,
+                   'SCRIPT_NAME': '', 'QUERY_STRING': query,
+                   'CONTENT_TYPE': content_type,
+                   'CONTENT_LENGTH': str(len(body)),
+                   'HTTP_HOST': host, 'SERVER_NAME': 'localhost',
+                   'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                   'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(body),
+                   'wsgi.errors': io.StringIO()}
+        started = []
+
+        def start_response(status, headers):
+            started.append((int(status.split()[0]),
+                            {name.lower(): value for name, value in headers}))
+
+        content = b''.join(application(environ, start_response))
+        status, headers = started[0]
+        return status, headers, content
+
+    def assert_same_response(self, path, **kwargs):
+        for application in (self.fast_path, self.django):
+            self.call(application, '/api/reset/')
+        fast = self.call(self.fast_path, path, **kwargs)
+        reference = self.call(self.django, path, **kwargs)
+        self.assertEqual(reference[0], fast[0])
+        if reference[1].get('content-type') == 'application/json':
+            self.assertEqual(json.loads(reference[2].decode()),
+                             json.loads(fast[2].decode()))
+        else:
+            self.assertEqual(reference[2], fast[2])
+        for header in ('content-type', 'x-content-type-options',
+                       'x-xss-protection', 'x-frame-options'):
+            self.assertEqual(reference[1].get(header), fast[1].get(header))
+        return fast[0]
+
+    def test_book_responses_match_django(self):
+        body = json.dumps(self.booking).encode()
+        same_location = json.dumps({'source': {'x': 1, 'y': 2},
+                                    'destination': {'x': 1, 'y': 2}}).encode()
+        cases = [
+            (200, dict(body=body)),
+            (204, dict(body=same_location)),
+            (415, dict(body=body, content_type='text/html')),
+            (400, dict(body=b'{"source": ')),
+            (405, dict(method='GET')),
+            (400, dict(body=body, host='example.com')),
+        ]
+        for status, kwargs in cases:
+            self.assertEqual(status,
+                             self.assert_same_response('/api/book/', **kwargs))
+
+    def test_book_batch_responses_match_django(self):
+        cases = [
+            (200, [self.booking, self.booking]),
+            (400, self.booking),
+            (400, [self.booking, {'source': {}}]),
+        ]
+        for status, bookings in cases:
+            body = json.dumps(bookings).encode()
+            self.assertEqual(status, self.assert_same_response(
+                '/api/book/batch/', body=body))
+
+    def test_binary_responses_match_django(self):
+        trips = np.array([(1, 2, 3, 4), (1, 2, 1, 2)], dtype=TRIP_DTYPE)
+        cases = [
+            (200, '/api/book/', trips[:1].tobytes()),
+            (204, '/api/book/', trips[1:].tobytes()),
+            (400, '/api/book/', trips.tobytes()),
+            (200, '/api/book/batch/', trips.tobytes()),
+            (400, '/api/book/batch/', trips.tobytes()[:-1]),
+        ]
+        for status, path, body in cases:
+            self.assertEqual(status, self.assert_same_response(
+                path, body=body, content_type=BinaryFormat.content_type))
+
+    def test_tick_and_reset_responses_match_django(self):
+        for status, query in ((204, ''), (204, 'n=3'), (400, 'n=0'),
+                              (400, 'n='), (400, 'n=x'),
+                              (400, 'n={}'.format(2 ** 63))):
+            self.assertEqual(status, self.assert_same_response(
+                '/api/tick/', query=query))
+        self.assertEqual(204, self.assert_same_response('/api/reset/'))
+
+    def test_bookings_ahead_are_left_to_django(self):
+        self.call(self.fast_path, '/api/reset/')
+        body = json.dumps(self.booking).encode()
+        status, headers, content = self.call(self.fast_path, '/api/book/',
+                                             body=body, query='at=5')
+        self.assertEqual(202, status)
+        self.assertEqual({'booking_id': 1, 'time': 5},
+                         json.loads(content.decode()))
+        status, headers, content = self.call(
+            self.fast_path, '/api/book/batch/', body=b'[' + body + b']',
+            query='at=5')
+        self.assertEqual([{'booking_id': 2, 'time': 5}],
+                         json.loads(content.decode()))
+
+    def test_book_until_no_taxis_are_free(self):
+        self.call(self.fast_path, '/api/reset/')
+        body = json.dumps(self.booking).encode()
+        statuses = [self.call(self.fast_path, '/api/book/', body=body)[0]
+                    for booking in range(4)]
+        self.assertEqual([200, 200, 200, 204], statuses)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from taxi_booking.booking.fleet import (ABSENT, BYTES_PER_TAXI, COLUMNS,
+                                        FleetStore, RETIRED,
+                                        read_starting_points)
+from taxi_booking.booking.point import Point
+
+
+class TestFleetStore(unittest.TestCase):
+
+    def setUp(self):
+        self.fleet = FleetStore(3)
+        self.fleet.set_starts(Point(1, 1))
+        self.fleet.reset()
+
+    def test_reset_frees_every_taxi_at_location(self):
+        self.assertEqual([1, 2, 3], list(self.fleet.free_taxi_ids()))
+        for taxi_id in (1, 2, 3):
+            self.assertTrue(self.fleet.is_free(taxi_id))
+            self.assertEqual(Point(1, 1), self.fleet.location(taxi_id))
+
+    def test_occupy_and_free(self):
+        self.fleet.occupy(2, Point(3, 4), Point(-5, 6), 7, 26)
+        self.assertFalse(self.fleet.is_free(2))
+        self.assertEqual([1, 3], list(self.fleet.free_taxi_ids()))
+        self.assertEqual((Point(1, 1), Point(3, 4), Point(-5, 6), 7),
+                         self.fleet.route(2))
+
+        self.fleet.free([2])
+        self.assertTrue(self.fleet.is_free(2))
+        self.assertEqual(Point(-5, 6), self.fleet.location(2))
+
+    def test_bytes_per_taxi(self):
+        self.assertEqual(66, BYTES_PER_TAXI)
+        self.assertEqual(3 * BYTES_PER_TAXI,
+                         sum(getattr(self.fleet, name).nbytes
+                             for name, dtype in COLUMNS))
+
+    def test_32_bit_coordinates(self):
+        min_int = -2147483648
+        max_int = 2147483647
+        self.fleet.occupy(1, Point(max_int, min_int), Point(min_int, max_int),
+                          0, 17179869180)
+        self.fleet.free([1])
+        self.assertEqual(Point(min_int, max_int), self.fleet.location(1))
+
+    def test_reset_frees_taxis_where_they_start(self):
+        self.fleet.set_starts(None, [(1, 2), (3, 4), (-5, 6)])
+        self.fleet.retire(2)
+        self.fleet.reset()
+        self.assertEqual([1, 3], list(self.fleet.free_taxi_ids()))
+        self.assertEqual(RETIRED, self.fleet.status[1])
+        self.assertEqual(Point(-5, 6), self.fleet.location(3))
+        with self.assertRaises(ValueError):
+            self.fleet.set_starts(None, [(1, 2)])
+
+    def test_reset_only_resets_changed_taxis(self):
+        fleet = FleetStore(40)
+        fleet.set_starts(Point(1, 2))
+        fleet.reset()
+        fleet.occupy(1, Point(3, 4), Point(-5, 6), 7, 26)
+        fleet.free([1])
+        fleet.occupy(3, Point(0, 0), Point(8, 8), 7, 30)
+        # Only changes made through the store are known, and reset.
+        fleet.x[1] = 9
+        fleet.reset()
+        self.assertEqual([1, 9, 1], fleet.x[:3].tolist())
+        self.assertEqual(40, len(fleet.free_taxi_ids()))
+
+        fleet.reset(status=ABSENT)
+        self.assertEqual([1, 1, 1], fleet.x[:3].tolist())
+        self.assertEqual(0, len(fleet.free_taxi_ids()))
+
+    def test_append(self):
+        self.fleet.occupy(1, Point(3, 4), Point(-5, 6), 7, 26)
+        self.assertEqual([4, 5], self.fleet.append([(7, 8), (9, 10)]).tolist())
+        self.assertEqual([2, 3, 4, 5], list(self.fleet.free_taxi_ids()))
+        self.assertEqual(Point(9, 10), self.fleet.location(5))
+        self.assertEqual((Point(1, 1), Point(3, 4), Point(-5, 6), 7),
+                         self.fleet.route(1))
+        self.fleet.reset()
+        self.assertEqual(Point(7, 8), self.fleet.location(4))
+
+    def test_read_starting_points(self):
+        directory = tempfile.mkdtemp()
+        try:
+            text_path = os.path.join(directory, 'fleet.csv')
+            with open(text_path, 'w') as file:
+                file.write('1,2\n-3,4\n')
+            npy_path = os.path.join(directory, 'fleet.npy')
+            np.save(npy_path, np.array([[1, 2], [-3, 4]], dtype=np.int32))
+            for path in (text_path, npy_path):
+                self.assertEqual([[1, 2], [-3, 4]],
+                                 read_starting_points(path).tolist())
+            with open(text_path, 'w') as file:
+                file.write('1,2\n{},0\n'.format(2 ** 31))
+            with self.assertRaises(ValueError):
+                read_starting_points(text_path)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
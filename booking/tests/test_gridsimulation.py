@@ -1,5 +1,7 @@
+import random
 import unittest
-from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.gridsimulation import (MAX_TICKS, MAX_TIME,
+                                                   GridSimulation)
 from taxi_booking.booking.point import Point
 from taxi_booking.booking.trip import Trip
 
@@ -210,6 +212,259 @@ class TestGridSimulation(unittest.TestCase):
         expected_response = {'car_id': 1, 'total_time': 20}
         self.assertEqual(expected_response, self.simulation.book(trip))
 
+    def test_increment_time_frees_taxi_after_pickup_and_trip(self):
+        expected_response = {'car_id': 1, 'total_time': 8}
+        self.assertEqual(expected_response, self.simulation.book(self.trip))
+        self.simulation.book(self.trip)
+        self.simulation.book(self.trip)
+
+        for i in range(7):
+            self.simulation.increment_time()
+        self.assertIsNone(self.simulation.book(self.trip))
+
+        self.simulation.increment_time()
+        expected_response = {'car_id': 1, 'total_time': 12}
+        self.assertEqual(expected_response, self.simulation.book(self.trip))
+
+    def test_taxi_location_along_route(self):
+        self.simulation.book(self.trip)
+        expected_locations = [(0, 0), (1, 0), (1, 1), (2, 1), (3, 1), (4, 1),
+                              (4, 2), (4, 3), (4, 4), (4, 4)]
+        for x, y in expected_locations:
+            location = self.simulation.taxi_location(1)
+            self.assertEqual((x, y), (location.x, location.y))
+            self.simulation.increment_time()
+
+        location = self.simulation.taxi_location(2)
+        self.assertEqual((0, 0), (location.x, location.y))
+
+    def test_book_does_not_move_trip_locations(self):
+        self.simulation.book(self.trip)
+        for i in range(4):
+            self.simulation.increment_time()
+        self.assertEqual((1, 1), (self.trip.src.x, self.trip.src.y))
+        self.assertEqual((4, 4), (self.trip.dst.x, self.trip.dst.y))
+
+    def test_increment_time_by_multiple_ticks(self):
+        trip = Trip({'source': {'x': 0, 'y': 0},
+                     'destination': {'x': 0, 'y': 5}})
+        self.simulation.book(trip)
+        trip = Trip({'source': {'x': 0, 'y': 0},
+                     'destination': {'x': 0, 'y': 2}})
+        self.simulation.book(trip)
+        trip = Trip({'source': {'x': 0, 'y': 0},
+                     'destination': {'x': 0, 'y': 9}})
+        self.simulation.book(trip)
+
+        self.simulation.increment_time(5)
+        trip = Trip({'source': {'x': 0, 'y': 5},
+                     'destination': {'x': 0, 'y': 6}})
+        expected_response = {'car_id': 1, 'total_time': 1}
+        self.assertEqual(expected_response, self.simulation.book(trip))
+        expected_response = {'car_id': 2, 'total_time': 4}
+        self.assertEqual(expected_response, self.simulation.book(trip))
+        self.assertIsNone(self.simulation.book(trip))
+
+        self.simulation.increment_time(4)
+        location = self.simulation.taxi_location(3)
+        self.assertEqual((0, 9), (location.x, location.y))
+        expected_response = {'car_id': 1, 'total_time': 2}
+        self.assertEqual(expected_response, self.simulation.book(trip))
+
+    def test_increment_time_for_too_many_ticks(self):
+        fleet = GridSimulation(Point(0, 0), 1).capture()[0]
+        simulation = GridSimulation(Point(0, 0), 1, fleet=fleet,
+                                    time=MAX_TIME - 1)
+        simulation.book(self.trip)
+        for ticks in (MAX_TICKS + 1, 2):
+            with self.assertRaises(ValueError):
+                simulation.increment_time(ticks)
+            self.assertEqual(MAX_TIME - 1, simulation.capture()[1])
+        simulation.increment_time()
+        self.assertEqual(MAX_TIME, simulation.capture()[1])
+
+    def test_capture_fleet_copies_taxis_and_time(self):
+        self.simulation.book(self.trip)
+        self.simulation.book(self.trip, 3)
+        self.simulation.increment_time()
+        fleet, time = self.simulation.capture_fleet()
+        self.assertEqual(1, time)
+        status = fleet.status.copy()
+        self.simulation.book(self.trip)
+        self.assertEqual(status.tolist(), fleet.status.tolist())
+        self.assertEqual(self.simulation.capture()[0].x.tolist(),
+                         fleet.x.tolist())
+
+    def test_taxis_start_from_their_own_points(self):
+        simulation = GridSimulation(Point(0, 0), 3,
+                                    starting_points=[(5, 5), (1, 2), (1, 2)])
+        self.assertEqual({'car_id': 2, 'total_time': 7},
+                         simulation.book(self.trip))
+        simulation.increment_time(7)
+        self.assertEqual(Point(4, 4), simulation.taxi_location(2))
+        simulation.reset()
+        self.assertEqual(Point(1, 2), simulation.taxi_location(2))
+        self.assertEqual(Point(5, 5), simulation.taxi_location(1))
+
+    def test_add_taxis(self):
+        self.simulation.book(self.trip)
+        self.assertEqual([4, 5], self.simulation.add_taxis([(1, 1), (9, 9)]))
+        self.assertEqual({'free': 4, 'occupied': 1},
+                         self.simulation.taxi_counts())
+        self.assertEqual({'car_id': 4, 'total_time': 6},
+                         self.simulation.book(self.trip))
+        self.simulation.increment_time(8)
+        self.assertEqual(Point(4, 4), self.simulation.taxi_location(1))
+        self.simulation.reset()
+        self.assertEqual(Point(9, 9), self.simulation.taxi_location(5))
+        self.assertEqual({'free': 5, 'occupied': 0},
+                         self.simulation.taxi_counts())
+
+    def test_retire_taxi(self):
+        self.simulation.retire_taxi(1)
+        self.assertEqual({'car_id': 2, 'total_time': 8},
+                         self.simulation.book(self.trip))
+        with self.assertRaises(ValueError):
+            self.simulation.retire_taxi(2)
+        for taxi_id in (1, 4):
+            with self.assertRaises(KeyError):
+                self.simulation.retire_taxi(taxi_id)
+        with self.assertRaises(KeyError):
+            self.simulation.taxi_location(1)
+        self.simulation.reset()
+        self.assertEqual({'free': 2, 'occupied': 0},
+                         self.simulation.taxi_counts())
+        self.assertEqual({'car_id': 2, 'total_time': 8},
+                         self.simulation.book(self.trip))
+
+    def test_scheduled_bookings_are_made_when_due(self):
+        other = Trip({'source': {'x': 0, 'y': 1},
+                      'destination': {'x': 0, 'y': 3}})
+        onward = Trip({'source': {'x': 0, 'y': 3},
+                       'destination': {'x': 0, 'y': 5}})
+        self.assertEqual({'booking_id': 1, 'time': 5},
+                         self.simulation.book(onward, 5))
+        self.assertEqual([{'booking_id': 2, 'time': 2},
+                          {'booking_id': 3, 'time': 2}],
+                         self.simulation.book_batch([other, other], 2))
+        self.assertEqual({'booking_id': 1, 'time': 5, 'status': 'scheduled'},
+                         self.simulation.scheduled_booking(1))
+
+        # Taxis 1 and 2 are booked at time 2, and taxi 1 again when both
+        # arrive at 5.
+        self.simulation.increment_time(7)
+        self.assertEqual({'booking_id': 3, 'time': 2, 'status': 'booked',
+                          'car_id': 2, 'total_time': 3},
+                         self.simulation.scheduled_booking(3))
+        self.assertEqual({'booking_id': 1, 'time': 5, 'status': 'booked',
+                          'car_id': 1, 'total_time': 2},
+                         self.simulation.scheduled_booking(1))
+        self.assertEqual(Point(0, 5), self.simulation.taxi_location(1))
+        self.assertEqual({'free': 3, 'occupied': 0},
+                         self.simulation.taxi_counts())
+
+    def test_scheduled_bookings_for_now_past_and_reset(self):
+        self.simulation.increment_time(2)
+        self.assertEqual({'car_id': 1, 'total_time': 8},
+                         self.simulation.book(self.trip, 2))
+        with self.assertRaises(ValueError):
+            self.simulation.book(self.trip, 1)
+        self.assertEqual({'booking_id': 1, 'time': 3},
+                         self.simulation.book(self.trip, 3))
+        self.simulation.reset()
+        with self.assertRaises(KeyError):
+            self.simulation.scheduled_booking(1)
+        self.simulation.increment_time(5)
+        self.assertEqual({'free': 3, 'occupied': 0},
+                         self.simulation.taxi_counts())
+
+    def test_scheduled_bookings_too_far_ahead(self):
+        self.simulation.increment_time(2)
+        for at_time in (2 + MAX_TICKS + 1, 10 ** 20):
+            with self.assertRaises(ValueError):
+                self.simulation.book(self.trip, at_time)
+            with self.assertRaises(ValueError):
+                self.simulation.book_batch([self.trip], at_time)
+        with self.assertRaises(KeyError):
+            self.simulation.scheduled_booking(1)
+        self.assertEqual({'booking_id': 1, 'time': 2 + MAX_TICKS},
+                         self.simulation.book(self.trip, 2 + MAX_TICKS))
+
+    def test_scheduled_bookings_match_booking_when_due(self):
+        rng = random.Random(5)
+        simulation = GridSimulation(Point(0, 0), 15)
+        expected = GridSimulation(Point(0, 0), 15)
+        due = {}
+        for booking_id in range(1, 150):
+            trip = Trip.from_points(
+                Point(rng.randint(-9, 9), rng.randint(-9, 9)),
+                Point(rng.randint(-9, 9), rng.randint(-9, 9)))
+            time = rng.randint(1, 40)
+            simulation.book(trip, time)
+            due.setdefault(time, []).append((booking_id, trip))
+
+        results = {}
+        for time in sorted(due):
+            expected.increment_time(time - expected.capture()[1])
+            booking_ids, trips = zip(*due[time])
+            results.update(zip(booking_ids, expected.book_batch(trips)))
+        expected.increment_time(50 - expected.capture()[1])
+        while simulation.capture()[1] < 50:
+            simulation.increment_time(min(rng.randint(1, 6),
+                                          50 - simulation.capture()[1]))
+
+        for booking_id, result in results.items():
+            state = simulation.scheduled_booking(booking_id)
+            if result is None:
+                self.assertEqual('unbooked', state['status'])
+            else:
+                self.assertEqual(result, {'car_id': state['car_id'],
+                                          'total_time': state['total_time']})
+        for taxi_id in range(1, 16):
+            self.assertEqual(expected.taxi_location(taxi_id),
+                             simulation.taxi_location(taxi_id))
+
+    def test_reset_matches_new_simulation(self):
+        rng = random.Random(8)
+        starting_points = [(rng.randint(-5, 5), rng.randint(-5, 5))
+                           for taxi in range(40)] + [(0, 0)] * 300
+        simulation = GridSimulation(Point(0, 0), len(starting_points),
+                                    starting_points=starting_points)
+        retired = []
+        for step in range(3000):
+            action = rng.random()
+            if step % 400 == 0:
+                simulation.reset()
+                expected = GridSimulation(Point(0, 0), len(starting_points),
+                                          starting_points=starting_points)
+                for taxi_id in retired:
+                    expected.retire_taxi(taxi_id)
+            elif action < 0.01:
+                points = [(rng.randint(-5, 5), rng.randint(-5, 5))]
+                starting_points += points
+                self.assertEqual(expected.add_taxis(points),
+                                 simulation.add_taxis(points))
+            elif action < 0.02:
+                taxi_id = rng.randint(1, len(starting_points))
+                try:
+                    expected.retire_taxi(taxi_id)
+                except (KeyError, ValueError):
+                    continue
+                simulation.retire_taxi(taxi_id)
+                retired.append(taxi_id)
+            elif action < 0.8:
+                trip = Trip({'source': {'x': rng.randint(-8, 8),
+                                        'y': rng.randint(-8, 8)},
+                             'destination': {'x': rng.randint(-8, 8),
+                                             'y': rng.randint(-8, 8)}})
+                self.assertEqual(expected.book(trip), simulation.book(trip))
+            else:
+                ticks = rng.randint(1, 4)
+                expected.increment_time(ticks)
+                simulation.increment_time(ticks)
+            self.assertEqual(expected.taxi_counts(),
+                             simulation.taxi_counts())
+
 
 if __name__ == '__main__':
     unittest.main()
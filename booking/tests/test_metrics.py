@@ -0,0 +1,80 @@
+import unittest
+from taxi_booking.booking.assignment import OptimalAssignment
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.metrics import Histogram, SimulationMetrics
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.trip import Trip
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_render_cumulative_buckets(self):
+        histogram = Histogram('latency', 'Latency.', (1, 5))
+        for value in (0, 1, 3, 7):
+            histogram.observe(value)
+        self.assertEqual(['# HELP latency Latency.',
+                          '# TYPE latency histogram',
+                          'latency_bucket{le="1"} 2',
+                          'latency_bucket{le="5"} 3',
+                          'latency_bucket{le="+Inf"} 4',
+                          'latency_sum 11',
+                          'latency_count 4'], histogram.render())
+
+
+class TestSimulationMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.trip = Trip({'source': {'x': 0, 'y': 1},
+                          'destination': {'x': 0, 'y': 3}})
+
+    def test_counts_bookings_ticks_and_freed_taxis(self):
+        metrics = SimulationMetrics()
+        simulation = GridSimulation(Point(0, 0), 2, metrics=metrics)
+        simulation.book(self.trip)
+        simulation.book_batch([self.trip, self.trip])
+        simulation.increment_time(2)
+        simulation.increment_time(1)
+
+        self.assertEqual((2, 1, 3, 2), (metrics.booked, metrics.unbooked,
+                                        metrics.ticks, metrics.freed))
+        self.assertEqual(1, sum(metrics.book_seconds.counts))
+        self.assertEqual(1, sum(metrics.batch_seconds.counts))
+        self.assertEqual(2, sum(metrics.tick_seconds.counts))
+        self.assertEqual(4, metrics.tick_moved.sum)
+        self.assertEqual(2, metrics.tick_freed.sum)
+
+    def test_counts_optimal_batch_bookings(self):
+        metrics = SimulationMetrics()
+        simulation = GridSimulation(Point(0, 0), 1, metrics=metrics,
+                                    assignment=OptimalAssignment())
+        simulation.book_batch([self.trip, self.trip])
+        self.assertEqual((1, 1), (metrics.booked, metrics.unbooked))
+
+    def test_samples_one_call_in_every_sample_every(self):
+        metrics = SimulationMetrics(sample_rate=0.25)
+        simulation = GridSimulation(Point(0, 0), 10, metrics=metrics)
+        for booking in range(10):
+            simulation.book(self.trip)
+        self.assertEqual(4, metrics.sample_every)
+        self.assertEqual(10, metrics.booked)
+        self.assertEqual(2, sum(metrics.book_seconds.counts))
+        self.assertEqual(2, sum(metrics.book_candidates.counts))
+
+    def test_invalid_sample_rate(self):
+        for sample_rate in (0, 1.5):
+            with self.assertRaises(ValueError):
+                SimulationMetrics(sample_rate)
+
+    def test_render(self):
+        metrics = SimulationMetrics()
+        simulation = GridSimulation(Point(0, 0), 3, metrics=metrics)
+        simulation.book(self.trip)
+        text = metrics.render(simulation.taxi_counts())
+        self.assertIn('taxi_bookings_total{result="booked"} 1\n', text)
+        self.assertIn('taxi_fleet_taxis{state="free"} 2\n', text)
+        self.assertIn('taxi_fleet_taxis{state="occupied"} 1\n', text)
+        self.assertIn('taxi_book_scanned_candidates_count 1\n', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+from taxi_booking.booking import oplog
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.schedule import BookingSchedule
+from taxi_booking.booking.snapshot import SnapshotFleetStore, write
+from taxi_booking.booking.trip import Trip
+from taxi_booking.booking.waiting import FifoQueue
+
+
+class TestOperationLog(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'log')
+        self.rng = random.Random(7)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def random_trip(self, spread):
+        return Trip({'source': {'x': self.rng.randint(-spread, spread),
+                                'y': self.rng.randint(-spread, spread)},
+                     'destination': {'x': self.rng.randint(-spread, spread),
+                                     'y': self.rng.randint(-spread, spread)}})
+
+    def run_logged(self, simulation, log, steps):
+        for step in range(steps):
+            operation = self.rng.random()
+            if operation < 0.5:
+                trip = self.random_trip(8)
+                log.book(trip, simulation.book(trip))
+            elif operation < 0.6:
+                trips = [self.random_trip(8) for trip in range(3)]
+                log.book_batch(trips, simulation.book_batch(trips))
+            elif operation < 0.65:
+                trip = self.random_trip(8)
+                at_time = (simulation.capture()[1]
+                           + self.rng.choice((0, 1, 3, 10)))
+                log.book(trip, simulation.book(trip, at_time))
+            elif operation < 0.98:
+                ticks = self.rng.choice((1, 2, 5))
+                simulation.increment_time(ticks)
+                log.increment_time(ticks)
+            else:
+                simulation.reset()
+                log.reset()
+
+    def assert_same_state(self, simulation, other):
+        self.assertEqual(simulation.taxi_counts(), other.taxi_counts())
+        self.assertEqual(simulation.capture()[3].tolist(),
+                         other.capture()[3].tolist())
+        for taxi_id in range(2, 5):
+            self.assertEqual(simulation.taxi_location(taxi_id),
+                             other.taxi_location(taxi_id))
+
+    def test_read_entries(self):
+        simulation = GridSimulation(Point(0, 0), 1)
+        log = oplog.OperationLog(self.path)
+        trip = Trip({'source': {'x': 1, 'y': 2},
+                     'destination': {'x': 3, 'y': 4}})
+        log.book(trip, simulation.book(trip))
+        log.book_batch([trip, trip], simulation.book_batch([trip, trip]))
+        log.increment_time(3)
+        log.book(trip, simulation.book(trip, 5))
+        log.reset()
+        log.close()
+
+        entries = list(oplog.read(self.path))
+        self.assertEqual(['book', 'book/batch', 'tick', 'book', 'reset'],
+                         [entry.operation for entry in entries])
+        self.assertEqual([{'car_id': 1, 'total_time': 7}], entries[0].results)
+        self.assertEqual([None, None], entries[1].results)
+        self.assertEqual(Point(3, 4), entries[1].trips[1].dst)
+        self.assertEqual(3, entries[2].ticks)
+        self.assertEqual([{'booking_id': 1, 'time': 5}], entries[3].results)
+
+    def test_recover_replays_log(self):
+        simulation = GridSimulation(Point(0, 0), 5)
+        log = oplog.OperationLog(self.path)
+        self.run_logged(simulation, log, 300)
+        log.close()
+
+        recovered = GridSimulation(Point(0, 0), 5)
+        self.assertEqual(300, oplog.recover(self.path, recovered))
+        self.assert_same_state(simulation, recovered)
+
+    def test_recover_replays_fleet_changes(self):
+        simulation = GridSimulation(Point(0, 0), 2)
+        log = oplog.OperationLog(self.path)
+        log.add_taxis([(3, 4), (5, 6)], simulation.add_taxis([(3, 4), (5, 6)]))
+        simulation.retire_taxi(1)
+        log.retire_taxi(1)
+        self.run_logged(simulation, log, 100)
+        log.close()
+
+        entries = list(oplog.read(self.path))
+        self.assertEqual([(3, Point(3, 4)), (4, Point(5, 6))], entries[0].taxis)
+        self.assertEqual([(1, None)], entries[1].taxis)
+        recovered = GridSimulation(Point(0, 0), 2)
+        oplog.recover(self.path, recovered)
+        self.assert_same_state(simulation, recovered)
+
+    def test_recover_replays_log_after_snapshot(self):
+        simulation = GridSimulation(Point(0, 0), 5)
+        log = oplog.OperationLog(self.path)
+        self.run_logged(simulation, log, 100)
+        snapshot_path = os.path.join(self.directory, 'snapshot')
+        write(snapshot_path, *simulation.capture(), log_position=log.position)
+        self.run_logged(simulation, log, 100)
+        log.close()
+
+        fleet = SnapshotFleetStore(snapshot_path)
+        recovered = GridSimulation(
+            fleet.starting_point, len(fleet), fleet=fleet, time=fleet.time,
+            schedule=BookingSchedule.from_records(fleet.scheduled))
+        self.assertEqual(100, oplog.recover(self.path, recovered,
+                                            fleet.log_position))
+        self.assert_same_state(simulation, recovered)
+
+    def test_recover_replays_waiting_bookings(self):
+        simulation = GridSimulation(Point(0, 0), 2, waiting=FifoQueue)
+        log = oplog.OperationLog(self.path)
+        self.run_logged(simulation, log, 300)
+        log.close()
+
+        entries = list(oplog.read(self.path))
+        self.assertTrue(any('ticket_id' in (result or {})
+                            for entry in entries for result in entry.results))
+        recovered = GridSimulation(Point(0, 0), 2, waiting=FifoQueue)
+        self.assertEqual(300, oplog.recover(self.path, recovered))
+        self.assertEqual(simulation.capture()[4].tolist(),
+                         recovered.capture()[4].tolist())
+
+    def test_recover_truncates_partial_entry(self):
+        log = oplog.OperationLog(self.path)
+        log.increment_time(2)
+        trips = [self.random_trip(8) for trip in range(3)]
+        log.book_batch(trips, [None] * 3)
+        log.close()
+        size = os.path.getsize(self.path)
+        with open(self.path, 'r+b') as file:
+            file.truncate(size - 1)
+
+        recovered = GridSimulation(Point(0, 0), 5)
+        self.assertEqual(1, oplog.recover(self.path, recovered))
+        self.assertEqual(1, len(list(oplog.read(self.path))))
+
+    def test_recover_for_diverging_results(self):
+        log = oplog.OperationLog(self.path)
+        trip = Trip({'source': {'x': 1, 'y': 2},
+                     'destination': {'x': 3, 'y': 4}})
+        log.book(trip, {'car_id': 2, 'total_time': 7})
+        log.close()
+        with self.assertRaises(ValueError):
+            oplog.recover(self.path, GridSimulation(Point(0, 0), 3))
+
+    def test_concurrent_appends_are_flushed(self):
+        log = oplog.OperationLog(self.path)
+
+        def append():
+            for tick in range(50):
+                log.flush(log.increment_time(1))
+
+        threads = [threading.Thread(target=append) for thread in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        log.close()
+        self.assertEqual(200, len(list(oplog.read(self.path))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from taxi_booking.booking.point import Point, manhattan_dist
+from taxi_booking.booking.point import Point, manhattan_dist, position_along
 
 
 class TestPoint(unittest.TestCase):
@@ -35,6 +35,18 @@ class TestPoint(unittest.TestCase):
         self.assertEqual(8589934590, manhattan_dist(src=Point(min_int, min_int),
                                                     dst=Point(max_int, max_int)))
 
+    def test_position_along_x_axis_first_then_y_axis(self):
+        src, dst = Point(1, 1), Point(-1, 3)
+        expected_positions = [(1, 1), (0, 1), (-1, 1), (-1, 2), (-1, 3), (-1, 3)]
+        for elapsed, (x, y) in enumerate(expected_positions):
+            position = position_along(src, dst, elapsed)
+            self.assertEqual((x, y), (position.x, position.y))
+
+    def test_point_equality(self):
+        self.assertEqual(Point(1, 2), Point(1, 2))
+        self.assertNotEqual(Point(1, 2), Point(2, 1))
+        self.assertEqual(1, len({Point(1, 2), Point(1, 2)}))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,152 @@
+import random
+import threading
+import unittest
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.point import Point, manhattan_dist
+from taxi_booking.booking.queries import FleetView, ViewPublisher
+from taxi_booking.booking.trip import Trip
+
+
+def random_trip(rng):
+    return Trip.from_points(Point(rng.randint(-20, 20), rng.randint(-20, 20)),
+                            Point(rng.randint(-20, 20), rng.randint(-20, 20)))
+
+
+class TestFleetView(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.simulation = GridSimulation(
+            Point(0, 0), 200,
+            starting_points=[(rng.randint(-20, 20), rng.randint(-20, 20))
+                             for _ in range(200)])
+        for _ in range(8):
+            self.simulation.book_batch([random_trip(rng) for _ in range(15)])
+            self.simulation.increment_time(3)
+        fleet, time = self.simulation.capture()[:2]
+        self.view = FleetView(fleet, time)
+        self.free = [(taxi_id, fleet.location(taxi_id))
+                     for taxi_id in fleet.free_taxi_ids()]
+        self.occupied = [(taxi_id, fleet.route(taxi_id)[2],
+                          int(fleet.arrival_time[taxi_id - 1]))
+                         for taxi_id in fleet.occupied_taxi_ids()]
+        self.rng = rng
+
+    def test_counts(self):
+        self.assertEqual(len(self.free), self.view.free)
+        self.assertEqual(len(self.occupied), self.view.occupied)
+        self.assertEqual(len(self.occupied) / 200, self.view.utilisation())
+
+    def test_nearest_matches_brute_force(self):
+        for _ in range(50):
+            location = Point(self.rng.randint(-25, 25),
+                             self.rng.randint(-25, 25))
+            k = self.rng.choice((1, 3, 10, 500))
+            radius = self.rng.choice((None, 0, 4, 15))
+            expected = sorted(
+                (manhattan_dist(location, point), taxi_id, point)
+                for taxi_id, point in self.free)
+            expected = [(taxi_id, point, dist)
+                        for dist, taxi_id, point in expected
+                        if radius is None or dist <= radius][:k]
+            self.assertEqual(expected,
+                             self.view.nearest(location, k, radius))
+
+    def test_nearest_is_booked_next(self):
+        for _ in range(20):
+            trip = random_trip(self.rng)
+            taxi_id, _, _ = self.view.nearest(trip.src)[0]
+            self.assertEqual(taxi_id, self.simulation.book(trip)['car_id'])
+            fleet, time = self.simulation.capture()[:2]
+            self.view = FleetView(fleet, time)
+
+    def test_eta_matches_brute_force(self):
+        for _ in range(50):
+            location = Point(self.rng.randint(-25, 25),
+                             self.rng.randint(-25, 25))
+            etas = [(manhattan_dist(location, point), taxi_id)
+                    for taxi_id, point in self.free]
+            etas += [(arrival_time - self.view.time
+                      + manhattan_dist(location, destination), taxi_id)
+                     for taxi_id, destination, arrival_time in self.occupied]
+            eta, taxi_id = min(etas)
+            self.assertEqual((taxi_id, eta), self.view.eta(location))
+
+    def test_empty_fleet(self):
+        fleet, time = GridSimulation(Point(0, 0), 0).capture()[:2]
+        view = FleetView(fleet, time)
+        self.assertEqual([], view.nearest(Point(0, 0), 5))
+        self.assertIsNone(view.eta(Point(0, 0)))
+        self.assertEqual(0.0, view.utilisation())
+
+    def test_view_is_not_changed_by_the_simulation(self):
+        before = self.view.nearest(Point(0, 0), 500)
+        self.simulation.reset()
+        self.assertEqual(before, self.view.nearest(Point(0, 0), 500))
+
+
+class TestViewPublisher(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = GridSimulation(Point(0, 0), 2)
+        self.lock = threading.Lock()
+        self.trip = Trip.from_points(Point(1, 2), Point(3, 4))
+
+    def test_view_is_served_until_too_old(self):
+        publisher = ViewPublisher(self.simulation, self.lock, 3600)
+        view = publisher.view()
+        self.assertEqual(0, view.occupied)
+        self.simulation.book(self.trip)
+        publisher.changed()
+        self.assertIs(view, publisher.view())
+        publisher.stop()
+
+    def test_new_view_is_taken_when_too_old(self):
+        publisher = ViewPublisher(self.simulation, self.lock, 0)
+        publisher.view()
+        self.simulation.book(self.trip)
+        self.simulation.increment_time()
+        publisher.changed()
+        view = publisher.view()
+        self.assertEqual((1, 1, 1), (view.time, view.free, view.occupied))
+
+    def test_change_is_published_once_view_is_too_old(self):
+        publisher = ViewPublisher(self.simulation, self.lock, 0.2)
+        view = publisher.view()
+        self.simulation.book(self.trip)
+        publisher.changed()
+        timer = publisher._timer
+        self.simulation.book(self.trip)
+        publisher.changed()
+        self.assertIs(timer, publisher._timer)
+        self.assertIs(view, publisher.view())
+        timer.join()
+        self.assertEqual(2, publisher.view().occupied)
+        self.assertIsNone(publisher._timer)
+
+    def test_readers_do_not_take_the_simulations_lock(self):
+        publisher = ViewPublisher(self.simulation, self.lock, 0)
+        view = publisher.view()
+        with self.lock:
+            # A writer publishing its change waits for the lock, while
+            # readers are served the last view.
+            writer = threading.Thread(target=publisher.changed)
+            writer.start()
+            while not publisher._taking.locked():
+                pass
+            self.assertIs(view, publisher.view())
+        writer.join()
+        self.assertIsNot(view, publisher.view())
+
+    def test_started_publisher_takes_views_every_max_age(self):
+        publisher = ViewPublisher(self.simulation, self.lock, 0.01)
+        view = publisher.view()
+        publisher.start()
+        while publisher.view() is view:
+            pass
+        publisher.stop()
+        self.assertIsNone(publisher._thread)
+
+
+if __name__ == '__main__':
+    unittest.main()
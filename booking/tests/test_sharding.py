@@ -0,0 +1,112 @@
+import random
+import unittest
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.sharding import ShardedSimulation
+from taxi_booking.booking.trip import Trip
+
+
+def make_trip(src_x, src_y, dst_x, dst_y):
+    return Trip({'source': {'x': src_x, 'y': src_y},
+                 'destination': {'x': dst_x, 'y': dst_y}})
+
+
+class TestShardedSimulation(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = ShardedSimulation(Point(0, 0), 3, boundaries=[-5, 5])
+
+    def tearDown(self):
+        self.simulation.close()
+
+    def test_book_for_taxi_across_region_boundary(self):
+        # Move taxi 1 to x = 5, just inside the right-hand region.
+        self.simulation.book(make_trip(0, 0, 5, 0))
+        self.simulation.increment_time(5)
+
+        expected_response = {'car_id': 1, 'total_time': 2}
+        self.assertEqual(expected_response,
+                         self.simulation.book(make_trip(4, 0, 4, 1)))
+
+    def test_book_falls_back_to_other_regions(self):
+        expected_response = {'car_id': 1, 'total_time': 30}
+        self.assertEqual(expected_response,
+                         self.simulation.book(make_trip(20, 0, 20, 10)))
+        self.simulation.increment_time(30)
+        self.assertEqual(Point(20, 10), self.simulation.taxi_location(1))
+
+        expected_response = {'car_id': 2, 'total_time': 31}
+        self.assertEqual(expected_response,
+                         self.simulation.book(make_trip(-20, 0, -20, 11)))
+
+    def test_book_asks_only_shards_that_may_hold_closer_taxis(self):
+        asked = []
+        call_many = self.simulation._call_many
+
+        def record_call_many(shards, method, *args):
+            shards = list(shards)
+            if method == 'nearest':
+                asked.append(shards)
+            return call_many(shards, method, *args)
+
+        self.simulation._call_many = record_call_many
+        self.simulation.book(make_trip(1, 0, 2, 0))
+        self.assertEqual([[1]], asked)
+
+        # The closest taxi is 2 away, and the right-hand region 1 away.
+        del asked[:]
+        self.simulation.increment_time(2)
+        self.simulation.book(make_trip(4, 0, 4, 1))
+        self.assertEqual([[1], [2]], asked)
+
+        del asked[:]
+        self.simulation.book(make_trip(20, 0, 20, 1))
+        self.assertEqual([[2], [0, 1]], asked)
+
+    def test_taxis_start_from_their_own_regions(self):
+        with ShardedSimulation(Point(0, 0), 2, [0],
+                               starting_points=[(5, 0), (-5, 0)]) as sharded:
+            self.assertEqual({'car_id': 2, 'total_time': 2},
+                             sharded.book(make_trip(-4, 0, -4, 1)))
+            self.assertEqual({'car_id': 1, 'total_time': 14},
+                             sharded.book(make_trip(-4, 0, -4, 5)))
+            sharded.reset()
+            self.assertEqual(Point(5, 0), sharded.taxi_location(1))
+            self.assertEqual(Point(-5, 0), sharded.taxi_location(2))
+            self.assertEqual({'car_id': 1, 'total_time': 2},
+                             sharded.book(make_trip(4, 0, 4, 1)))
+
+    def test_sharded_simulation_matches_grid_simulation(self):
+        for starting_points in (None, [(-10, 3), (-2, 0), (0, 0), (3, 7),
+                                       (4, -4), (9, 9), (12, 1), (2, -1)]):
+            with self.subTest(starting_points=starting_points):
+                self.check_matches_grid_simulation(starting_points)
+
+    def check_matches_grid_simulation(self, starting_points):
+        rng = random.Random(5)
+        num_taxis = 8
+        start = Point(2, -1)
+        simulation = GridSimulation(start, num_taxis,
+                                    starting_points=starting_points)
+        with ShardedSimulation(start, num_taxis, [-6, 0, 3, 9],
+                               starting_points) as sharded:
+            for step in range(300):
+                operation = rng.random()
+                if operation < 0.5:
+                    trip = make_trip(rng.randint(-15, 15), rng.randint(-15, 15),
+                                     rng.randint(-15, 15), rng.randint(-15, 15))
+                    self.assertEqual(simulation.book(trip), sharded.book(trip))
+                elif operation < 0.98:
+                    ticks = rng.choice((1, 2, 7))
+                    simulation.increment_time(ticks)
+                    sharded.increment_time(ticks)
+                else:
+                    simulation.reset()
+                    sharded.reset()
+                for taxi_id in range(1, num_taxis + 1):
+                    self.assertEqual(simulation.taxi_location(taxi_id),
+                                     sharded.taxi_location(taxi_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import fcntl
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+from taxi_booking.booking.dispatch import PredictiveDispatch
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.sharedstate import SharedSimulation
+from taxi_booking.booking.trip import Trip
+from taxi_booking.booking.waiting import FifoQueue
+
+
+def _book_many(path, num_taxis, num_bookings, results):
+    simulation = SharedSimulation(path, Point(0, 0), num_taxis)
+    trip = Trip({'source': {'x': 1, 'y': 1},
+                 'destination': {'x': 2, 'y': 2}})
+    for booking in range(num_bookings):
+        result = simulation.book(trip)
+        if result is not None:
+            results.put(result['car_id'])
+    results.put(None)
+
+
+class TestSharedSimulation(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'fleet')
+        self.rng = random.Random(5)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def random_trip(self, spread):
+        return Trip({'source': {'x': self.rng.randint(-spread, spread),
+                                'y': self.rng.randint(-spread, spread)},
+                     'destination': {'x': self.rng.randint(-spread, spread),
+                                     'y': self.rng.randint(-spread, spread)}})
+
+    def test_shared_simulations_match_single_simulation(self):
+        num_taxis = 12
+        simulation = GridSimulation(Point(0, 0), num_taxis)
+        shared = [SharedSimulation(self.path, Point(0, 0), num_taxis)
+                  for worker in range(3)]
+        for step in range(400):
+            worker = self.rng.choice(shared)
+            operation = self.rng.random()
+            if operation < 0.5:
+                trip = self.random_trip(6)
+                self.assertEqual(simulation.book(trip), worker.book(trip))
+            elif operation < 0.6:
+                trips = [self.random_trip(6) for trip in range(3)]
+                self.assertEqual(simulation.book_batch(trips),
+                                 worker.book_batch(trips))
+            elif operation < 0.97:
+                ticks = self.rng.choice((1, 1, 2, 4))
+                simulation.increment_time(ticks)
+                worker.increment_time(ticks)
+            else:
+                simulation.reset()
+                worker.reset()
+            taxi_id = self.rng.randint(1, num_taxis)
+            self.assertEqual(simulation.taxi_location(taxi_id),
+                             self.rng.choice(shared).taxi_location(taxi_id))
+
+    def test_new_simulation_resumes_shared_state(self):
+        first = SharedSimulation(self.path, Point(3, 4), 2)
+        first.book(Trip({'source': {'x': 3, 'y': 6},
+                         'destination': {'x': 3, 'y': 7}}))
+        first.increment_time(3)
+
+        second = SharedSimulation(self.path, Point(3, 4), 2)
+        self.assertEqual(second.taxi_location(1), Point(3, 7))
+        self.assertEqual(second.taxi_location(2), Point(3, 4))
+
+    def test_reads_share_the_lock_with_other_readers(self):
+        simulation = SharedSimulation(self.path, Point(0, 0), 2)
+        trip = Trip({'source': {'x': 1, 'y': 1},
+                     'destination': {'x': 2, 'y': 2}})
+        with open(self.path + '.lock', 'a') as lock_file:
+            # Another process reading the fleet.
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            self.assertEqual({'free': 2, 'occupied': 0},
+                             simulation.taxi_counts())
+            self.assertEqual(Point(0, 0), simulation.taxi_location(1))
+            booking = threading.Thread(target=simulation.book, args=(trip,))
+            booking.start()
+            booking.join(0.2)
+            self.assertTrue(booking.is_alive())
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        booking.join()
+        self.assertEqual(1, simulation.taxi_counts()['occupied'])
+
+    def test_different_number_of_taxis_is_rejected(self):
+        SharedSimulation(self.path, Point(0, 0), 2)
+        with self.assertRaises(ValueError):
+            SharedSimulation(self.path, Point(0, 0), 3)
+
+    def test_predictive_dispatch_is_rejected(self):
+        with self.assertRaises(NotImplementedError):
+            SharedSimulation(self.path, Point(0, 0), 2,
+                             dispatch=PredictiveDispatch)
+
+    def test_waiting_queue_is_rejected(self):
+        with self.assertRaises(NotImplementedError):
+            SharedSimulation(self.path, Point(0, 0), 2, waiting=FifoQueue)
+
+    def test_concurrent_processes_book_each_taxi_once(self):
+        num_taxis, num_workers = 40, 4
+        SharedSimulation(self.path, Point(0, 0), num_taxis)
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(
+            target=_book_many, args=(self.path, num_taxis, 15, results))
+            for worker in range(num_workers)]
+        for worker in workers:
+            worker.start()
+
+        car_ids, finished = [], 0
+        while finished < num_workers:
+            car_id = results.get(timeout=30)
+            if car_id is None:
+                finished += 1
+            else:
+                car_ids.append(car_id)
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sorted(car_ids), list(range(1, num_taxis + 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
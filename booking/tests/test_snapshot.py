@@ -0,0 +1,196 @@
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+from taxi_booking.booking import gridsimulation, oplog
+from taxi_booking.booking.actor import SimulationActor
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.snapshot import PeriodicSnapshot, log_position
+from taxi_booking.booking.tickkernels import VectorisedStepKernel
+from taxi_booking.booking.trip import Trip
+
+
+class LoggedWorld:
+    """Logs and locks every operation on a simulation, as models.py does."""
+
+    def __init__(self, simulation, log):
+        self.simulation = simulation
+        self.log = log
+        self.lock = threading.Lock()
+
+    def book(self, trip):
+        with self.lock:
+            result = self.simulation.book(trip)
+            position = self.log.book(trip, result)
+        self.log.flush(position)
+        return result
+
+    def increment_time(self, ticks):
+        with self.lock:
+            self.simulation.increment_time(ticks)
+            position = self.log.increment_time(ticks)
+        self.log.flush(position)
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'snapshot')
+        self.rng = random.Random(3)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def random_trip(self, spread):
+        return Trip({'source': {'x': self.rng.randint(-spread, spread),
+                                'y': self.rng.randint(-spread, spread)},
+                     'destination': {'x': self.rng.randint(-spread, spread),
+                                     'y': self.rng.randint(-spread, spread)}})
+
+    def run_steps(self, simulations, steps):
+        for step in range(steps):
+            if self.rng.random() < 0.6:
+                trip = self.random_trip(8)
+                results = [simulation.book(trip) for simulation in simulations]
+            else:
+                ticks = self.rng.choice((1, 2, 5))
+                results = [simulation.increment_time(ticks)
+                           for simulation in simulations]
+            for result in results[1:]:
+                self.assertEqual(results[0], result)
+
+    def test_loaded_simulation_continues_as_saved_one(self):
+        simulation = GridSimulation(Point(3, -4), 10)
+        self.run_steps([simulation], 60)
+        simulation.save(self.path)
+
+        for kwargs in ({}, {'tick_kernel': VectorisedStepKernel}):
+            loaded = GridSimulation.load(self.path, **kwargs)
+            self.assertEqual(simulation.taxi_counts(), loaded.taxi_counts())
+            for taxi_id in range(1, 11):
+                self.assertEqual(simulation.taxi_location(taxi_id),
+                                 loaded.taxi_location(taxi_id))
+        self.run_steps([simulation, loaded], 200)
+        simulation.reset()
+        loaded.reset()
+        self.assertEqual(Point(3, -4), loaded.taxi_location(10))
+
+    def test_free_taxi_index_is_built_on_first_use(self):
+        simulation = GridSimulation(Point(0, 0), 0)
+        simulation.add_taxis([(self.rng.randint(-8, 8),
+                               self.rng.randint(-8, 8)) for _ in range(30)])
+        self.run_steps([simulation], 20)
+        simulation.save(self.path)
+
+        loaded = GridSimulation.load(self.path)
+        self.assertEqual(simulation.taxi_counts(), loaded.taxi_counts())
+        self.assertEqual(gridsimulation._UnbuiltIndex,
+                         type(loaded._free_taxi_index))
+        self.run_steps([simulation, loaded], 100)
+        self.assertNotEqual(gridsimulation._UnbuiltIndex,
+                            type(loaded._free_taxi_index))
+
+        for operate in (lambda world: world.reset(),
+                        lambda world: world.add_taxis([(2, 3)])):
+            expected = GridSimulation.load(self.path)
+            loaded = GridSimulation.load(self.path)
+            self.assertEqual(operate(expected), operate(loaded))
+            self.run_steps([expected, loaded], 50)
+
+    def test_loaded_simulation_keeps_scheduled_bookings(self):
+        simulation = GridSimulation(Point(0, 0), 2)
+        trip = self.random_trip(8)
+        simulation.book(trip, 2)
+        simulation.book(trip, 6)
+        simulation.increment_time(3)
+        simulation.save(self.path)
+
+        loaded = GridSimulation.load(self.path)
+        for booking_id in (1, 2):
+            self.assertEqual(simulation.scheduled_booking(booking_id),
+                             loaded.scheduled_booking(booking_id))
+        simulation.increment_time(5)
+        loaded.increment_time(5)
+        self.assertEqual(simulation.scheduled_booking(2),
+                         loaded.scheduled_booking(2))
+        self.assertEqual(simulation.book(trip, 9), loaded.book(trip, 9))
+
+    def test_loaded_simulation_does_not_change_snapshot(self):
+        GridSimulation(Point(0, 0), 3).save(self.path)
+        with open(self.path, 'rb') as file:
+            content = file.read()
+        loaded = GridSimulation.load(self.path)
+        loaded.book(self.random_trip(8))
+        loaded.increment_time(3)
+        with open(self.path, 'rb') as file:
+            self.assertEqual(content, file.read())
+
+    def test_load_invalid_snapshot(self):
+        GridSimulation(Point(0, 0), 3).save(self.path)
+        with open(self.path, 'rb') as file:
+            content = file.read()
+        for invalid in (b'', b'not a snapshot' * 10, content[:-8]):
+            with open(self.path, 'wb') as file:
+                file.write(invalid)
+            with self.assertRaises(ValueError):
+                GridSimulation.load(self.path)
+
+    def test_periodic_snapshot(self):
+        simulation = GridSimulation(Point(0, 0), 3)
+        snapshots = PeriodicSnapshot(simulation, self.path, 0.01,
+                                     threading.Lock())
+        snapshots.start()
+        simulation.book(Trip({'source': {'x': 1, 'y': 2},
+                              'destination': {'x': 3, 'y': 4}}))
+        simulation.increment_time(2)
+        snapshots.stop()
+        loaded = GridSimulation.load(self.path)
+        self.assertEqual({'free': 2, 'occupied': 1}, loaded.taxi_counts())
+        self.assertEqual(Point(1, 1), loaded.taxi_location(1))
+
+    def test_snapshots_taken_while_actor_operates_match_log(self):
+        log_path = os.path.join(self.directory, 'log')
+        world = LoggedWorld(GridSimulation(Point(0, 0), 3),
+                            oplog.OperationLog(log_path))
+        paths = [os.path.join(self.directory, 'snapshot{}'.format(i))
+                 for i in range(5)]
+
+        def take_snapshots():
+            for path in paths:
+                PeriodicSnapshot(world.simulation, path, 1, world.lock,
+                                 world.log).snapshot()
+
+        async def operate(actor):
+            thread = threading.Thread(target=take_snapshots)
+            thread.start()
+            for step in range(200):
+                if self.rng.random() < 0.6:
+                    await actor.call('book', self.random_trip(8))
+                else:
+                    await actor.call('increment_time', 1)
+            await actor.stop()
+            thread.join()
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(operate(SimulationActor(world)))
+        finally:
+            loop.close()
+        world.log.close()
+        for path in paths:
+            recovered = GridSimulation.load(path)
+            oplog.recover(log_path, recovered, log_position(path))
+            self.assertEqual(world.simulation.taxi_counts(),
+                             recovered.taxi_counts())
+            for taxi_id in range(1, 4):
+                self.assertEqual(world.simulation.taxi_location(taxi_id),
+                                 recovered.taxi_location(taxi_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import random
+import unittest
+import numpy as np
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.spatialindex import LinearScanIndex, QuadTreeIndex
+
+
+class TestQuadTreeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = QuadTreeIndex(leaf_capacity=2)
+
+    def test_nearest_for_empty_index(self):
+        self.assertEqual((None, float('inf')),
+                         self.index.nearest(Point(0, 0)))
+
+    def test_nearest_for_taxis_at_same_location(self):
+        for taxi_id in (3, 1, 2):
+            self.index.insert(taxi_id, Point(0, 0))
+        self.assertEqual((1, 2), self.index.nearest(Point(1, 1)))
+
+    def test_nearest_for_equidistant_taxis_in_different_cells(self):
+        self.index.insert(7, Point(-5, 0))
+        self.index.insert(4, Point(5, 0))
+        self.index.insert(9, Point(0, 5))
+        self.index.insert(2, Point(100, 100))
+        self.assertEqual((4, 5), self.index.nearest(Point(0, 0)))
+
+    def test_nearest_after_remove(self):
+        self.index.insert(1, Point(0, 0))
+        self.index.insert(2, Point(3, 3))
+        self.index.remove(1, Point(0, 0))
+        self.assertEqual((2, 6), self.index.nearest(Point(0, 0)))
+        self.index.remove(2, Point(3, 3))
+        self.assertEqual(0, len(self.index))
+        self.assertEqual((None, float('inf')),
+                         self.index.nearest(Point(0, 0)))
+
+    def test_insert_beyond_32_bit_limits(self):
+        self.index.insert(1, Point(2 ** 40, -2 ** 40))
+        self.index.insert(2, Point(0, 0))
+        self.assertEqual((1, 2 ** 41), self.index.nearest(Point(0, -2 ** 41)))
+
+    def test_nearest_matches_linear_scan(self):
+        rng = random.Random(42)
+        linear_index = LinearScanIndex()
+        locations = {}
+        for step in range(2000):
+            if locations and rng.random() < 0.4:
+                taxi_id = rng.choice(sorted(locations))
+                location = locations.pop(taxi_id)
+                self.index.remove(taxi_id, location)
+                linear_index.remove(taxi_id, location)
+            else:
+                taxi_id = step + 1
+                location = Point(rng.randint(-50, 50), rng.randint(-50, 50))
+                locations[taxi_id] = location
+                self.index.insert(taxi_id, location)
+                linear_index.insert(taxi_id, location)
+            query = Point(rng.randint(-60, 60), rng.randint(-60, 60))
+            self.assertEqual(linear_index.nearest(query),
+                             self.index.nearest(query))
+
+    def test_insert_all_matches_linear_scan(self):
+        rng = np.random.RandomState(3)
+        for num_taxis in (1, 300, 1000):
+            index = QuadTreeIndex(leaf_capacity=2)
+            linear_index = LinearScanIndex()
+            taxi_ids = rng.permutation(num_taxis) + 1
+            xs, ys = rng.randint(-20, 20, (2, num_taxis))
+            index.insert_all(taxi_ids[:num_taxis // 2], xs[:num_taxis // 2],
+                             ys[:num_taxis // 2])
+            index.insert_all(taxi_ids[num_taxis // 2:], xs[num_taxis // 2:],
+                             ys[num_taxis // 2:])
+            linear_index.insert_all(taxi_ids, xs, ys)
+            self.assertEqual(num_taxis, len(index))
+            for taxi_id, x, y in zip(taxi_ids[:20].tolist(), xs.tolist(),
+                                     ys.tolist()):
+                index.remove(taxi_id, Point(x, y))
+                linear_index.remove(taxi_id, Point(x, y))
+            for query in range(50):
+                query = Point(*rng.randint(-25, 25, 2).tolist())
+                self.assertEqual(linear_index.nearest(query),
+                                 index.nearest(query))
+
+    def test_restore_matches_linear_scan(self):
+        rng = random.Random(5)
+        index = QuadTreeIndex(leaf_capacity=2)
+        linear_index = LinearScanIndex()
+        # Enough taxis at the origin for their IDs to be overlaid rather
+        # than copied once changed after a checkpoint.
+        locations = {taxi_id: Point(0, 0) for taxi_id in range(1, 301)}
+        locations.update((taxi_id, Point(rng.randint(-30, 30),
+                                         rng.randint(-30, 30)))
+                         for taxi_id in range(301, 401))
+        for taxi_id, location in locations.items():
+            index.insert(taxi_id, location)
+            linear_index.insert(taxi_id, location)
+        checkpoints = (index.checkpoint(), linear_index.checkpoint(),
+                       dict(locations))
+
+        for step in range(3000):
+            if step % 500 == 0:
+                index.restore(checkpoints[0])
+                linear_index.restore(checkpoints[1])
+                locations = dict(checkpoints[2])
+            if locations and rng.random() < 0.5:
+                taxi_id = rng.choice(sorted(locations))
+                location = locations.pop(taxi_id)
+                index.remove(taxi_id, location)
+                linear_index.remove(taxi_id, location)
+            else:
+                taxi_id = rng.randint(1, 500)
+                if taxi_id in locations:
+                    continue
+                location = rng.choice((Point(0, 0), Point(
+                    rng.randint(-30, 30), rng.randint(-30, 30))))
+                locations[taxi_id] = location
+                index.insert(taxi_id, location)
+                linear_index.insert(taxi_id, location)
+            query = Point(rng.randint(-35, 35), rng.randint(-35, 35))
+            self.assertEqual(linear_index.nearest(query),
+                             index.nearest(query))
+            if step % 50 == 0:
+                self.assertEqual(list(linear_index.iter_nearest(query)),
+                                 list(index.iter_nearest(query)))
+            self.assertEqual(len(linear_index), len(index))
+
+
+if __name__ == '__main__':
+    unittest.main()
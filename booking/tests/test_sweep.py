@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.sweep import (Scenario, mean_pickup_time,
+                                        read_trace, rejection_rate,
+                                        run_scenario, sweep, utilisation,
+                                        write_trace)
+from taxi_booking.booking.trip import Trip
+
+
+def booking(src_x, src_y, dst_x, dst_y):
+    return {'source': {'x': src_x, 'y': src_y},
+            'destination': {'x': dst_x, 'y': dst_y}}
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'trace')
+        self.operations = [
+            {'op': 'book', 'booking': booking(1, 2, 3, 4)},
+            {'op': 'tick', 'n': 2},
+            {'op': 'book/batch', 'bookings': [booking(0, 0, 0, 5),
+                                              booking(-2, 0, 1, 1)]},
+            {'op': 'tick'},
+            {'op': 'book', 'booking': booking(9, 9, 0, 0)},
+            {'op': 'tick', 'n': 10}]
+        write_trace(self.path, self.operations)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_trace_is_mapped_back(self):
+        bookings, duration = read_trace(self.path)
+        self.assertEqual(13, duration)
+        self.assertEqual([(0, 1, 2, 3, 4), (2, 0, 0, 0, 5), (2, -2, 0, 1, 1),
+                          (3, 9, 9, 0, 0)], bookings.tolist())
+        with self.assertRaises(ValueError):
+            write_trace(self.path, [{'op': 'reset'}])
+
+    def test_scenario_matches_booking_in_turn(self):
+        result = run_scenario(self.path, Scenario('centre', 2, 0))
+
+        simulation = GridSimulation(Point(0, 0), 2)
+        results = [simulation.book(Trip(booking(1, 2, 3, 4)))]
+        simulation.increment_time(2)
+        results += [simulation.book(Trip(booking(0, 0, 0, 5))),
+                    simulation.book(Trip(booking(-2, 0, 1, 1)))]
+        simulation.increment_time(1)
+        results.append(simulation.book(Trip(booking(9, 9, 0, 0))))
+        # Both taxis are still booked at time 3.
+        self.assertEqual([{'car_id': 1, 'total_time': 7},
+                          {'car_id': 2, 'total_time': 5}, None, None],
+                         results)
+
+        self.assertEqual((4, 2, 3, 12, 13), (result.bookings, result.booked,
+                                             result.pickup_time,
+                                             result.busy_time,
+                                             result.duration))
+        self.assertEqual(0.5, rejection_rate(result))
+        self.assertEqual(1.5, mean_pickup_time(result))
+        self.assertEqual(12 / 26, utilisation(result))
+
+    def test_scenario_with_bookings_far_apart(self):
+        write_trace(self.path, [
+            {'op': 'book', 'booking': booking(1, 2, 3, 4)},
+            {'op': 'tick', 'n': 2000000},
+            {'op': 'book', 'booking': booking(2 ** 31 - 1, 0, 0, 0)},
+            {'op': 'tick', 'n': 2 ** 62},
+            {'op': 'book', 'booking': booking(1, 2, 3, 4)}])
+        result = run_scenario(self.path, Scenario('centre', 1, 0))
+        self.assertEqual((3, 3, 2000000 + 2 ** 62),
+                         (result.bookings, result.booked, result.duration))
+
+    def test_sweep_runs_scenarios_in_parallel(self):
+        scenarios = [Scenario(layout, num_taxis, 1)
+                     for layout in ('centre', 'spread')
+                     for num_taxis in (0, 1, 3)]
+        results = sweep(self.path, scenarios, workers=2)
+        self.assertEqual(scenarios, [result.scenario for result in results])
+        for result in results:
+            expected = run_scenario(self.path, result.scenario)
+            self.assertEqual(expected[:-1], result[:-1])
+        self.assertEqual(1.0, rejection_rate(results[0]))
+        self.assertEqual(0.0, utilisation(results[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from taxi_booking.booking.assignment import OptimalAssignment
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.tenants import SimulationRegistry
+from taxi_booking.booking.trip import Trip
+
+
+class TestSimulationRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.trip = Trip({'source': {'x': 1, 'y': 2},
+                          'destination': {'x': 3, 'y': 4}})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_simulations_are_isolated(self):
+        registry = SimulationRegistry(4)
+        self.assertTrue(registry.create('a', Point(0, 0), 1))
+        self.assertTrue(registry.create('b', Point(0, 0), 2,
+                                        starting_points=[(1, 2), (5, 5)]))
+        self.assertFalse(registry.create('a', Point(0, 0), 5))
+
+        a, b = registry.world('a'), registry.world('b')
+        self.assertEqual({'car_id': 1, 'total_time': 7}, a.book(self.trip))
+        self.assertIsNone(a.book(self.trip))
+        self.assertEqual({'car_id': 1, 'total_time': 4}, b.book(self.trip))
+        b.reset()
+        self.assertIsNone(a.book(self.trip))
+        self.assertEqual(['a', 'b'], registry.names())
+
+    def test_destroy(self):
+        registry = SimulationRegistry(4)
+        registry.create('a', Point(0, 0), 1)
+        world = registry.world('a')
+        registry.destroy('a')
+        self.assertNotIn('a', registry)
+        with self.assertRaises(KeyError):
+            world.book(self.trip)
+        with self.assertRaises(KeyError):
+            registry.destroy('a')
+        with self.assertRaises(KeyError):
+            registry.world('a')
+
+    def test_invalid_simulations(self):
+        registry = SimulationRegistry(4)
+        with self.assertRaises(ValueError):
+            registry.create('a/b', Point(0, 0), 1)
+        with self.assertRaises(ValueError):
+            registry.create('a', Point(0, 0), -1)
+        with self.assertRaises(ValueError):
+            registry.create('a', Point(0, 0), 2, starting_points=[(1, 2)])
+        self.assertEqual([], registry.names())
+
+    def test_fleet_size_limit(self):
+        registry = SimulationRegistry(4, max_taxis=3)
+        with self.assertRaises(ValueError):
+            registry.create('a', Point(0, 0), 4)
+        self.assertTrue(registry.create('a', Point(0, 0), 2))
+        a = registry.world('a')
+        with self.assertRaises(ValueError):
+            a.add_taxis([(1, 1), (2, 2)])
+        self.assertEqual([3], a.add_taxis([(1, 1)]))
+
+    def test_least_recently_used_is_dropped(self):
+        registry = SimulationRegistry(2)
+        registry.create('a', Point(0, 0), 1)
+        registry.create('b', Point(0, 0), 1)
+        registry.world('a').increment_time()
+        registry.create('c', Point(0, 0), 1)
+        self.assertEqual(['a', 'c'], registry.names())
+
+    def test_least_recently_used_is_written_and_loaded_back(self):
+        registry = SimulationRegistry(1, self.directory)
+        registry.create('a', Point(0, 0), 2)
+        a = registry.world('a')
+        self.assertEqual({'car_id': 1, 'total_time': 7}, a.book(self.trip))
+        a.increment_time(3)
+
+        registry.create('b', Point(0, 0), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.directory,
+                                                    'a.snapshot')))
+        self.assertEqual(['a', 'b'], registry.names())
+        self.assertEqual({'car_id': 2, 'total_time': 7}, a.book(self.trip))
+        a.increment_time(4)
+        self.assertEqual({'car_id': 1, 'total_time': 8}, a.book(self.trip))
+
+        registry.destroy('b')
+        registry.destroy('a')
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_simulations_use_registry_assignment(self):
+        registry = SimulationRegistry(1, self.directory,
+                                      assignment=OptimalAssignment())
+        registry.create('a', Point(0, 0), 2, starting_points=[(0, 10), (0, 0)])
+        registry.create('b', Point(0, 0), 1)
+        trips = [Trip({'source': {'x': 0, 'y': 6},
+                       'destination': {'x': 0, 'y': 7}}),
+                 Trip({'source': {'x': 0, 'y': 11},
+                       'destination': {'x': 0, 'y': 12}})]
+        # Loaded back with the registry's OptimalAssignment.
+        self.assertEqual([{'car_id': 2, 'total_time': 7},
+                          {'car_id': 1, 'total_time': 2}],
+                         registry.world('a').book_batch(trips))
+
+    def test_view_of_evicted_simulation(self):
+        registry = SimulationRegistry(1, self.directory, view_max_age=0)
+        registry.create('a', Point(0, 0), 2)
+        registry.world('a').book(self.trip)
+        registry.create('b', Point(0, 0), 1)
+        view = registry.world('a').view()
+        self.assertEqual((1, 1), (view.free, view.occupied))
+        with self.assertRaises(KeyError):
+            registry.view('c')
+
+    def test_evicted_simulation_is_written_without_registry_lock(self):
+        registry = SimulationRegistry(1, self.directory)
+        registry.create('a', Point(0, 0), 1)
+        a = registry.world('a')
+        with registry.locked('a'):
+            # Evicting a waits for its lock, but not the registry's users.
+            creating = threading.Thread(target=registry.create,
+                                        args=('b', Point(0, 0), 1))
+            creating.start()
+            while 'a' not in registry._moving:
+                pass
+            self.assertEqual(['a', 'b'], registry.names())
+            self.assertFalse(registry.create('a', Point(0, 0), 1))
+            self.assertEqual({'car_id': 1, 'total_time': 7},
+                             registry.world('b').book(self.trip))
+        creating.join()
+        self.assertEqual({'car_id': 1, 'total_time': 7}, a.book(self.trip))
+
+    def test_concurrent_use_while_evicting(self):
+        registry = SimulationRegistry(2, self.directory)
+        names = ['w{}'.format(i) for i in range(6)]
+        for name in names:
+            registry.create(name, Point(0, 0), 0)
+
+        def use(name):
+            world = registry.world(name)
+            for _ in range(50):
+                world.increment_time()
+                world.add_taxis([(0, 0)])
+
+        threads = [threading.Thread(target=use, args=(name,))
+                   for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for name in names:
+            self.assertEqual([51], registry.world(name).add_taxis([(0, 0)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
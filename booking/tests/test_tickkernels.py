@@ -0,0 +1,58 @@
+import random
+import unittest
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.tickkernels import ArrivalQueueKernel, VectorisedStepKernel
+from taxi_booking.booking.trip import Trip
+
+
+class TestVectorisedStepKernel(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(11)
+        self.num_taxis = 20
+        self.queue_simulation = GridSimulation(
+            Point(0, 0), self.num_taxis, tick_kernel=ArrivalQueueKernel)
+        self.step_simulation = GridSimulation(
+            Point(0, 0), self.num_taxis, tick_kernel=VectorisedStepKernel)
+
+    def assert_same_locations(self):
+        for taxi_id in range(1, self.num_taxis + 1):
+            self.assertEqual(self.queue_simulation.taxi_location(taxi_id),
+                             self.step_simulation.taxi_location(taxi_id))
+
+    def random_trip(self, spread):
+        return Trip({'source': {'x': self.rng.randint(-spread, spread),
+                                'y': self.rng.randint(-spread, spread)},
+                     'destination': {'x': self.rng.randint(-spread, spread),
+                                     'y': self.rng.randint(-spread, spread)}})
+
+    def test_step_kernel_matches_arrival_queue_kernel(self):
+        for step in range(600):
+            operation = self.rng.random()
+            if operation < 0.5:
+                trip = self.random_trip(8)
+                self.assertEqual(self.queue_simulation.book(trip),
+                                 self.step_simulation.book(trip))
+            elif operation < 0.98:
+                ticks = self.rng.choice((1, 1, 1, 2, 5))
+                self.queue_simulation.increment_time(ticks)
+                self.step_simulation.increment_time(ticks)
+            else:
+                self.queue_simulation.reset()
+                self.step_simulation.reset()
+            self.assert_same_locations()
+
+    def test_step_kernel_for_taxi_at_pickup_location(self):
+        trip = Trip({'source': {'x': 0, 'y': 0},
+                     'destination': {'x': -2, 'y': 1}})
+        self.assertEqual(self.queue_simulation.book(trip),
+                         self.step_simulation.book(trip))
+        for tick in range(4):
+            self.queue_simulation.increment_time()
+            self.step_simulation.increment_time()
+            self.assert_same_locations()
+
+
+if __name__ == '__main__':
+    unittest.main()
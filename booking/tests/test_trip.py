@@ -0,0 +1,30 @@
+import unittest
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.trip import Trip
+
+
+class TestTrip(unittest.TestCase):
+
+    def test_trip_locations_and_travel_duration(self):
+        trip = Trip({'source': {'x': 1, 'y': -2},
+                     'destination': {'x': -3, 'y': 4}})
+        self.assertEqual(Point(1, -2), trip.src)
+        self.assertEqual(Point(-3, 4), trip.dst)
+        self.assertEqual(10, trip.travel_duration())
+
+    def test_trip_for_coordinates_outside_32_bit_grid(self):
+        for x in (2 ** 31, -2 ** 31 - 1, 1.5):
+            with self.assertRaises(ValueError):
+                Trip({'source': {'x': x, 'y': 0},
+                      'destination': {'x': 0, 'y': 0}})
+
+    def test_trip_from_points(self):
+        trip = Trip.from_points(Point(1, -2), Point(-3, 4))
+        self.assertEqual(Point(-3, 4), trip.dst)
+        self.assertEqual(10, trip.travel_duration())
+        with self.assertRaises(ValueError):
+            Trip.from_points(Point(2 ** 31, 0), Point(0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
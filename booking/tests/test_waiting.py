@@ -0,0 +1,181 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from taxi_booking.booking.gridsimulation import GridSimulation
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.trip import Trip
+from taxi_booking.booking.waiting import (FifoQueue, NearestFirstQueue,
+                                          WaitingQueue)
+
+
+def trip(src_x, src_y, dst_x, dst_y):
+    return Trip.from_points(Point(src_x, src_y), Point(dst_x, dst_y))
+
+
+class TestWaitingQueues(unittest.TestCase):
+
+    def test_fifo_queue_serves_oldest_booking_first(self):
+        simulation = GridSimulation(Point(0, 0), 1, waiting=FifoQueue)
+        self.assertEqual({'car_id': 1, 'total_time': 2},
+                         simulation.book(trip(0, 0, 2, 0)))
+        self.assertEqual({'ticket_id': 1}, simulation.book(trip(5, 0, 6, 0)))
+        self.assertEqual({'ticket_id': 2}, simulation.book(trip(2, 1, 2, 3)))
+        self.assertEqual({'ticket_id': 1, 'time': 0, 'status': 'waiting'},
+                         simulation.ticket(1))
+
+        simulation.increment_time(2)
+        self.assertEqual({'ticket_id': 1, 'time': 0, 'status': 'booked',
+                          'car_id': 1, 'total_time': 4, 'booked_at': 2},
+                         simulation.ticket(1))
+        self.assertEqual('waiting', simulation.ticket(2)['status'])
+        simulation.increment_time(4)
+        self.assertEqual({'ticket_id': 2, 'time': 0, 'status': 'booked',
+                          'car_id': 1, 'total_time': 7, 'booked_at': 6},
+                         simulation.ticket(2))
+        with self.assertRaises(KeyError):
+            simulation.ticket(3)
+
+    def test_nearest_first_queue_serves_closest_booking_first(self):
+        simulation = GridSimulation(Point(0, 0), 1, waiting=NearestFirstQueue)
+        simulation.book(trip(0, 0, 2, 0))
+        self.assertEqual({'ticket_id': 1}, simulation.book(trip(9, 0, 10, 0)))
+        self.assertEqual({'ticket_id': 2}, simulation.book(trip(3, 0, 4, 0)))
+
+        simulation.increment_time(2)
+        self.assertEqual('waiting', simulation.ticket(1)['status'])
+        self.assertEqual({'ticket_id': 2, 'time': 0, 'status': 'booked',
+                          'car_id': 1, 'total_time': 2, 'booked_at': 2},
+                         simulation.ticket(2))
+        simulation.increment_time(2)
+        self.assertEqual(6, simulation.ticket(1)['total_time'])
+
+    def test_added_taxis_serve_waiting_bookings(self):
+        for waiting in (FifoQueue, NearestFirstQueue):
+            with self.subTest(waiting=waiting.__name__):
+                simulation = GridSimulation(Point(0, 0), 1, waiting=waiting)
+                simulation.book(trip(0, 0, 2, 0))
+                simulation.book(trip(5, 0, 6, 0))
+                self.assertEqual([2], simulation.add_taxis([(4, 0)]))
+                self.assertEqual({'ticket_id': 1, 'time': 0,
+                                  'status': 'booked', 'car_id': 2,
+                                  'total_time': 2, 'booked_at': 0},
+                                 simulation.ticket(1))
+
+    def test_batch_bookings_are_left_waiting(self):
+        simulation = GridSimulation(Point(0, 0), 1, waiting=FifoQueue)
+        self.assertEqual([{'car_id': 1, 'total_time': 1}, None,
+                          {'ticket_id': 1}],
+                         simulation.book_batch([trip(0, 0, 1, 0),
+                                                trip(1, 1, 1, 1),
+                                                trip(3, 0, 4, 0)]))
+        self.assertIsNone(simulation.book(trip(1, 1, 1, 1)))
+
+    def test_reset_drops_waiting_bookings(self):
+        simulation = GridSimulation(Point(0, 0), 1, waiting=FifoQueue)
+        simulation.book(trip(0, 0, 2, 0))
+        simulation.book(trip(5, 0, 6, 0))
+        simulation.reset()
+        with self.assertRaises(KeyError):
+            simulation.ticket(1)
+        simulation.increment_time(2)
+        simulation.book(trip(0, 0, 2, 0))
+        self.assertEqual({'ticket_id': 1}, simulation.book(trip(5, 0, 6, 0)))
+
+    def test_ticket_without_waiting_queue(self):
+        simulation = GridSimulation(Point(0, 0), 1)
+        simulation.book(trip(0, 0, 2, 0))
+        self.assertIsNone(simulation.book(trip(5, 0, 6, 0)))
+        with self.assertRaises(KeyError):
+            simulation.ticket(1)
+
+    def test_scheduled_booking_is_left_waiting(self):
+        simulation = GridSimulation(Point(0, 0), 1, waiting=FifoQueue)
+        simulation.book(trip(0, 0, 5, 0))
+        simulation.book(trip(1, 0, 2, 0), at_time=2)
+        simulation.increment_time(2)
+        self.assertEqual({'booking_id': 1, 'time': 2, 'status': 'waiting',
+                          'ticket_id': 1}, simulation.scheduled_booking(1))
+        simulation.increment_time(3)
+        self.assertEqual({'ticket_id': 1, 'time': 2, 'status': 'booked',
+                          'car_id': 1, 'total_time': 5, 'booked_at': 5},
+                         simulation.ticket(1))
+
+    def test_waiting_queue_is_abstract(self):
+        with self.assertRaises(TypeError):
+            WaitingQueue()
+
+    def test_fifo_queue_matches_retrying_bookings(self):
+        for seed in range(4):
+            with self.subTest(seed=seed):
+                self.check_matches_retrying_bookings(seed)
+
+    def check_matches_retrying_bookings(self, seed):
+        rng = random.Random(seed)
+        simulation = GridSimulation(Point(0, 0), 5, waiting=FifoQueue)
+        reference = GridSimulation(Point(0, 0), 5)
+        waiting, tickets = [], {}
+        for _ in range(300):
+            if rng.random() < 0.6:
+                booking = trip(rng.randint(-8, 8), rng.randint(-8, 8),
+                               rng.randint(-8, 8), rng.randint(-8, 8))
+                result = reference.book(booking)
+                if result is None and booking.travel_duration():
+                    tickets[len(tickets) + 1] = None
+                    waiting.append((len(tickets), booking))
+                    result = {'ticket_id': len(tickets)}
+                self.assertEqual(result, simulation.book(booking))
+            else:
+                ticks = rng.choice((1, 2, 5))
+                simulation.increment_time(ticks)
+                reference.increment_time(ticks)
+                while waiting:
+                    result = reference.book(waiting[0][1])
+                    if result is None:
+                        break
+                    tickets[waiting.pop(0)[0]] = result
+            for ticket_id, result in tickets.items():
+                state = simulation.ticket(ticket_id)
+                if result is None:
+                    self.assertEqual('waiting', state['status'])
+                else:
+                    self.assertEqual(result, {
+                        'car_id': state['car_id'],
+                        'total_time': state['total_time']})
+
+
+class TestWaitingQueueSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'snapshot')
+        self.simulation = GridSimulation(Point(0, 0), 1, waiting=FifoQueue)
+        self.simulation.book(trip(0, 0, 2, 0))
+        self.simulation.book(trip(5, 0, 6, 0))
+        self.simulation.book(trip(2, 1, 2, 3))
+        self.simulation.increment_time(2)
+        self.simulation.save(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_loaded_simulation_keeps_tickets(self):
+        loaded = GridSimulation.load(self.path, waiting=FifoQueue)
+        for ticket_id in (1, 2):
+            self.assertEqual(self.simulation.ticket(ticket_id),
+                             loaded.ticket(ticket_id))
+        for simulation in (self.simulation, loaded):
+            self.assertEqual({'ticket_id': 3},
+                             simulation.book(trip(1, 0, 2, 0)))
+            simulation.increment_time(4)
+            self.assertEqual(7, simulation.ticket(2)['total_time'])
+            self.assertEqual('waiting', simulation.ticket(3)['status'])
+
+    def test_load_without_waiting_queue(self):
+        with self.assertRaises(ValueError):
+            GridSimulation.load(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
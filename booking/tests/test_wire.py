@@ -0,0 +1,120 @@
+import unittest
+import numpy as np
+from django.test import SimpleTestCase
+from taxi_booking.booking.point import Point
+from taxi_booking.booking.wire import (BOOKED, UNBOOKED, WAITING,
+                                       BinaryFormat, MsgpackFormat,
+                                       RESULT_DTYPE, TRIP_DTYPE, msgpack)
+
+
+class TestBinaryFormat(unittest.TestCase):
+
+    def setUp(self):
+        self.wire_format = BinaryFormat()
+
+    def test_decode_trips(self):
+        data = np.array([(1, 2, 3, 4), (-2 ** 31, 0, 2 ** 31 - 1, -5)],
+                        dtype=TRIP_DTYPE).tobytes()
+        trips = self.wire_format.decode_trips(data, batch=True)
+        self.assertEqual([(Point(1, 2), Point(3, 4)),
+                          (Point(-2 ** 31, 0), Point(2 ** 31 - 1, -5))],
+                         [(trip.src, trip.dst) for trip in trips])
+
+    def test_decode_trips_for_invalid_lengths(self):
+        data = np.zeros(2, dtype=TRIP_DTYPE).tobytes()
+        for length, batch in ((len(data) - 1, True), (len(data), False),
+                              (0, False)):
+            with self.assertRaises(ValueError):
+                self.wire_format.decode_trips(data[:length], batch)
+        self.assertEqual([], self.wire_format.decode_trips(b'', batch=True))
+
+    def test_encode_results(self):
+        data = self.wire_format.encode_results(
+            [{'car_id': 2, 'total_time': 9}, None, {'ticket_id': 3}])
+        records = np.frombuffer(data, dtype=RESULT_DTYPE)
+        self.assertEqual([BOOKED, UNBOOKED, WAITING],
+                         records['status'].tolist())
+        self.assertEqual([2, 0, 0], records['car_id'].tolist())
+        self.assertEqual([9, 0, 0], records['total_time'].tolist())
+        self.assertEqual([0, 0, 3], records['ticket_id'].tolist())
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+class TestMsgpackFormat(unittest.TestCase):
+
+    def setUp(self):
+        self.wire_format = MsgpackFormat()
+        self.booking = {'source': {'x': 1, 'y': 2},
+                        'destination': {'x': 3, 'y': 4}}
+
+    def test_decode_trips(self):
+        trips = self.wire_format.decode_trips(
+            msgpack.packb([self.booking, self.booking]), batch=True)
+        self.assertEqual(2, len(trips))
+        self.assertEqual(Point(3, 4), trips[1].dst)
+
+    def test_decode_trips_for_invalid_data(self):
+        for data, batch in ((b'\xc1', False),
+                            (msgpack.packb(self.booking), True),
+                            (msgpack.packb({'source': {}}), False)):
+            with self.assertRaises(ValueError):
+                self.wire_format.decode_trips(data, batch)
+
+
+class TestWireFormatViews(SimpleTestCase):
+
+    def setUp(self):
+        self.client.post('/api/reset/')
+        self.content_type = BinaryFormat.content_type
+
+    def post_trips(self, url, trips):
+        return self.client.post(
+            url, data=np.array(trips, dtype=TRIP_DTYPE).tobytes(),
+            content_type=self.content_type)
+
+    def test_book(self):
+        response = self.post_trips('/api/book/', [(1, 2, 3, 4)])
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(self.content_type, response['content-type'])
+        record = np.frombuffer(response.content, dtype=RESULT_DTYPE)[0]
+        self.assertEqual((1, 7), (record['car_id'], record['total_time']))
+
+    def test_book_with_no_trip_duration(self):
+        response = self.post_trips('/api/book/', [(1, 2, 1, 2)])
+        self.assertEqual(204, response.status_code)
+
+    def test_book_for_invalid_length(self):
+        response = self.post_trips('/api/book/', [(1, 2, 3, 4)] * 2)
+        self.assertEqual(400, response.status_code)
+
+    def test_book_batch(self):
+        response = self.post_trips('/api/book/batch/',
+                                   [(1, 2, 3, 4), (1, 2, 1, 2), (0, 0, 0, 1)])
+        self.assertEqual(200, response.status_code)
+        records = np.frombuffer(response.content, dtype=RESULT_DTYPE)
+        self.assertEqual([BOOKED, UNBOOKED, BOOKED],
+                         records['status'].tolist())
+        self.assertEqual([1, 0, 2], records['car_id'].tolist())
+        self.assertEqual([7, 0, 1], records['total_time'].tolist())
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+class TestMsgpackFormatViews(SimpleTestCase):
+
+    def setUp(self):
+        self.client.post('/api/reset/')
+        self.booking = {'source': {'x': 1, 'y': 2},
+                        'destination': {'x': 3, 'y': 4}}
+
+    def test_book_batch(self):
+        response = self.client.post(
+            '/api/book/batch/', data=msgpack.packb([self.booking] * 2),
+            content_type=MsgpackFormat.content_type)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([{'car_id': 1, 'total_time': 7},
+                          {'car_id': 2, 'total_time': 7}],
+                         msgpack.unpackb(response.content, raw=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
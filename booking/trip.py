@@ -1,4 +1,4 @@
-from .point import Point, manhattan_dist
+from .point import MAX_COORDINATE, MIN_COORDINATE, Point, manhattan_dist
 
 
 class Trip:
@@ -9,6 +9,8 @@ class Trip:
         dst: A Point instance of the ending location of a trip.
     """
 
+    __slots__ = ('src', 'dst')
+
     def __init__(self, booking):
         """Initializes Trip with starting and ending locations.
 
@@ -16,11 +18,32 @@ class Trip:
             booking: A dict mapping starting (source) and ending (destination)
                 locations to x and y coordinates. For example:
                 {'source': {'x': 0, 'y': 0}, 'destination': {'x': 1, 'y': 1}}
+
+        Raises:
+            ValueError: If a coordinate is not a 32 bit integer.
         """
         self.src = Point(booking['source']['x'],
                          booking['source']['y'])
         self.dst = Point(booking['destination']['x'],
                          booking['destination']['y'])
+        self._check_coordinates()
+
+    @classmethod
+    def from_points(cls, src, dst):
+        """Returns a Trip between the given locations.
+
+        Args:
+            src: A Point instance of the starting location of the trip.
+            dst: A Point instance of the ending location of the trip.
+
+        Raises:
+            ValueError: If a coordinate is not a 32 bit integer.
+        """
+        trip = cls.__new__(cls)
+        trip.src = src
+        trip.dst = dst
+        trip._check_coordinates()
+        return trip
 
     def travel_duration(self):
         """Returns the amount of time needed to complete the trip.
@@ -33,3 +56,10 @@ class Trip:
             An integer of time units needed to complete the trip.
         """
         return manhattan_dist(self.src, self.dst)
+
+    def _check_coordinates(self):
+        for coordinate in (self.src.x, self.src.y, self.dst.x, self.dst.y):
+            if not (isinstance(coordinate, int)
+                    and MIN_COORDINATE <= coordinate <= MAX_COORDINATE):
+                raise ValueError('Coordinate {} is outside of the grid'
+                                 .format(coordinate))
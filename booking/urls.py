@@ -1,8 +1,24 @@
-from django.urls import path
+from django.urls import include, path
 from . import views
 
-urlpatterns = [
+# Endpoints of a simulation, served for the default simulation and for each
+# named one under sim/<name>/.
+simulation_urlpatterns = [
     path('book/', views.book),
+    path('book/batch/', views.book_batch),
+    path('bookings/<int:booking_id>/', views.scheduled_booking),
+    path('tickets/<int:ticket_id>/', views.ticket),
     path('tick/', views.tick),
     path('reset/', views.reset),
+    path('taxis/', views.add_taxis),
+    path('taxis/<int:taxi_id>/', views.retire_taxi),
+    path('taxis/nearest/', views.nearest_taxis),
+    path('eta/', views.eta),
+    path('utilisation/', views.utilisation),
+]
+
+urlpatterns = simulation_urlpatterns + [
+    path('sim/', views.simulations),
+    path('sim/<slug:name>/', views.simulation),
+    path('sim/<slug:name>/', include(simulation_urlpatterns)),
 ]
@@ -1,14 +1,42 @@
-from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import (HttpResponse, HttpResponseBadRequest,
+                         HttpResponseNotFound, JsonResponse)
+from django.views.decorators.http import (require_GET, require_http_methods,
+                                          require_POST)
 from django.views.decorators.csrf import csrf_exempt
+import functools
 import json
 from json import JSONDecodeError
-from . import models
+from . import models, wire
+from .gridsimulation import MAX_TICKS, MAX_TIME
+from .metrics import CONTENT_TYPE
+from .point import MAX_COORDINATE, MIN_COORDINATE, Point
+
+
+def _in_world(view):
+    """Passes a view the simulation named in its URL, or the default one.
+
+    Views under /api/sim/<name>/ are given a tenants.World of the named
+    simulation, or respond 404 if there is none, and every other view is given
+    the models module, which operates on the default simulation.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, name=None, **kwargs):
+        if name is None:
+            world = models
+        else:
+            try:
+                world = models.simulations.world(name)
+            except KeyError:
+                return HttpResponseNotFound(
+                    "Simulation {} not found".format(name))
+        return view(request, world, *args, **kwargs)
+    return wrapper
 
 
 @require_POST
 @csrf_exempt
-def book(request):
+@_in_world
+def book(request, world):
     """Books nearest available taxi, given customer location and destination.
 
     Booking is successful if
@@ -18,11 +46,26 @@ def book(request):
         - HttpRequest content-type is "application/json"
         - HttpRequest JSON data is correct and can be parsed
 
+    Bookings may also be sent in a compact wire format instead of JSON, with
+    results returned in the same format; see wire.py.
+
+    Bookings in JSON may be made ahead, for a later time given by the query
+    parameter at, e.g. /book/?at=15, and are then made when the simulation
+    reaches it. Their results are read from /bookings/<booking_id>/.
+
+    If the simulation leaves bookings no taxi is found for waiting, they are
+    given a ticket instead, and booked once a taxi is freed. Their results
+    are read from /tickets/<ticket_id>/.
+
     Args:
         request: A HttpRequest instance.
+        world: The models module, or a tenants.World of the simulation named
+            in the URL.
             Content-Type: application/json
             Content: JSON containing customer location and destination, e.g.
                 {"source": {"x": 1, "y": 2}, "destination": {"x": 1, "y": 2}}
+            Or Content-Type: application/x-taxi-trips or application/msgpack
+            Content: The booking encoded in that wire format
 
     Returns:
         HttpResponse instance.
@@ -30,6 +73,13 @@ def book(request):
                 Status code: 200
                 Content: JSON containing taxi ID and total travel time needed,
                     e.g. {"car_id": 1, "total_time": 7}
+            If booking is made ahead:
+                Status code: 202
+                Content: JSON containing the booking ID and the time it is
+                    made at, e.g. {"booking_id": 1, "time": 15}
+            If booking is left waiting:
+                Status code: 202
+                Content: JSON containing the ticket ID, e.g. {"ticket_id": 1}
             If booking is unsuccessful:
                 Status code: 204
                 Content: Empty
@@ -39,7 +89,32 @@ def book(request):
             If JSON data cannot be parsed:
                 Status code: 400
                 Content: Text on error encountered when decoding JSON data
+            If JSON data is not a booking with integer coordinates that fit
+            in 32 bits:
+                Status code: 400
+                Content: Text on error encountered when reading the booking
+            If wire format data cannot be decoded:
+                Status code: 400
+                Content: Text on error encountered when decoding the data
+            If at is not an integer, is before the current time, is more
+            than gridsimulation.MAX_TICKS after it, or is given with wire
+            format data:
+                Status code: 400
+                Content: Text on error encountered when reading at
+            If the simulation cannot make bookings ahead:
+                Status code: 501
+                Content: Text stating bookings cannot be made ahead
     """
+    try:
+        at_time = _read_at_time(request)
+    except ValueError:
+        return HttpResponseBadRequest("Expected at to be an integer time")
+    if request.content_type in wire.FORMATS:
+        if at_time is not None:
+            return HttpResponseBadRequest(
+                "Bookings can only be made ahead with JSON data")
+        return _book_wire(wire.FORMATS[request.content_type], request.body,
+                          batch=False, world=world)
     if request.content_type != "application/json":
         return HttpResponse("Expected Content-Type: application/json\n"
                             + "Received Content-Type: {}".format(request.content_type),
@@ -49,36 +124,215 @@ def book(request):
     except JSONDecodeError:
         return HttpResponseBadRequest("Error decoding JSON data")
 
-    response = models.make(booking)
+    try:
+        response = world.make(booking, at_time)
+    except (KeyError, TypeError, ValueError):
+        if at_time is None:
+            return HttpResponseBadRequest("Error reading booking data")
+        return HttpResponseBadRequest(
+            "Error reading booking data, or at is out of range")
+    except NotImplementedError:
+        return HttpResponse(
+            "Bookings cannot be made ahead in this simulation", status=501)
     if not response:
         return HttpResponse(status=204)
     else:
-        return JsonResponse(response)
+        return JsonResponse(response, status=_booking_status(response))
 
 
 @require_POST
 @csrf_exempt
-def tick(request):
-    """Advances service time stamp by one unit.
+@_in_world
+def book_batch(request, world):
+    """Books nearest available taxis for an array of bookings, in order.
+
+    Bookings are made one after another in array order, without any other
+    request being served in between, so the results are the same as booking
+    each of them through book() in turn.
+
+    Booking batch is successful if
+        - HttpRequest made with HTTP POST request
+        - HttpRequest content-type is "application/json"
+        - HttpRequest JSON data is correct and can be parsed
+        - JSON data is an array of customer locations and destinations
+
+    Bookings may also be sent in a compact wire format instead of JSON, with
+    results returned in the same format; see wire.py.
+
+    Bookings in JSON may be made ahead, all for the same later time, as
+    book() makes them. Bookings no taxi is found for may be left waiting, as
+    book() leaves them, and are given tickets in the array.
+
+    Args:
+        request: A HttpRequest instance.
+        world: The models module, or a tenants.World of the simulation named
+            in the URL.
+            Content-Type: application/json
+            Content: JSON array of customer locations and destinations, e.g.
+                [{"source": {"x": 1, "y": 2}, "destination": {"x": 3, "y": 4}},
+                 {"source": {"x": 1, "y": 2}, "destination": {"x": 1, "y": 2}}]
+            Or Content-Type: application/x-taxi-trips or application/msgpack
+            Content: The bookings encoded in that wire format
+
+    Returns:
+        HttpResponse instance.
+            If booking batch is successful:
+                Status code: 200
+                Content: JSON array with the taxi ID and total travel time
+                    needed for each successful booking, the ticket ID of each
+                    booking left waiting, and null for each unsuccessful
+                    booking, e.g.
+                    [{"car_id": 1, "total_time": 7}, {"ticket_id": 1}, null]
+            If bookings are made ahead:
+                Status code: 202
+                Content: JSON array with the booking ID and the time it is
+                    made at for each booking, e.g.
+                    [{"booking_id": 1, "time": 15}, {"booking_id": 2, "time": 15}]
+            If HttpRequest content-type is wrong:
+                Status code: 415
+                Content: Text detailing expected and received content-types
+            If JSON data cannot be parsed:
+                Status code: 400
+                Content: Text on error encountered when decoding JSON data
+            If JSON data is not an array of bookings:
+                Status code: 400
+                Content: Text on error encountered when reading bookings
+            If wire format data cannot be decoded:
+                Status code: 400
+                Content: Text on error encountered when decoding the data
+            If at is not an integer, is before the current time, is more
+            than gridsimulation.MAX_TICKS after it, or is given with wire
+            format data:
+                Status code: 400
+                Content: Text on error encountered when reading at
+            If the simulation cannot make bookings ahead:
+                Status code: 501
+                Content: Text stating bookings cannot be made ahead
+    """
+    try:
+        at_time = _read_at_time(request)
+    except ValueError:
+        return HttpResponseBadRequest("Expected at to be an integer time")
+    if request.content_type in wire.FORMATS:
+        if at_time is not None:
+            return HttpResponseBadRequest(
+                "Bookings can only be made ahead with JSON data")
+        return _book_wire(wire.FORMATS[request.content_type], request.body,
+                          batch=True, world=world)
+    if request.content_type != "application/json":
+        return HttpResponse("Expected Content-Type: application/json\n"
+                            + "Received Content-Type: {}".format(request.content_type),
+                            status=415)
+    try:
+        bookings = json.loads(request.body, encoding=request.encoding)
+    except JSONDecodeError:
+        return HttpResponseBadRequest("Error decoding JSON data")
+
+    if not isinstance(bookings, list):
+        return HttpResponseBadRequest("Expected a JSON array of bookings")
+    try:
+        responses = world.make_batch(bookings, at_time)
+    except (KeyError, TypeError, ValueError):
+        return HttpResponseBadRequest("Error reading booking data")
+    except NotImplementedError:
+        return HttpResponse("Bookings cannot be made ahead in this simulation",
+                            status=501)
+    scheduled = bool(responses) and 'booking_id' in (responses[0] or {})
+    return JsonResponse(responses, safe=False,
+                        status=202 if scheduled else 200)
+
+
+def _booking_status(response):
+    """Returns 202 for a booking made ahead or left waiting, 200 otherwise.
+    """
+    return 202 if 'booking_id' in response or 'ticket_id' in response else 200
+
+
+def _read_at_time(request):
+    """Returns the time given by the at query parameter, or None if absent.
+
+    Raises:
+        ValueError: If at is not an integer, or is further from 0 than any
+            time a booking can be made at, so that it cannot overflow the
+            int64 times the simulation, its log and snapshots keep.
+    """
+    at_time = request.GET.get('at')
+    if at_time is None:
+        return None
+    at_time = int(at_time)
+    if abs(at_time) > MAX_TIME + MAX_TICKS:
+        raise ValueError('at {} is out of range'.format(at_time))
+    return at_time
+
+
+def _book_wire(wire_format, data, batch, world):
+    """Books trips encoded in a wire format, responding in the same format."""
+    try:
+        trips = wire_format.decode_trips(data, batch)
+    except ValueError:
+        return HttpResponseBadRequest("Error decoding {} data".format(
+            wire_format.content_type))
+
+    if batch:
+        return HttpResponse(
+            wire_format.encode_results(world.book_batch(trips)),
+            content_type=wire_format.content_type)
+    response = world.book(trips[0])
+    if not response:
+        return HttpResponse(status=204)
+    return HttpResponse(wire_format.encode_result(response),
+                        content_type=wire_format.content_type,
+                        status=_booking_status(response))
+
+
+@require_POST
+@csrf_exempt
+@_in_world
+def tick(request, world):
+    """Advances service time stamp by one unit, or by n units if given.
 
     Advancement is successful if
         - HttpRequest made with HTTP POST request
+        - query parameter n, if given, is a positive integer, e.g. /tick/?n=5,
+          up to gridsimulation.MAX_TICKS
 
     Args:
         request: A HttpRequest instance.
+        world: The models module, or a tenants.World of the simulation named
+            in the URL.
 
     Returns:
         HttpResponse instance.
-            Status code: 204
-            Content: Empty
+            If advancement is successful:
+                Status code: 204
+                Content: Empty
+            If n is not a positive integer up to MAX_TICKS, or would
+            advance time past MAX_TIME:
+                Status code: 400
+                Content: Text on error encountered when parsing n
     """
-    models.increment_time()
+    try:
+        ticks = int(request.GET.get('n', 1))
+    except ValueError:
+        ticks = 0
+    if ticks < 1:
+        return HttpResponseBadRequest("Expected n to be a positive integer")
+    if ticks > MAX_TICKS:
+        return HttpResponseBadRequest(
+            "Expected n to be at most {}".format(MAX_TICKS))
+
+    try:
+        world.increment_time(ticks)
+    except ValueError:
+        return HttpResponseBadRequest(
+            "Cannot advance time by {} ticks".format(ticks))
     return HttpResponse(status=204)
 
 
 @require_POST
 @csrf_exempt
-def reset(request):
+@_in_world
+def reset(request, world):
     """Resets all taxis to initial state regardless of availability.
 
     Advancement is successful if
@@ -86,11 +340,431 @@ def reset(request):
 
     Args:
         request: A HttpRequest instance.
+        world: The models module, or a tenants.World of the simulation named
+            in the URL.
 
     Returns:
         HttpResponse instance.
             Status code: 204
             Content: Empty
     """
-    models.reset()
+    world.reset()
+    return HttpResponse(status=204)
+
+
+@require_POST
+@csrf_exempt
+@_in_world
+def add_taxis(request, world):
+    """Adds available taxis to the simulation, given where they start from.
+
+    Taxis are added if
+        - HttpRequest made with HTTP POST request
+        - HttpRequest content-type is "application/json"
+        - JSON data is an array of locations on the grid
+
+    Args:
+        request: A HttpRequest instance.
+        world: The models module, or a tenants.World of the simulation named
+            in the URL.
+            Content-Type: application/json
+            Content: JSON array of locations the taxis start from, e.g.
+                [{"x": 1, "y": 2}, {"x": 3, "y": 4}]
+
+    Returns:
+        HttpResponse instance.
+            If taxis are added:
+                Status code: 200
+                Content: JSON containing the IDs of the added taxis, e.g.
+                    {"car_ids": [4, 5]}
+            If content-type is not "application/json":
+                Status code: 415
+                Content: Text on expected and received content-type
+            If JSON data cannot be parsed, or is not an array of locations,
+            or would grow a named simulation past
+            BOOKING_MAX_SIMULATION_TAXIS taxis:
+                Status code: 400
+                Content: Text on error encountered when reading locations
+            If the simulation's fleet cannot grow:
+                Status code: 501
+                Content: Text stating taxis cannot be added
+    """
+    if request.content_type != "application/json":
+        return HttpResponse("Expected Content-Type: application/json\n"
+                            + "Received Content-Type: {}".format(request.content_type),
+                            status=415)
+    try:
+        locations = json.loads(request.body, encoding=request.encoding)
+    except JSONDecodeError:
+        return HttpResponseBadRequest("Error decoding JSON data")
+
+    try:
+        car_ids = world.add_taxis(_read_locations(locations))
+    except (KeyError, TypeError, ValueError):
+        return HttpResponseBadRequest("Expected a JSON array of locations")
+    except NotImplementedError:
+        return HttpResponse("Taxis cannot be added to this simulation",
+                            status=501)
+    return JsonResponse({'car_ids': car_ids})
+
+
+def _read_locations(locations):
+    """Returns a list of (x, y) tuples of a JSON array of locations.
+
+    Raises:
+        KeyError, TypeError: If locations is not an array of locations with
+            integer coordinates.
+        ValueError: If a location is outside of the grid.
+    """
+    points = [(location['x'], location['y']) for location in locations]
+    for point in points:
+        for coordinate in point:
+            if not isinstance(coordinate, int):
+                raise TypeError('Expected integer coordinates')
+            if not MIN_COORDINATE <= coordinate <= MAX_COORDINATE:
+                raise ValueError('Coordinates are outside of the grid')
+    return points
+
+
+@require_http_methods(["DELETE"])
+@csrf_exempt
+@_in_world
+def retire_taxi(request, world, taxi_id):
+    """Takes an available taxi out of service for good.
+
+    Args:
+        request: A HttpRequest instance.
+        world: The models module, or a tenants.World of the simulation named
+            in the URL.
+        taxi_id: An integer ID of the taxi to retire, from the URL.
+
+    Returns:
+        HttpResponse instance.
+            If the taxi is retired:
+                Status code: 204
+                Content: Empty
+            If there is no taxi with the ID in service:
+                Status code: 404
+                Content: Text stating the taxi was not found
+            If the taxi is occupied:
+                Status code: 409
+                Content: Text stating the taxi is occupied
+    """
+    try:
+        world.retire_taxi(taxi_id)
+    except KeyError:
+        return HttpResponseNotFound("Taxi {} not found".format(taxi_id))
+    except ValueError:
+        return HttpResponse("Taxi {} is occupied".format(taxi_id), status=409)
     return HttpResponse(status=204)
+
+
+@require_GET
+@_in_world
+def scheduled_booking(request, world, booking_id):
+    """Reports on a booking made ahead, and the taxi it received once made.
+
+    Args:
+        request: A HttpRequest instance.
+        world: The models module, or a tenants.World of the simulation named
+            in the URL.
+        booking_id: An integer ID of the booking, from the URL.
+
+    Returns:
+        HttpResponse instance.
+            If the booking was made ahead since the last reset:
+                Status code: 200
+                Content: JSON containing the booking ID, the time it is made
+                    at and its status, "scheduled", "booked", "unbooked" or
+                    "waiting", with the taxi ID and total travel time once
+                    booked, or the ticket ID if left waiting, e.g.
+                    {"booking_id": 1, "time": 15, "status": "booked",
+                     "car_id": 2, "total_time": 9}
+            If there is no such booking:
+                Status code: 404
+                Content: Text stating the booking was not found
+    """
+    try:
+        return JsonResponse(world.scheduled_booking(booking_id))
+    except KeyError:
+        return HttpResponseNotFound("Booking {} not found".format(booking_id))
+
+
+@require_GET
+@_in_world
+def ticket(request, world, ticket_id):
+    """Reports on a booking left waiting, and the taxi it received once made.
+
+    Args:
+        request: A HttpRequest instance.
+        world: The models module, or a tenants.World of the simulation named
+            in the URL.
+        ticket_id: An integer ID of the booking's ticket, from the URL.
+
+    Returns:
+        HttpResponse instance.
+            If the ticket was given out since the last reset:
+                Status code: 200
+                Content: JSON containing the ticket ID, the time it was given
+                    out at and its status, "waiting" or "booked", with the
+                    taxi ID, total travel time and the time the booking was
+                    made at once booked, e.g.
+                    {"ticket_id": 1, "time": 3, "status": "booked",
+                     "car_id": 2, "total_time": 9, "booked_at": 5}
+            If there is no such ticket:
+                Status code: 404
+                Content: Text stating the ticket was not found
+    """
+    try:
+        return JsonResponse(world.ticket(ticket_id))
+    except KeyError:
+        return HttpResponseNotFound("Ticket {} not found".format(ticket_id))
+
+
+@require_GET
+@_in_world
+def nearest_taxis(request, world):
+    """Finds the free taxis closest to a location, without booking any.
+
+    Queries are answered from a recent view of the simulation, which may be
+    up to BOOKING_QUERY_MAX_AGE seconds old; see queries.py.
+
+    Args:
+        request: A HttpRequest instance.
+            Query parameters: x and y, the integer coordinates of the
+                location, k, the maximum number of taxis to find, from 1 to
+                1000 and 1 if not given, and radius, the maximum distance of
+                the taxis to find, if given, e.g. /taxis/nearest/?x=1&y=2&k=5
+        world: The models module, or a tenants.World of the simulation named
+            in the URL.
+
+    Returns:
+        HttpResponse instance.
+            If the query parameters are valid:
+                Status code: 200
+                Content: JSON containing the time of the view and the taxis
+                    found, by distance then ID, e.g.
+                    {"time": 3, "taxis": [{"car_id": 2,
+                                           "location": {"x": 1, "y": 1},
+                                           "distance": 1}]}
+            If a query parameter is invalid:
+                Status code: 400
+                Content: Text on error encountered when parsing it
+    """
+    try:
+        location = _read_query_location(request)
+    except ValueError:
+        return HttpResponseBadRequest("Expected integer x and y on the grid")
+    try:
+        k = int(request.GET.get('k', 1))
+        radius = request.GET.get('radius')
+        radius = None if radius is None else int(radius)
+    except ValueError:
+        k = radius = -1
+    if not 1 <= k <= 1000 or (radius is not None and radius < 0):
+        return HttpResponseBadRequest(
+            "Expected k from 1 to 1000 and a non-negative integer radius")
+
+    view = world.view()
+    taxis = [{'car_id': taxi_id, 'location': {'x': point.x, 'y': point.y},
+              'distance': distance}
+             for taxi_id, point, distance in view.nearest(location, k,
+                                                          radius)]
+    return JsonResponse({'time': view.time, 'taxis': taxis})
+
+
+@require_GET
+@_in_world
+def eta(request, world):
+    """Estimates how soon a taxi could pick a customer up at a location.
+
+    Args:
+        request: A HttpRequest instance.
+            Query parameters: x and y, the integer coordinates of the
+                location, e.g. /eta/?x=1&y=2
+        world: The models module, or a tenants.World of the simulation named
+            in the URL.
+
+    Returns:
+        HttpResponse instance.
+            If a taxi is in service:
+                Status code: 200
+                Content: JSON containing the time of the view, the ID of the
+                    taxi that could get there first, free or occupied, and
+                    the time it would take, e.g.
+                    {"time": 3, "car_id": 2, "eta": 4}
+            If no taxi is in service:
+                Status code: 204
+                Content: Empty
+            If a query parameter is invalid:
+                Status code: 400
+                Content: Text on error encountered when parsing it
+    """
+    try:
+        location = _read_query_location(request)
+    except ValueError:
+        return HttpResponseBadRequest("Expected integer x and y on the grid")
+
+    view = world.view()
+    estimate = view.eta(location)
+    if estimate is None:
+        return HttpResponse(status=204)
+    taxi_id, time_taken = estimate
+    return JsonResponse({'time': view.time, 'car_id': taxi_id,
+                         'eta': time_taken})
+
+
+@require_GET
+@_in_world
+def utilisation(request, world):
+    """Reports how much of the fleet in service is occupied.
+
+    Args:
+        request: A HttpRequest instance.
+        world: The models module, or a tenants.World of the simulation named
+            in the URL.
+
+    Returns:
+        HttpResponse instance.
+            Status code: 200
+            Content: JSON containing the time of the view, the numbers of
+                free and occupied taxis and the fraction occupied, e.g.
+                {"time": 3, "free": 1, "occupied": 3, "utilisation": 0.75}
+    """
+    view = world.view()
+    return JsonResponse({'time': view.time, 'free': view.free,
+                         'occupied': view.occupied,
+                         'utilisation': view.utilisation()})
+
+
+def _read_query_location(request):
+    """Returns a Point of the x and y query parameters of a request.
+
+    Raises:
+        ValueError: If either is missing, not an integer or off the grid.
+    """
+    try:
+        x, y = int(request.GET['x']), int(request.GET['y'])
+    except KeyError:
+        raise ValueError('Expected x and y')
+    for coordinate in (x, y):
+        if not MIN_COORDINATE <= coordinate <= MAX_COORDINATE:
+            raise ValueError('Coordinates are outside of the grid')
+    return Point(x, y)
+
+
+@require_GET
+def simulations(request):
+    """Lists the names of the named simulations.
+
+    Args:
+        request: A HttpRequest instance.
+
+    Returns:
+        HttpResponse instance.
+            Status code: 200
+            Content: JSON containing the sorted names of the simulations, e.g.
+                {"simulations": ["rush-hour", "storm"]}
+    """
+    return JsonResponse({'simulations': models.simulations.names()})
+
+
+@require_http_methods(["POST", "DELETE"])
+@csrf_exempt
+def simulation(request, name):
+    """Creates or destroys a named simulation with its own fleet.
+
+    A simulation is created with a POST request, and served under
+    /api/sim/<name>/ at the same endpoints as the default simulation, e.g.
+    /api/sim/<name>/book/, until destroyed with a DELETE request. Only a
+    limited number of simulations are kept in memory; see tenants.py.
+
+    Args:
+        request: A HttpRequest instance.
+            Content-Type: application/json, when creating
+            Content: JSON of the fleet to simulate, either a number of taxis
+                and where they all start from, each defaulting to the
+                default simulation's settings, e.g.
+                {"taxis": 100, "starting_point": {"x": 1, "y": 2}}
+                or where each taxi starts from, e.g.
+                {"starting_points": [{"x": 1, "y": 2}, {"x": 3, "y": 4}]}
+        name: A string name of the simulation, from the URL.
+
+    Returns:
+        HttpResponse instance.
+            If the simulation is created:
+                Status code: 201
+                Content: Empty
+            If the simulation is destroyed:
+                Status code: 204
+                Content: Empty
+            If content-type is not "application/json" when creating:
+                Status code: 415
+                Content: Text on expected and received content-type
+            If JSON data cannot be parsed, or is not a fleet of at most
+            BOOKING_MAX_SIMULATION_TAXIS taxis:
+                Status code: 400
+                Content: Text on error encountered when reading the fleet
+            If a simulation with the name already exists when creating:
+                Status code: 409
+                Content: Text stating the simulation exists
+            If there is no simulation with the name when destroying:
+                Status code: 404
+                Content: Text stating the simulation was not found
+    """
+    if request.method == 'DELETE':
+        try:
+            models.simulations.destroy(name)
+        except KeyError:
+            return HttpResponseNotFound(
+                "Simulation {} not found".format(name))
+        return HttpResponse(status=204)
+
+    if request.content_type != "application/json":
+        return HttpResponse("Expected Content-Type: application/json\n"
+                            + "Received Content-Type: {}".format(request.content_type),
+                            status=415)
+    try:
+        fleet = json.loads(request.body, encoding=request.encoding)
+    except JSONDecodeError:
+        return HttpResponseBadRequest("Error decoding JSON data")
+
+    try:
+        starting_point = starting_points = None
+        if 'starting_point' in fleet:
+            starting_point = Point(*_read_locations(
+                [fleet['starting_point']])[0])
+        if 'starting_points' in fleet:
+            starting_points = _read_locations(fleet['starting_points'])
+        num_taxis = fleet.get('taxis')
+        if not isinstance(num_taxis, (int, type(None))):
+            raise TypeError('Expected an integer number of taxis')
+        created = models.create_simulation(name, num_taxis, starting_point,
+                                           starting_points)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return HttpResponseBadRequest("Expected a JSON object of a fleet")
+    if not created:
+        return HttpResponse("Simulation {} already exists".format(name),
+                            status=409)
+    return HttpResponse(status=201)
+
+
+@require_GET
+def metrics(request):
+    """Serves simulation metrics in Prometheus text exposition format.
+
+    Args:
+        request: A HttpRequest instance.
+
+    Returns:
+        HttpResponse instance.
+            If metrics are enabled:
+                Status code: 200
+                Content: Metrics in Prometheus text format
+            If metrics are disabled:
+                Status code: 404
+                Content: Text stating metrics are disabled
+    """
+    if models.metrics is None:
+        return HttpResponseNotFound("Metrics are disabled")
+    return HttpResponse(models.render_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,207 @@
+"""Bookings left waiting for a taxi, rather than turned away.
+
+A booking no taxi is found for is given a ticket, and waits until a taxi is
+freed, or added, to be given to it. Which waiting booking a taxi is given to
+depends on the queue: FifoQueue serves bookings in the order they were made,
+each with the closest free taxi, and NearestFirstQueue gives each freed taxi
+the waiting booking closest to it. Either way, a waiting booking only costs
+work when a taxi is freed, rather than on every retry by its customer.
+"""
+
+import abc
+from collections import deque
+import numpy as np
+from .point import Point
+from .spatialindex import QuadTreeIndex
+from .trip import Trip
+
+
+# car_id of a booking still waiting for a taxi.
+_WAITING = 0
+
+TICKET_DTYPE = np.dtype([('ticket_id', '<i8'), ('time', '<i8'),
+                         ('src_x', '<i4'), ('src_y', '<i4'),
+                         ('dst_x', '<i4'), ('dst_y', '<i4'),
+                         ('car_id', '<i8'), ('total_time', '<i8'),
+                         ('booked_at', '<i8')])
+
+
+class WaitingQueue(abc.ABC):
+    """Keeps bookings waiting for a taxi, and their results once booked.
+
+    Ticket IDs are given out from 1 in order. Results are kept until the
+    queue is cleared, i.e. until the simulation is reset. Subclasses decide
+    which waiting bookings are served when taxis become free.
+
+    Attributes:
+        _tickets: A dictionary mapping the ID of every ticket to a list of
+            the time it was given out at, its Trip, and the car ID, total
+            time and time of its booking, as in TICKET_DTYPE.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def add(self, time, trip):
+        """Leaves a booking of trip waiting from time, returning its ticket ID.
+        """
+        ticket_id = len(self._tickets) + 1
+        self._tickets[ticket_id] = [time, trip, _WAITING, 0, 0]
+        self._enqueue(ticket_id, trip)
+        return ticket_id
+
+    def get(self, ticket_id):
+        """Returns the state of a waiting booking.
+
+        Returns:
+            A dictionary with keys 'ticket_id', 'time', the integer time the
+            ticket was given out at, and 'status', 'waiting' or 'booked'.
+            Booked bookings also have the keys 'car_id' and 'total_time', as
+            returned by GridSimulation.book, and 'booked_at', the integer time
+            the booking was made at.
+
+        Raises:
+            KeyError: If there is no ticket with the ID.
+        """
+        time, _, car_id, total_time, booked_at = self._tickets[ticket_id]
+        state = {'ticket_id': ticket_id, 'time': time}
+        if car_id == _WAITING:
+            state['status'] = 'waiting'
+        else:
+            state.update(status='booked', car_id=car_id,
+                         total_time=total_time, booked_at=booked_at)
+        return state
+
+    @abc.abstractmethod
+    def __len__(self):
+        """Returns the number of bookings still waiting."""
+
+    def clear(self):
+        """Forgets every ticket, starting ticket IDs from 1 again."""
+        self._tickets = {}
+        self._clear_waiting()
+
+    @abc.abstractmethod
+    def serve(self, simulation, taxi_ids):
+        """Books waiting bookings with taxis that have just become free.
+
+        Args:
+            simulation: The GridSimulation the bookings wait in.
+            taxi_ids: A list of the integer IDs of the taxis just freed or
+                added, in order.
+        """
+
+    def to_records(self):
+        """Returns an array of TICKET_DTYPE records of every ticket."""
+        return np.array([(ticket_id, time, trip.src.x, trip.src.y, trip.dst.x,
+                          trip.dst.y, car_id, total_time, booked_at)
+                         for ticket_id, (time, trip, car_id, total_time,
+                                         booked_at)
+                         in self._tickets.items()], dtype=TICKET_DTYPE)
+
+    def restore(self, records):
+        """Replaces every ticket with those written by to_records()."""
+        self.clear()
+        for (ticket_id, time, src_x, src_y, dst_x, dst_y, car_id, total_time,
+             booked_at) in records.tolist():
+            trip = Trip.from_points(Point(src_x, src_y), Point(dst_x, dst_y))
+            self._tickets[ticket_id] = [time, trip, car_id, total_time,
+                                        booked_at]
+            if car_id == _WAITING:
+                self._enqueue(ticket_id, trip)
+
+    def _record(self, ticket_id, time, result):
+        ticket = self._tickets[ticket_id]
+        ticket[2], ticket[3] = result['car_id'], result['total_time']
+        ticket[4] = time
+
+    def _trip(self, ticket_id):
+        return self._tickets[ticket_id][1]
+
+    @abc.abstractmethod
+    def _enqueue(self, ticket_id, trip):
+        """Leaves the booking of a ticket waiting to be served."""
+
+    @abc.abstractmethod
+    def _clear_waiting(self):
+        """Forgets every waiting booking."""
+
+
+class FifoQueue(WaitingQueue):
+    """Serves waiting bookings in the order they were made.
+
+    Each is booked as GridSimulation.book would book it, with the closest
+    free taxi, for as long as there are free taxis.
+
+    Attributes:
+        _waiting: A deque of the IDs of the tickets waiting, oldest first.
+    """
+
+    def __len__(self):
+        """Returns the number of bookings waiting."""
+        return len(self._waiting)
+
+    def serve(self, simulation, taxi_ids):
+        """Books waiting bookings, oldest first, while there are free taxis.
+        """
+        while self._waiting and len(simulation._free_taxi_index):
+            ticket_id = self._waiting.popleft()
+            self._record(ticket_id, simulation._time,
+                         simulation._book(self._trip(ticket_id)))
+
+    def _enqueue(self, ticket_id, trip):
+        self._waiting.append(ticket_id)
+
+    def _clear_waiting(self):
+        self._waiting = deque()
+
+
+class NearestFirstQueue(WaitingQueue):
+    """Gives each taxi that becomes free the waiting booking closest to it.
+
+    Waiting bookings are kept in a spatial index by customer location, keyed
+    by ticket ID, so a taxi finds the closest in the same way a booking finds
+    the closest free taxi, and the oldest of equally close ones.
+
+    Attributes:
+        _pickups: A spatial index, e.g. a QuadTreeIndex, of the IDs of the
+            tickets waiting and their customers' locations.
+    """
+
+    def __init__(self, index_factory=QuadTreeIndex):
+        """Initializes an empty queue.
+
+        Args:
+            index_factory: A callable returning an empty spatial index with
+                insert, remove, clear and nearest methods.
+        """
+        self._pickups = index_factory()
+        super().__init__()
+
+    def __len__(self):
+        """Returns the number of bookings waiting."""
+        return len(self._pickups)
+
+    def serve(self, simulation, taxi_ids):
+        """Books each taxi, in turn, with the waiting booking closest to it."""
+        fleet = simulation._fleet
+        for taxi_id in taxi_ids:
+            if not len(self._pickups):
+                return
+            if not fleet.is_free(taxi_id):
+                continue
+            ticket_id, pickup_duration = self._pickups.nearest(
+                fleet.location(taxi_id))
+            trip = self._trip(ticket_id)
+            self._pickups.remove(ticket_id, trip.src)
+            self._record(ticket_id, simulation._time, simulation._assign_taxi(
+                trip, taxi_id, pickup_duration))
+
+    def _enqueue(self, ticket_id, trip):
+        self._pickups.insert(ticket_id, trip.src)
+
+    def _clear_waiting(self):
+        self._pickups.clear()
+
+
+QUEUES = {'fifo': FifoQueue, 'nearest': NearestFirstQueue}
@@ -0,0 +1,120 @@
+"""Compact wire formats for bookings, negotiated by Content-Type.
+
+BinaryFormat, application/x-taxi-trips, packs each trip as 4 little-endian
+int32 values: source x, source y, destination x, destination y. Each result
+is packed as 4 little-endian int64 values: status, car_id, total_time and
+ticket_id. status is UNBOOKED for an unsuccessful booking, BOOKED for a
+booking made, with its car_id and total_time, and WAITING for a booking left
+waiting for a taxi, with its ticket_id; the fields a status does not use are
+0. A book request holds 1 trip, a batch request any number of trips back to
+back, so clients can send and read NumPy arrays of TRIP_DTYPE and
+RESULT_DTYPE as they are.
+
+MsgpackFormat, application/msgpack, encodes the same bookings and results as
+the JSON API does, and is only available if msgpack is installed.
+"""
+
+import numpy as np
+from .point import Point
+from .trip import Trip
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+TRIP_DTYPE = np.dtype([('src_x', '<i4'), ('src_y', '<i4'),
+                       ('dst_x', '<i4'), ('dst_y', '<i4')])
+RESULT_DTYPE = np.dtype([('status', '<i8'), ('car_id', '<i8'),
+                         ('total_time', '<i8'), ('ticket_id', '<i8')])
+
+# Statuses of a result record.
+UNBOOKED = 0
+BOOKED = 1
+WAITING = 2
+
+
+class BinaryFormat:
+    """Encodes trips and results as fixed-layout little-endian records."""
+
+    content_type = 'application/x-taxi-trips'
+
+    def decode_trips(self, data, batch):
+        """Returns the list of Trips packed in data.
+
+        Args:
+            data: Bytes of packed TRIP_DTYPE records.
+            batch: False if data must hold exactly 1 trip.
+
+        Raises:
+            ValueError: If data is not whole records, or not 1 record when
+                batch is False.
+        """
+        if len(data) % TRIP_DTYPE.itemsize or (
+                not batch and len(data) != TRIP_DTYPE.itemsize):
+            raise ValueError('Expected {} trip records of {} bytes'.format(
+                'whole' if batch else '1', TRIP_DTYPE.itemsize))
+        coordinates = np.frombuffer(data, dtype='<i4').reshape(-1, 4).tolist()
+        return [Trip.from_points(Point(src_x, src_y), Point(dst_x, dst_y))
+                for src_x, src_y, dst_x, dst_y in coordinates]
+
+    def encode_result(self, result):
+        """Returns the result of a booking packed as a RESULT_DTYPE record."""
+        return self.encode_results([result])
+
+    def encode_results(self, results):
+        """Returns results of bookings packed as RESULT_DTYPE records."""
+        records = np.zeros(len(results), dtype=RESULT_DTYPE)
+        for row, result in enumerate(results):
+            if result is None:
+                continue
+            if 'ticket_id' in result:
+                records[row] = (WAITING, 0, 0, result['ticket_id'])
+            else:
+                records[row] = (BOOKED, result['car_id'],
+                                result['total_time'], 0)
+        return records.tobytes()
+
+
+class MsgpackFormat:
+    """Encodes bookings and results as msgpack, shaped as in the JSON API."""
+
+    content_type = 'application/msgpack'
+
+    def decode_trips(self, data, batch):
+        """Returns the list of Trips of the bookings encoded in data.
+
+        Args:
+            data: Bytes of a msgpack map of a booking, or of an array of them
+                if batch is True.
+            batch: True if data holds an array of bookings.
+
+        Raises:
+            ValueError: If data cannot be decoded, or is not bookings.
+        """
+        try:
+            bookings = msgpack.unpackb(data, raw=False)
+        except msgpack.exceptions.UnpackException as error:
+            raise ValueError(str(error))
+        if not batch:
+            bookings = [bookings]
+        elif not isinstance(bookings, list):
+            raise ValueError('Expected an array of bookings')
+        try:
+            return [Trip(booking) for booking in bookings]
+        except (KeyError, TypeError) as error:
+            raise ValueError('Error reading booking data: {}'.format(error))
+
+    def encode_result(self, result):
+        """Returns the result of a booking encoded as msgpack."""
+        return msgpack.packb(result, use_bin_type=True)
+
+    def encode_results(self, results):
+        """Returns the list of results of bookings encoded as msgpack."""
+        return msgpack.packb(results, use_bin_type=True)
+
+
+FORMATS = {BinaryFormat.content_type: BinaryFormat()}
+if msgpack is not None:
+    FORMATS[MsgpackFormat.content_type] = MsgpackFormat()
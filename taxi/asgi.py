@@ -0,0 +1,22 @@
+"""
+ASGI config for taxi_booking project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+to be served by an ASGI server, e.g. ``uvicorn taxi.asgi:application``.
+
+Django 2.0 does not serve ASGI itself, so the booking API is served by
+booking.asgi.BookingApplication, through booking.models as the Django views
+are, so that its operations take the same lock and are logged.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "taxi.settings")
+django.setup()
+
+from booking import models
+from booking.asgi import BookingApplication
+
+application = BookingApplication(models)
@@ -22,6 +22,7 @@ ALLOWED_HOSTS = [
 
 INSTALLED_APPS = [
     "django.contrib.admindocs",
+    "booking.apps.GridConfig",
 ]
 
 MIDDLEWARE = [
@@ -62,3 +63,80 @@ USE_I18N = True
 USE_L10N = True
 
 USE_TZ = True
+
+# Path of a file through which every worker process shares one simulation,
+# e.g. when served by several WSGI workers. Each process simulates its own
+# fleet if unset.
+BOOKING_SHARED_STATE_PATH = os.environ.get('BOOKING_SHARED_STATE_PATH')
+
+# Fraction of calls to the simulation, above 0 and up to 1, whose durations
+# are sampled into the metrics served at /metrics/. Metrics are disabled if
+# unset. Each worker process serves the metrics of its own calls.
+_SAMPLE_RATE = os.environ.get('BOOKING_METRICS_SAMPLE_RATE')
+BOOKING_METRICS_SAMPLE_RATE = float(_SAMPLE_RATE) if _SAMPLE_RATE else None
+
+# Serve well-formed booking API requests without Django's middleware and
+# request handling. Every other request is still served by Django.
+BOOKING_FAST_PATH = bool(os.environ.get('BOOKING_FAST_PATH'))
+
+# Fleet simulated, unless resumed from a snapshot or shared state file: the
+# taxis listed in BOOKING_FLEET_FILE, a .npy array of shape (taxis, 2) or a
+# text file with a line "x,y" of where each taxi starts from, or else
+# BOOKING_FLEET_SIZE taxis all starting from BOOKING_STARTING_POINT, "x,y".
+BOOKING_FLEET_FILE = os.environ.get('BOOKING_FLEET_FILE')
+BOOKING_FLEET_SIZE = int(os.environ.get('BOOKING_FLEET_SIZE', 3))
+BOOKING_STARTING_POINT = tuple(
+    int(coordinate) for coordinate
+    in os.environ.get('BOOKING_STARTING_POINT', '0,0').split(','))
+
+# Path of a file the simulation is snapshotted to, and resumed from when the
+# process starts, so that a restart does not reset it. A snapshot is written
+# every BOOKING_SNAPSHOT_INTERVAL seconds and when the process exits. Ignored
+# if BOOKING_SHARED_STATE_PATH is set, as its file already outlives processes.
+BOOKING_SNAPSHOT_PATH = os.environ.get('BOOKING_SNAPSHOT_PATH')
+BOOKING_SNAPSHOT_INTERVAL = float(
+    os.environ.get('BOOKING_SNAPSHOT_INTERVAL', 10))
+
+# Path of an append-only log every booking, tick and reset is written to
+# before it is responded to. On start, the simulation is recovered by
+# replaying the log after the snapshot at BOOKING_SNAPSHOT_PATH, if set, or
+# from the start otherwise. Ignored if BOOKING_SHARED_STATE_PATH is set.
+BOOKING_LOG_PATH = os.environ.get('BOOKING_LOG_PATH')
+
+# Maximum number of named simulations, served under /api/sim/<name>/, kept in
+# memory. The least recently used is evicted to make room for another: written
+# to BOOKING_SIMULATIONS_PATH, an existing directory, and loaded back when next
+# used, or dropped if unset. Named simulations are kept by each process, so
+# should be served by a single process. Each has at most
+# BOOKING_MAX_SIMULATION_TAXIS taxis, so together they hold at most
+# BOOKING_MAX_SIMULATIONS times as many taxis in memory.
+BOOKING_MAX_SIMULATIONS = int(os.environ.get('BOOKING_MAX_SIMULATIONS', 256))
+BOOKING_MAX_SIMULATION_TAXIS = int(
+    os.environ.get('BOOKING_MAX_SIMULATION_TAXIS', 100000))
+BOOKING_SIMULATIONS_PATH = os.environ.get('BOOKING_SIMULATIONS_PATH')
+
+# Maximum age in seconds of the view of a simulation that read-only queries,
+# e.g. /api/taxis/nearest/, are answered from. A new view is copied from the
+# simulation when a query finds the last one older, so bookings wait for a
+# copy of the fleet at most once per this many seconds.
+BOOKING_QUERY_MAX_AGE = float(os.environ.get('BOOKING_QUERY_MAX_AGE', 1))
+
+# Whether bookings may be chained onto occupied taxis that would reach the
+# customer sooner, once they drop their current customers off, than any free
+# taxi. Not supported with BOOKING_SHARED_STATE_PATH.
+BOOKING_PREDICTIVE_DISPATCH = bool(
+    os.environ.get('BOOKING_PREDICTIVE_DISPATCH'))
+
+# How bookings no taxi is found for are left waiting for one, rather than
+# turned away: 'fifo' to book them in the order they were made once taxis are
+# freed, or 'nearest' to give each freed taxi the closest. Unset to turn them
+# away. Not supported with BOOKING_SHARED_STATE_PATH.
+BOOKING_WAITING_QUEUE = os.environ.get('BOOKING_WAITING_QUEUE')
+
+# How a batch of bookings, from /api/book/batch/ or made ahead for the same
+# time, is matched against free taxis: 'greedy' to book each in turn with the
+# closest taxi, or 'optimal' for the least total pickup time, considering only
+# the BOOKING_ASSIGNMENT_CANDIDATES closest taxis per booking if set.
+BOOKING_ASSIGNMENT = os.environ.get('BOOKING_ASSIGNMENT', 'greedy')
+_CANDIDATES = os.environ.get('BOOKING_ASSIGNMENT_CANDIDATES')
+BOOKING_ASSIGNMENT_CANDIDATES = int(_CANDIDATES) if _CANDIDATES else None
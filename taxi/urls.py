@@ -1,6 +1,8 @@
 from django.urls import include, path
+from booking import views
 
 urlpatterns = [
     path('admin/doc/', include('django.contrib.admindocs.urls')),
     path('api/', include('booking.urls')),
+    path('metrics/', views.metrics),
 ]
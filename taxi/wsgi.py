@@ -2,6 +2,8 @@
 WSGI config for taxi_booking project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+With BOOKING_FAST_PATH set, well-formed booking API requests are served by
+booking.fastpath.FastPathApplication without going through Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/2.0/howto/deployment/wsgi/
@@ -9,8 +11,13 @@ https://docs.djangoproject.com/en/2.0/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "taxi.settings")
 
 application = get_wsgi_application()
+
+if settings.BOOKING_FAST_PATH:
+    from booking.fastpath import FastPathApplication
+    application = FastPathApplication(application)